@@ -0,0 +1,213 @@
+"""Minimal in-process MQTT 3.1.1 broker stand-in for load tests.
+
+Supports what the integration uses: CONNECT, SUBSCRIBE with exact-match or
+``#`` filters, QoS 0/1 PUBLISH in both directions, PINGREQ and DISCONNECT.
+Clients connecting with ``clean_session`` off get a session that outlives
+the connection: QoS 1 messages published while they are away are queued
+and, like unacknowledged ones, delivered when they reconnect. There is no
+authentication and no retained state.
+"""
+
+import asyncio
+import ssl
+import struct
+from collections import deque
+
+
+def _encode_length(length: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        if length:
+            byte |= 0x80
+        out.append(byte)
+        if not length:
+            return bytes(out)
+
+
+def _packet(header: int, body: bytes) -> bytes:
+    return bytes([header]) + _encode_length(len(body)) + body
+
+
+def _read_string(data: bytes, pos: int) -> tuple[str, int]:
+    (length,) = struct.unpack_from("!H", data, pos)
+    return data[pos + 2 : pos + 2 + length].decode(), pos + 2 + length
+
+
+class _Session:
+    """Subscriptions and undelivered QoS 1 messages of one client id."""
+
+    def __init__(self, persistent: bool) -> None:
+        self.persistent = persistent
+        self.writer: asyncio.StreamWriter | None = None
+        self.subscriptions: dict[str, int] = {}
+        self.queued: deque[tuple[str, bytes]] = deque()
+        self.inflight: dict[int, bytes] = {}
+        self._packet_id = 0
+
+    def matches(self, topic: str) -> int | None:
+        """Return the subscribed QoS for ``topic``, or None."""
+        if topic in self.subscriptions:
+            return self.subscriptions[topic]
+        return self.subscriptions.get("#")
+
+    def send(self, topic: str, payload: bytes, qos: int) -> None:
+        encoded = topic.encode()
+        header = struct.pack("!H", len(encoded)) + encoded
+        if not qos:
+            self.writer.write(_packet(0x30, header + payload))
+            return
+        self._packet_id = self._packet_id % 0xFFFF + 1
+        body = header + struct.pack("!H", self._packet_id) + payload
+        self.inflight[self._packet_id] = body
+        self.writer.write(_packet(0x32, body))
+
+    def resume(self) -> None:
+        """Redeliver unacknowledged messages, then the queued ones."""
+        for body in self.inflight.values():
+            self.writer.write(_packet(0x3A, body))
+        while self.queued:
+            self.send(*self.queued.popleft(), 1)
+
+
+class Broker:
+    """Asyncio MQTT broker serving any number of clients."""
+
+    def __init__(self) -> None:
+        self._sessions: dict[str, _Session] = {}
+        self._writers: set[asyncio.StreamWriter] = set()
+        self._server: asyncio.Server | None = None
+        self._handlers: set[asyncio.Task] = set()
+        self.connections = 0
+        self.published = 0
+
+    async def start(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        ssl_context: ssl.SSLContext | None = None,
+    ) -> int:
+        """Start listening and return the bound port."""
+        self._server = await asyncio.start_server(
+            self._handle, host, port, ssl=ssl_context, backlog=4096
+        )
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        """Close the listener and every client connection."""
+        if self._server is not None:
+            self._server.close()
+        self.drop_connections()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+
+    def drop_connections(self) -> None:
+        """Close every client connection, as a broker outage would."""
+        for writer in list(self._writers):
+            writer.close()
+
+    @property
+    def subscribers(self) -> int:
+        """Return the number of connected clients with a subscription."""
+        return sum(
+            1
+            for session in self._sessions.values()
+            if session.writer is not None and session.subscriptions
+        )
+
+    def publish(self, topic: str, payload: bytes, qos: int = 0) -> int:
+        """Deliver a message to matching subscribers; returns the count.
+
+        QoS 1 messages for disconnected persistent sessions are queued and
+        count as delivered.
+        """
+        delivered = 0
+        for session in self._sessions.values():
+            granted = session.matches(topic)
+            if granted is None:
+                continue
+            if session.writer is not None:
+                session.send(topic, payload, min(qos, granted))
+                delivered += 1
+            elif qos and granted:
+                session.queued.append((topic, payload))
+                delivered += 1
+        self.published += 1
+        return delivered
+
+    async def _read_packet(self, reader: asyncio.StreamReader) -> tuple[int, bytes]:
+        first = (await reader.readexactly(1))[0]
+        multiplier, length = 1, 0
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            length += (byte & 0x7F) * multiplier
+            multiplier *= 128
+            if not byte & 0x80:
+                break
+        body = await reader.readexactly(length) if length else b""
+        return first, body
+
+    def _connect(
+        self, body: bytes, writer: asyncio.StreamWriter
+    ) -> tuple[str, _Session]:
+        _, pos = _read_string(body, 0)
+        clean = bool(body[pos + 1] & 0x02)
+        client_id, _ = _read_string(body, pos + 4)
+        session = self._sessions.get(client_id)
+        present = session is not None and session.persistent and not clean
+        if session is not None and session.writer is not None:
+            # A client id connects only once; the older connection is closed.
+            session.writer.close()
+        if not present:
+            session = self._sessions[client_id] = _Session(persistent=not clean)
+        session.writer = writer
+        writer.write(_packet(0x20, bytes([int(present), 0])))
+        if present:
+            session.resume()
+        return client_id, session
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.connections += 1
+        self._writers.add(writer)
+        self._handlers.add(asyncio.current_task())
+        client_id, session = None, None
+        try:
+            while True:
+                first, body = await self._read_packet(reader)
+                packet_type = first & 0xF0
+                if packet_type == 0x10:  # CONNECT
+                    client_id, session = self._connect(body, writer)
+                elif packet_type == 0x80:  # SUBSCRIBE
+                    packet_id, pos, granted = body[:2], 2, bytearray()
+                    while pos < len(body):
+                        topic, pos = _read_string(body, pos)
+                        granted.append(min(body[pos], 1))
+                        session.subscriptions[topic] = granted[-1]
+                        pos += 1
+                    writer.write(_packet(0x90, packet_id + bytes(granted)))
+                elif packet_type == 0x30:  # PUBLISH
+                    qos = (first >> 1) & 3
+                    topic, pos = _read_string(body, 0)
+                    if qos:
+                        writer.write(_packet(0x40, body[pos : pos + 2]))
+                        pos += 2
+                    self.publish(topic, body[pos:], qos)
+                elif packet_type == 0x40:  # PUBACK
+                    session.inflight.pop(struct.unpack_from("!H", body)[0], None)
+                elif packet_type == 0xC0:  # PINGREQ
+                    writer.write(_packet(0xD0, b""))
+                elif packet_type == 0xE0:  # DISCONNECT
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ssl.SSLError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            self._handlers.discard(asyncio.current_task())
+            if session is not None and session.writer is writer:
+                session.writer = None
+                if not session.persistent:
+                    del self._sessions[client_id]
+            writer.close()
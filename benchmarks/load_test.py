@@ -0,0 +1,470 @@
+"""End-to-end load test for the LMT IoT integration.
+
+Runs a real Home Assistant core with N config entries of the integration,
+each connected over mutual TLS to a local MQTT broker stand-in that runs in
+a separate process. The broker publishes V1 and V2 uplinks at a steady rate
+and/or in bursts, and the harness measures the path from publish to sensor
+state write.
+
+Every published temperature value is the publish time relative to the start
+of the run, so the latency of each state write can be read off the state.
+
+    python benchmarks/load_test.py --devices 200 --rate 1 --duration 30 \
+        --output bench_output.json
+
+Results are written as JSON (see ``--output``); a one-line summary goes to
+stderr. Requires Linux, ``homeassistant`` and ``paho-mqtt``.
+"""
+
+import argparse
+import asyncio
+import datetime
+import inspect
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import MappingProxyType
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(BENCH_DIR))
+
+from broker import Broker  # noqa: E402
+from certs import BROKER_HOSTNAME, TestCertificates, generate  # noqa: E402
+
+DOMAIN = "lmt_iot"
+SENSOR_CONFIG = [
+    {
+        "key": "TEMPERATURE",
+        "name": "Temperature",
+        "unit": "°C",
+        "stateClass": "measurement",
+        "deviceClass": "temperature",
+    }
+]
+LOOP_LAG_INTERVAL = 0.05
+SAMPLE_INTERVAL = 0.5
+CONNECT_TIMEOUT = 120
+
+
+def _device_id(index: int) -> str:
+    return f"bench{index:05d}"
+
+
+def v1_payload(device_id: str, value: float) -> bytes:
+    """Build a V1 uplink carrying one temperature sample."""
+    return json.dumps(
+        {
+            "msdInfoData": {"mServerIdentity": device_id},
+            "data": [{"mSerial": device_id, "mTempData": [{"mData": [value]}]}],
+        }
+    ).encode()
+
+
+def v2_payload(device_id: str, value: float) -> bytes:
+    """Build a V2 uplink carrying one temperature sample."""
+    return json.dumps(
+        {
+            "version": "V2",
+            "measurements": {"TEMPERATURE": [[int(time.time() * 1000), value]]},
+        }
+    ).encode()
+
+
+# --- Broker / publisher process ---------------------------------------------
+
+
+def _publisher_main(conn, certs: TestCertificates, config: dict) -> None:
+    asyncio.run(_async_publisher(conn, certs, config))
+
+
+def _broker_ssl_context(certs: TestCertificates) -> ssl.SSLContext:
+    """Build the broker's server context, requiring client certificates."""
+    with tempfile.TemporaryDirectory() as tmp:
+        cert_path, key_path = Path(tmp, "server.pem"), Path(tmp, "server.key")
+        cert_path.write_text(certs.server_cert)
+        key_path.write_text(certs.server_key)
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(cert_path, key_path)
+    context.load_verify_locations(cadata=certs.ca_cert)
+    context.verify_mode = ssl.CERT_REQUIRED
+    return context
+
+
+async def _async_publisher(conn, certs: TestCertificates, config: dict) -> None:
+    loop = asyncio.get_running_loop()
+    broker = Broker()
+    conn.send(await broker.start(ssl_context=_broker_ssl_context(certs)))
+
+    # Wait for Home Assistant to set up, then until every client subscribed.
+    await loop.run_in_executor(None, conn.recv)
+    devices = [_device_id(index) for index in range(config["devices"])]
+    deadline = time.monotonic() + CONNECT_TIMEOUT
+    while broker.subscribers < len(devices) and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+
+    rng = random.Random(config["seed"])
+    v1_devices = set(rng.sample(devices, round(len(devices) * config["v1_ratio"])))
+    t0 = time.time()
+    end = time.monotonic() + config["duration"]
+    conn.send(t0)
+
+    def publish(device_id: str) -> None:
+        build = v1_payload if device_id in v1_devices else v2_payload
+        broker.publish(
+            f"things/{device_id}/telemetry", build(device_id, time.time() - t0)
+        )
+
+    async def steady(device_id: str) -> None:
+        period = 1 / config["rate"]
+        next_at = time.monotonic() + rng.uniform(0, period)
+        while next_at < end:
+            await asyncio.sleep(max(0, next_at - time.monotonic()))
+            publish(device_id)
+            next_at += period
+
+    async def bursts() -> None:
+        next_at = time.monotonic() + config["burst_interval"]
+        while next_at < end:
+            await asyncio.sleep(max(0, next_at - time.monotonic()))
+            for _ in range(config["burst_size"]):
+                for device_id in devices:
+                    publish(device_id)
+            next_at += config["burst_interval"]
+
+    tasks = []
+    if config["rate"] > 0:
+        tasks.extend(steady(device_id) for device_id in devices)
+    if config["burst_interval"] > 0 and config["burst_size"] > 0:
+        tasks.append(bursts())
+    await asyncio.gather(*tasks)
+
+    conn.send({"published": broker.published, "subscribers": broker.subscribers})
+    await loop.run_in_executor(None, conn.recv)
+    await broker.stop()
+
+
+# --- Home Assistant side ----------------------------------------------------
+
+
+async def _async_start_hass(config_dir: str):
+    from homeassistant import bootstrap, config_entries, core, loader
+
+    hass = core.HomeAssistant(config_dir)
+    hass.config.skip_pip = True
+    loader.async_setup(hass)
+    # Created before the base functionality loads, which initializes it,
+    # as bootstrap.async_from_config_dict does.
+    hass.config_entries = config_entries.ConfigEntries(hass, {})
+    # Renamed from load_registries in Home Assistant 2024.2, which did not
+    # initialize the config entries yet.
+    load_base = getattr(bootstrap, "async_load_base_functionality", None)
+    if load_base is not None:
+        await load_base(hass)
+    else:
+        await bootstrap.load_registries(hass)
+        await hass.config_entries.async_initialize()
+    await hass.async_start()
+    return hass
+
+
+def _make_entry(
+    device_id: str,
+    port: int,
+    certs: TestCertificates,
+    sensor_config: list = SENSOR_CONFIG,
+):
+    from homeassistant.config_entries import ConfigEntry
+
+    kwargs = {
+        "version": 1,
+        "minor_version": 1,
+        "domain": DOMAIN,
+        "title": f"Device {device_id}",
+        "data": {
+            "host": BROKER_HOSTNAME,
+            "port": port,
+            "ca_cert": certs.ca_cert,
+            "client_cert": certs.client_cert,
+            "client_key": certs.client_key,
+            "device_id": device_id,
+            "sensor_config": sensor_config,
+            "device_type": "BENCH",
+        },
+        "options": {},
+        "source": "user",
+        "unique_id": device_id,
+        "discovery_keys": MappingProxyType({}),
+        "subentries_data": None,
+    }
+    parameters = inspect.signature(ConfigEntry).parameters
+    return ConfigEntry(**{k: v for k, v in kwargs.items() if k in parameters})
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _percentiles(values: list[float], scale: float = 1.0) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def rank(fraction: float) -> float:
+        index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+        return round(ordered[index] * scale, 3)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered) * scale, 3),
+        "p50": rank(0.50),
+        "p90": rank(0.90),
+        "p99": rank(0.99),
+        "max": round(ordered[-1] * scale, 3),
+    }
+
+
+async def _async_wait_connected(hass, entries) -> None:
+    deadline = time.monotonic() + CONNECT_TIMEOUT
+    while time.monotonic() < deadline:
+        data = hass.data.get(DOMAIN, {})
+        if all(
+            entry.entry_id in data
+            and all(
+                device.connected for device in data[entry.entry_id]["devices"].values()
+            )
+            for entry in entries
+        ):
+            return
+        await asyncio.sleep(0.05)
+    raise TimeoutError("Not every entry connected to the broker")
+
+
+async def async_run(args: argparse.Namespace) -> dict:
+    """Run one load test and return the results document."""
+    from homeassistant.const import EVENT_STATE_CHANGED, __version__ as ha_version
+    from homeassistant.core import callback
+    from homeassistant.helpers import entity_registry as er
+
+    certs = generate()
+    config = {
+        "devices": args.devices,
+        "rate": args.rate,
+        "duration": args.duration,
+        "burst_size": args.burst_size,
+        "burst_interval": args.burst_interval,
+        "v1_ratio": args.v1_ratio,
+        "seed": args.seed,
+    }
+
+    mp = multiprocessing.get_context("spawn")
+    conn, child_conn = mp.Pipe()
+    publisher = mp.Process(
+        target=_publisher_main, args=(child_conn, certs, config), daemon=True
+    )
+    publisher.start()
+    port = conn.recv()
+
+    loop = asyncio.get_running_loop()
+    with tempfile.TemporaryDirectory() as config_dir:
+        custom_components = Path(config_dir, "custom_components")
+        custom_components.mkdir()
+        (custom_components / DOMAIN).symlink_to(
+            REPO_ROOT / "custom_components" / DOMAIN
+        )
+
+        rss_start = _rss_mb()
+        threads_start = threading.active_count()
+        hass = await _async_start_hass(config_dir)
+
+        entries = [_make_entry(_device_id(i), port, certs) for i in range(args.devices)]
+        started = time.perf_counter()
+        await asyncio.gather(*(hass.config_entries.async_add(e) for e in entries))
+        setup_seconds = time.perf_counter() - started
+        await _async_wait_connected(hass, entries)
+        connect_seconds = time.perf_counter() - started
+
+        registry = er.async_get(hass)
+        tracked = {
+            entity.entity_id
+            for entity in registry.entities.values()
+            if entity.platform == DOMAIN
+        }
+        latencies: list[float] = []
+        writes = 0
+        t0 = 0.0
+
+        @callback
+        def async_state_changed(event) -> None:
+            nonlocal writes
+            new_state = event.data.get("new_state")
+            if new_state is None or new_state.entity_id not in tracked:
+                return
+            try:
+                published = t0 + float(new_state.state)
+            except ValueError:
+                return
+            writes += 1
+            latencies.append(time.time() - published)
+
+        loop_lag: list[float] = []
+        threads_max = threading.active_count()
+        rss_max = _rss_mb()
+
+        async def monitor() -> None:
+            nonlocal threads_max, rss_max
+            samples_per_tick = max(1, round(SAMPLE_INTERVAL / LOOP_LAG_INTERVAL))
+            tick = 0
+            while True:
+                before = loop.time()
+                await asyncio.sleep(LOOP_LAG_INTERVAL)
+                loop_lag.append(max(0.0, loop.time() - before - LOOP_LAG_INTERVAL))
+                tick += 1
+                if tick % samples_per_tick == 0:
+                    threads_max = max(threads_max, threading.active_count())
+                    rss_max = max(rss_max, _rss_mb())
+
+        unsub = hass.bus.async_listen(EVENT_STATE_CHANGED, async_state_changed)
+        monitor_task = asyncio.create_task(monitor())
+
+        conn.send("start")
+        t0 = await loop.run_in_executor(None, conn.recv)
+        publisher_stats = await loop.run_in_executor(None, conn.recv)
+        await asyncio.sleep(args.drain)
+
+        monitor_task.cancel()
+        unsub()
+        ingest = [hass.data[DOMAIN][entry.entry_id]["ingest"] for entry in entries]
+        received = sum(queue.received for queue in ingest)
+        dropped = sum(queue.dropped for queue in ingest)
+        rss_end = _rss_mb()
+        threads_end = threading.active_count()
+
+        for entry in entries:
+            await hass.config_entries.async_unload(entry.entry_id)
+        conn.send("stop")
+        await hass.async_stop(force=True)
+
+    publisher.join(timeout=10)
+
+    return {
+        "benchmark": "lmt_iot_load_test",
+        "schema_version": 1,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "homeassistant": ha_version,
+            "paho_mqtt": _package_version("paho-mqtt"),
+            "git_commit": _git_commit(),
+        },
+        "config": config,
+        "results": {
+            "setup_seconds": round(setup_seconds, 3),
+            "connect_seconds": round(connect_seconds, 3),
+            "published": publisher_stats["published"],
+            "received": received,
+            "dropped": dropped,
+            "state_writes": writes,
+            "publish_rate": round(publisher_stats["published"] / args.duration, 1),
+            "throughput": round(received / args.duration, 1),
+            "latency_ms": _percentiles(latencies, 1000),
+            "loop_lag_ms": _percentiles(loop_lag, 1000),
+            "threads": {"start": threads_start, "max": threads_max, "end": threads_end},
+            "rss_mb": {
+                "start": round(rss_start, 1),
+                "max": round(max(rss_max, rss_end), 1),
+                "end": round(rss_end, 1),
+            },
+        },
+    }
+
+
+def _package_version(name: str) -> str | None:
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return None
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--devices", type=int, default=50, help="config entries")
+    parser.add_argument(
+        "--rate", type=float, default=1.0, help="uplinks per second per device"
+    )
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds")
+    parser.add_argument(
+        "--burst-size", type=int, default=0, help="uplinks per device per burst"
+    )
+    parser.add_argument(
+        "--burst-interval", type=float, default=0.0, help="seconds between bursts"
+    )
+    parser.add_argument(
+        "--v1-ratio", type=float, default=0.5, help="share of devices sending V1"
+    )
+    parser.add_argument(
+        "--drain", type=float, default=2.0, help="seconds to wait after publishing"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    results = asyncio.run(async_run(args))
+
+    document = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(document + "\n")
+    else:
+        print(document)
+
+    summary = results["results"]
+    print(
+        f"{args.devices} devices: {summary['throughput']} msg/s received, "
+        f"latency p50 {summary['latency_ms'].get('p50')} ms "
+        f"p99 {summary['latency_ms'].get('p99')} ms, "
+        f"loop lag p99 {summary['loop_lag_ms'].get('p99')} ms, "
+        f"{summary['threads']['max']} threads, {summary['rss_mb']['max']} MB RSS",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""Replay captured LMT IoT uplinks through the integration offline.
+
+Reads a capture log written by the integration's **Capture raw uplinks to
+disk** option (rotated parts included) and feeds every uplink back through
+the uplink pipeline, either at the recorded pace or as fast as possible.
+
+By default a real Home Assistant core is started with one config entry per
+captured device, connected over mutual TLS to a local broker stand-in, and
+each uplink is handed to the device's MQTT message handler: deduplication,
+parsing, the ingest queue, dispatch and the sensor state writes all run as
+they do live. ``--parse-only`` does not start Home Assistant and only times
+``decode_uplink`` and ``parse_uplink_message``; with ``--batch`` it times
+one ``parse_uplink_batch`` call over the whole capture instead.
+
+    python benchmarks/replay.py ~/.homeassistant/lmt_iot/captures/<entry>.jsonl \
+        --speed 0 --output replay_output.json
+
+Results are written as JSON (see ``--output``); a one-line summary goes to
+stderr. Requires ``homeassistant`` and ``paho-mqtt``.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(BENCH_DIR))
+sys.path.insert(0, str(REPO_ROOT))
+
+from broker import Broker  # noqa: E402
+from certs import generate  # noqa: E402
+from custom_components.lmt_iot.capture import read_capture  # noqa: E402
+from custom_components.lmt_iot.parser import (  # noqa: E402
+    decode_uplink,
+    parse_uplink_batch,
+    parse_uplink_message,
+)
+from load_test import (  # noqa: E402
+    DOMAIN,
+    _async_start_hass,
+    _async_wait_connected,
+    _broker_ssl_context,
+    _git_commit,
+    _make_entry,
+    _package_version,
+    _percentiles,
+)
+
+# Uplinks replayed between yields to the event loop at maximum speed
+MAX_SPEED_CHUNK = 100
+
+
+def _derive_sensor_config(uplinks: list[tuple[float, str, str, bytes]]) -> list:
+    """Build a sensor for every key the captured uplinks carry."""
+    keys: dict[str, bool] = {}
+    for _, _, _, raw in uplinks:
+        try:
+            payload = decode_uplink(raw)
+            parsed = parse_uplink_message(payload) if payload else None
+        except (ValueError, KeyError, TypeError):
+            continue
+        for key, value in (parsed or {}).items():
+            numeric = isinstance(value, (int, float)) and not isinstance(value, bool)
+            keys[key] = keys.get(key, True) and numeric
+    return [
+        {"key": key, "name": key, **({"stateClass": "measurement"} if numeric else {})}
+        for key, numeric in keys.items()
+    ]
+
+
+async def _async_pace(uplinks, speed: float):
+    """Yield uplinks at the recorded pace divided by ``speed`` (0 = no pacing)."""
+    if not uplinks:
+        return
+    first = uplinks[0][0]
+    started = time.monotonic()
+    for index, uplink in enumerate(uplinks):
+        if speed > 0:
+            delay = (uplink[0] - first) / speed - (time.monotonic() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        elif index % MAX_SPEED_CHUNK == 0:
+            await asyncio.sleep(0)
+        yield uplink
+
+
+async def async_replay_parse(uplinks, speed: float) -> dict:
+    """Time decoding and parsing of every uplink, without Home Assistant."""
+    parse_times = []
+    failures = 0
+    started = time.perf_counter()
+    async for _, _, _, raw in _async_pace(uplinks, speed):
+        before = time.perf_counter()
+        try:
+            payload = decode_uplink(raw)
+            parsed = parse_uplink_message(payload) if payload else None
+        except (ValueError, KeyError, TypeError):
+            parsed = None
+        parse_times.append(time.perf_counter() - before)
+        if not parsed:
+            failures += 1
+    elapsed = time.perf_counter() - started
+    return {
+        "replayed": len(uplinks),
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(uplinks) / elapsed, 1) if elapsed else None,
+        "parse_failures": failures,
+        "parse_us": _percentiles(parse_times, 1_000_000),
+    }
+
+
+def replay_batch(uplinks) -> dict:
+    """Time parsing the whole capture as one columnar batch."""
+    payloads = [raw for _, _, _, raw in uplinks]
+    device_ids = [device_id for _, device_id, _, _ in uplinks]
+    started = time.perf_counter()
+    batch = parse_uplink_batch(payloads, device_ids, samples=True)
+    elapsed = time.perf_counter() - started
+    return {
+        "replayed": len(uplinks),
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(uplinks) / elapsed, 1) if elapsed else None,
+        "parse_failures": batch.failed,
+        "keys": len(batch.values),
+        "rows": sum(len(column) for column in batch.values.values()),
+        "sample_rows": sum(len(column) for column in batch.samples.values()),
+    }
+
+
+async def async_replay_hass(uplinks, speed: float, sensor_config: list) -> dict:
+    """Replay every uplink through the device pipelines of a real core."""
+    from homeassistant.const import EVENT_STATE_CHANGED
+    from homeassistant.core import callback
+
+    certs = generate()
+    broker = Broker()
+    port = await broker.start(ssl_context=_broker_ssl_context(certs))
+    device_ids = list(dict.fromkeys(device_id for _, device_id, _, _ in uplinks))
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        custom_components = Path(config_dir, "custom_components")
+        custom_components.mkdir()
+        (custom_components / DOMAIN).symlink_to(
+            REPO_ROOT / "custom_components" / DOMAIN
+        )
+        hass = await _async_start_hass(config_dir)
+
+        entries = [
+            _make_entry(device_id, port, certs, sensor_config)
+            for device_id in device_ids
+        ]
+        await asyncio.gather(*(hass.config_entries.async_add(e) for e in entries))
+        await _async_wait_connected(hass, entries)
+        devices = {
+            device_id: device
+            for entry in entries
+            for device_id, device in hass.data[DOMAIN][entry.entry_id][
+                "devices"
+            ].items()
+        }
+
+        writes = 0
+
+        @callback
+        def async_state_changed(event) -> None:
+            nonlocal writes
+            if event.data["entity_id"].startswith("sensor."):
+                writes += 1
+
+        unsub = hass.bus.async_listen(EVENT_STATE_CHANGED, async_state_changed)
+        started = time.perf_counter()
+        async for _, device_id, topic, raw in _async_pace(uplinks, speed):
+            devices[device_id]._on_message(topic, raw)
+        await hass.async_block_till_done()
+        elapsed = time.perf_counter() - started
+        unsub()
+
+        metrics = [device.metrics for device in devices.values()]
+        parse_failures: dict[str, int] = {}
+        for device_metrics in metrics:
+            for reason, count in device_metrics.parse_failures.items():
+                parse_failures[reason] = parse_failures.get(reason, 0) + count
+        ingest = [hass.data[DOMAIN][entry.entry_id]["ingest"] for entry in entries]
+
+        for entry in entries:
+            await hass.config_entries.async_unload(entry.entry_id)
+        await hass.async_stop(force=True)
+    await broker.stop()
+
+    return {
+        "replayed": len(uplinks),
+        "devices": len(device_ids),
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(uplinks) / elapsed, 1) if elapsed else None,
+        "duplicates": sum(m.duplicates for m in metrics),
+        "stale": sum(m.stale for m in metrics),
+        "parse_failures": parse_failures,
+        "ingested": sum(queue.received for queue in ingest),
+        "dropped": sum(queue.dropped for queue in ingest),
+        "state_writes": writes,
+        "suppressed_writes": sum(m.suppressed_writes for m in metrics),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "capture", help="capture log, e.g. lmt_iot/captures/<entry>.jsonl"
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=0.0,
+        help="multiple of the recorded pace (1 = real time, 0 = as fast as possible)",
+    )
+    parser.add_argument(
+        "--parse-only", action="store_true", help="only time decoding and parsing"
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="with --parse-only, parse the capture as one columnar batch",
+    )
+    parser.add_argument(
+        "--sensor-config",
+        help="JSON file with the sensor_config to create entities from "
+        "(default: one sensor per key seen in the capture)",
+    )
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    uplinks = list(read_capture(args.capture))
+    if not uplinks:
+        parser.error(f"no uplinks found in {args.capture}")
+
+    if args.batch and not args.parse_only:
+        parser.error("--batch requires --parse-only")
+
+    if args.parse_only and args.batch:
+        mode = "batch"
+        results = replay_batch(uplinks)
+    elif args.parse_only:
+        mode = "parse"
+        results = asyncio.run(async_replay_parse(uplinks, args.speed))
+    else:
+        mode = "hass"
+        if args.sensor_config:
+            sensor_config = json.loads(Path(args.sensor_config).read_text())
+        else:
+            sensor_config = _derive_sensor_config(uplinks)
+        results = asyncio.run(async_replay_hass(uplinks, args.speed, sensor_config))
+
+    from homeassistant.const import __version__ as ha_version
+
+    document = json.dumps(
+        {
+            "benchmark": "lmt_iot_replay",
+            "schema_version": 1,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "homeassistant": ha_version,
+                "paho_mqtt": _package_version("paho-mqtt"),
+                "git_commit": _git_commit(),
+            },
+            "config": {"capture": args.capture, "mode": mode, "speed": args.speed},
+            "results": results,
+        },
+        indent=2,
+    )
+    if args.output:
+        Path(args.output).write_text(document + "\n")
+    else:
+        print(document)
+
+    print(
+        f"{results['replayed']} uplinks replayed ({mode}) in {results['seconds']} s: "
+        f"{results['throughput']} uplinks/s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
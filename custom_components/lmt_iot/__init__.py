@@ -4,149 +4,193 @@ Developed by LMT IoT
 https://github.com/lmt-lv/lmt-iot-ha-integration
 """
 
+import asyncio
 import logging
-import ssl
-import tempfile
-import os
-import json
-from enum import IntEnum
-import aiohttp
+import time
+from collections.abc import Callable
+from typing import Any
+
+from homeassistant.components.persistent_notification import async_create
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
 from homeassistant.const import CONF_HOST, CONF_PORT
-from homeassistant.components.persistent_notification import async_create
-import paho.mqtt.client as mqtt
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 
-from .parser import parse_uplink_message
+from .account import LMTIoTAccount
+from .backfill import BACKFILL_TOPIC, async_get_backfill
+from .capture import UplinkCapture
 from .config import (
-    DOMAIN,
-    CONF_DEVICE_ID,
     CONF_API_KEY,
     CONF_CA_CERT,
+    CONF_CAPTURE_UPLINKS,
     CONF_CLIENT_CERT,
     CONF_CLIENT_KEY,
-    CONF_SENSOR_CONFIG,
+    CONF_DEVICE_ID,
     CONF_DEVICE_TYPE,
-    API_URL,
+    CONF_DEVICES,
+    CONF_ENTRY_TYPE,
+    CONF_FIRE_EVENTS,
+    CONF_OVERFLOW_POLICY,
+    CONF_PERSISTENT_SESSION,
+    CONF_SENSOR_CONFIG,
+    CONF_SENSOR_CONFIGS,
+    DEFAULT_CAPTURE_UPLINKS,
+    DEFAULT_FIRE_EVENTS,
+    DEFAULT_OVERFLOW_POLICY,
+    DEFAULT_PERSISTENT_SESSION,
+    DOMAIN,
+    ENTRY_TYPE_ACCOUNT,
+    INGEST_BATCH_SIZE,
+    INGEST_QUEUE_SIZE,
+    SIGNAL_DEVICES_ADDED,
+    SIGNAL_SENSORS_DISCOVERED,
+    SIGNAL_SENSORS_UPDATED,
 )
+from .descriptions import LMTIoTSensorDescription, async_get_sensor_descriptions
+from .device import LMTIoTDevice
+from .device_types import async_get_device_types
+from .ingest import UplinkIngestQueue
+from .parse_pool import async_shutdown_pool
+from .tls import async_forget_ssl_context
 
 _LOGGER = logging.getLogger(__name__)
 
 
-class MQTTConnectionResult(IntEnum):
-    """MQTT connection result codes."""
+class UplinkRouter:
+    """Route parsed uplink values to the entities subscribed to them.
 
-    SUCCESS = 0
-    INCORRECT_PROTOCOL = 1
-    INVALID_CLIENT_ID = 2
-    SERVER_UNAVAILABLE = 3
-    BAD_CREDENTIALS = 4
-    NOT_AUTHORIZED = 5
+    Listeners are indexed by device id and then by payload key, so a parsed
+    uplink only reaches the entities whose key it actually carries.
+    """
 
+    def __init__(self) -> None:
+        """Initialize an empty routing index."""
+        self._routes: dict[str, dict[str, list[Callable[[Any], None]]]] = {}
 
-async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    """Set up LMT IoT MQTT from a config entry."""
-    hass.data.setdefault(DOMAIN, {})
-    await _refresh_sensor_config(hass, entry)
-
-    def setup_mqtt_client():
-        """Set up MQTT client with TLS in executor."""
-        context = ssl.SSLContext(ssl.PROTOCOL_TLSv1_2)
-        context.check_hostname = True
-        context.verify_mode = ssl.CERT_REQUIRED
-        context.load_verify_locations(cadata=entry.data[CONF_CA_CERT])
-
-        cert_fd, cert_path = tempfile.mkstemp(suffix=".pem")
-        key_fd, key_path = tempfile.mkstemp(suffix=".key")
-
-        try:
-            os.chmod(cert_path, 0o600)
-            os.chmod(key_path, 0o600)
-
-            with os.fdopen(cert_fd, "w") as cert_file:
-                cert_file.write(entry.data[CONF_CLIENT_CERT])
-            with os.fdopen(key_fd, "w") as key_file:
-                key_file.write(entry.data[CONF_CLIENT_KEY])
-
-            context.load_cert_chain(certfile=cert_path, keyfile=key_path)
-        finally:
-            try:
-                os.unlink(cert_path)
-            except OSError:
-                pass
-            try:
-                os.unlink(key_path)
-            except OSError:
-                pass
-
-        client = mqtt.Client(
-            client_id=entry.data[CONF_DEVICE_ID], protocol=mqtt.MQTTv311
-        )
-        client.tls_set_context(context)
-        client.tls_insecure_set(False)
-        client.reconnect_delay_set(min_delay=1, max_delay=120)
-
-        def on_connect(client, userdata, flags, rc):
-            if rc == MQTTConnectionResult.SUCCESS:
-                _LOGGER.info("Connected to LMT IoT Cloud")
-                device_id = entry.data[CONF_DEVICE_ID]
-                topic = f"things/{device_id}/telemetry"
-                client.subscribe(topic)
-                _LOGGER.info(f"Subscribed to topic: {topic}")
-            else:
-                _LOGGER.error(
-                    f"Failed to connect to LMT IoT Cloud: {MQTTConnectionResult(rc).name} (rc={rc})"
-                )
-
-        def on_message(client, userdata, msg):
-            _LOGGER.debug(f"Received message on {msg.topic}: {msg.payload.decode()}")
-            try:
-                payload = json.loads(msg.payload.decode())
-                parsed = parse_uplink_message(payload)
-
-                if parsed:
-                    hass.bus.fire(
-                        f"{DOMAIN}_uplink_message",
-                        {
-                            "device_id": entry.data[CONF_DEVICE_ID],
-                            "topic": msg.topic,
-                            "payload": parsed,
-                        },
-                    )
-                    _LOGGER.debug(f"Parsed data: {parsed}")
-            except (json.JSONDecodeError, KeyError, ValueError, TypeError) as e:
-                _LOGGER.error(f"Error parsing message: {e}")
-
-        def on_disconnect(client, userdata, rc):
-            if rc != 0:
-                _LOGGER.warning(
-                    f"Disconnected from LMT IoT Cloud: rc={rc}, will auto-reconnect"
-                )
-            else:
-                _LOGGER.info("Disconnected from LMT IoT Cloud")
-
-        def on_subscribe(client, userdata, mid, granted_qos):
-            _LOGGER.debug(f"Subscription confirmed: mid={mid}, qos={granted_qos}")
-
-        client.on_connect = on_connect
-        client.on_message = on_message
-        client.on_disconnect = on_disconnect
-        client.on_subscribe = on_subscribe
+    @callback
+    def async_subscribe(
+        self, device_id: str, key: str, listener: Callable[[Any], None]
+    ) -> Callable[[], None]:
+        """Register a listener for one key of one device."""
+        device_routes = self._routes.setdefault(device_id, {})
+        listeners = device_routes.setdefault(key, [])
+        listeners.append(listener)
 
-        _LOGGER.info(
-            f"Connecting to {entry.data[CONF_HOST]}:{entry.data.get(CONF_PORT, 8883)} as {entry.data[CONF_DEVICE_ID]}"
-        )
-        client.connect(entry.data[CONF_HOST], entry.data.get(CONF_PORT, 8883))
-        _LOGGER.debug("Starting MQTT loop...")
-        client.loop_start()
-        return {"client": client}
+        @callback
+        def unsubscribe() -> None:
+            listeners.remove(listener)
+            if not listeners:
+                device_routes.pop(key, None)
+            if not device_routes:
+                self._routes.pop(device_id, None)
+
+        return unsubscribe
+
+    @callback
+    def async_dispatch(self, device_id: str, payload: dict) -> None:
+        """Deliver each value in a parsed payload to its listeners."""
+        device_routes = self._routes.get(device_id)
+        if not device_routes:
+            return
+
+        for key, value in payload.items():
+            listeners = device_routes.get(key)
+            if listeners:
+                for listener in listeners:
+                    listener(value)
 
-    data = await hass.async_add_executor_job(setup_mqtt_client)
 
-    hass.data[DOMAIN][entry.entry_id] = data
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Set up LMT IoT MQTT from a config entry."""
+    hass.data.setdefault(DOMAIN, {})
+    router = UplinkRouter()
+    backfill = await async_get_backfill(hass)
+    devices: dict[str, LMTIoTDevice] = {}
+
+    @callback
+    def async_handle_uplink(
+        device_id: str, topic: str, parsed: dict, samples: dict | None
+    ) -> None:
+        """Route a parsed uplink on the event loop."""
+        device = devices.get(device_id)
+        if device is None:
+            return
+        # Backfilled values only prime entity state and statistics: they were
+        # not heard live, so they are not aggregated or fired as events.
+        live = topic != BACKFILL_TOPIC
+        discovered = device.async_discover_keys(parsed)
+        if live:
+            backfill.async_seen(device_id)
+            device.availability.async_seen()
+            device.aggregates.async_add(parsed, time.monotonic())
+        if discovered:
+            # Added without a reload; the new sensors start from ``parsed``.
+            async_dispatcher_send(
+                hass,
+                SIGNAL_SENSORS_DISCOVERED.format(entry.entry_id),
+                device,
+                parsed,
+            )
+        router.async_dispatch(device_id, parsed)
+        if samples and device.statistics is not None:
+            device.statistics.async_add_samples(samples)
+        if live and data["fire_events"]:
+            hass.bus.async_fire(
+                f"{DOMAIN}_uplink_message",
+                {
+                    "device_id": device_id,
+                    "topic": topic,
+                    "payload": parsed,
+                },
+            )
+
+    ingest = UplinkIngestQueue(
+        hass,
+        async_handle_uplink,
+        maxsize=INGEST_QUEUE_SIZE,
+        batch_size=INGEST_BATCH_SIZE,
+        overflow_policy=entry.options.get(
+            CONF_OVERFLOW_POLICY, DEFAULT_OVERFLOW_POLICY
+        ),
+        backpressure=entry.options.get(
+            CONF_PERSISTENT_SESSION, DEFAULT_PERSISTENT_SESSION
+        ),
+    )
 
-    # Set up sensor platform
+    data = hass.data[DOMAIN][entry.entry_id] = {
+        "router": router,
+        "ingest": ingest,
+        "backfill": backfill,
+        "capture": _async_start_capture(hass, entry),
+        "devices": devices,
+        "account": None,
+        "fire_events": entry.options.get(CONF_FIRE_EVENTS, DEFAULT_FIRE_EVENTS),
+        # What the running connections and options were set up from, to
+        # tell what an entry update changed
+        "connection": _connection_settings(entry),
+        "options": dict(entry.options),
+        "api_key": entry.data.get(CONF_API_KEY),
+    }
+
+    # Entities are created from the cached config right away; connections
+    # and the API refresh complete in the background.
+    for device_id in _entry_devices(entry):
+        devices[device_id] = _create_device(hass, entry, device_id, data)
     await hass.config_entries.async_forward_entry_setups(entry, ["sensor"])
+    for device in devices.values():
+        device.async_start()
+
+    entry.async_on_unload(entry.add_update_listener(_async_entry_updated))
+    if entry.data.get(CONF_ENTRY_TYPE) == ENTRY_TYPE_ACCOUNT:
+        data["account"] = LMTIoTAccount(hass, entry)
+        data["account"].async_start()
+    else:
+        entry.async_create_background_task(
+            hass,
+            _refresh_sensor_config(hass, entry),
+            f"{DOMAIN} sensor config refresh {entry.entry_id}",
+        )
 
     return True
 
@@ -157,13 +201,212 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     if unload_ok:
         data = hass.data[DOMAIN].pop(entry.entry_id)
-        client = data["client"]
-        await hass.async_add_executor_job(client.loop_stop)
-        await hass.async_add_executor_job(client.disconnect)
+        if data["account"] is not None:
+            data["account"].async_stop()
+        await asyncio.gather(
+            *(device.async_stop() for device in data["devices"].values())
+        )
+        data["ingest"].clear()
+        if data["capture"] is not None:
+            await data["capture"].async_stop()
+        if not hass.data[DOMAIN]:
+            async_shutdown_pool(hass)
 
     return unload_ok
 
 
+@callback
+def _async_start_capture(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> UplinkCapture | None:
+    if not entry.options.get(CONF_CAPTURE_UPLINKS, DEFAULT_CAPTURE_UPLINKS):
+        return None
+    capture = UplinkCapture(
+        hass, hass.config.path(DOMAIN, "captures", f"{entry.entry_id}.jsonl")
+    )
+    capture.async_start()
+    return capture
+
+
+def _connection_settings(entry: ConfigEntry) -> tuple:
+    """Return the entry settings every device's connection depends on."""
+    return (
+        entry.data[CONF_HOST],
+        entry.data.get(CONF_PORT),
+        entry.data[CONF_CA_CERT],
+        entry.options.get(CONF_PERSISTENT_SESSION, DEFAULT_PERSISTENT_SESSION),
+    )
+
+
+def _certificates(credentials: dict) -> tuple[str, str]:
+    return credentials[CONF_CLIENT_CERT], credentials[CONF_CLIENT_KEY]
+
+
+def _entry_devices(entry: ConfigEntry) -> dict[str, dict]:
+    """Return {device id: type and credentials} for either kind of entry."""
+    if entry.data.get(CONF_ENTRY_TYPE) == ENTRY_TYPE_ACCOUNT:
+        return entry.data.get(CONF_DEVICES, {})
+    return {entry.data[CONF_DEVICE_ID]: entry.data}
+
+
+def _device_descriptions(
+    hass: HomeAssistant, entry: ConfigEntry, device: dict
+) -> tuple[LMTIoTSensorDescription, ...]:
+    device_type = device[CONF_DEVICE_TYPE]
+    if entry.data.get(CONF_ENTRY_TYPE) == ENTRY_TYPE_ACCOUNT:
+        sensor_config = entry.data.get(CONF_SENSOR_CONFIGS, {}).get(device_type, [])
+    else:
+        sensor_config = entry.data.get(CONF_SENSOR_CONFIG, [])
+    return async_get_sensor_descriptions(hass, device_type, sensor_config)
+
+
+def _create_device(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    device_id: str,
+    data: dict[str, Any],
+) -> LMTIoTDevice:
+    device = _entry_devices(entry)[device_id]
+    return LMTIoTDevice(
+        hass,
+        entry,
+        device_id,
+        device[CONF_DEVICE_TYPE],
+        _device_descriptions(hass, entry, device),
+        device,
+        data["ingest"],
+        data["backfill"],
+        data["capture"],
+    )
+
+
+async def _async_entry_updated(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Apply changed entry data and options to the running entry in place.
+
+    Devices and sensors are diffed against what is running: only devices
+    that were added or removed are connected or torn down, only devices
+    whose broker settings or certificates changed reconnect, and only
+    devices whose sensor config or options changed have their entities
+    updated. Everything else, API key included, is applied without
+    touching the MQTT connections.
+    """
+    data = hass.data[DOMAIN].get(entry.entry_id)
+    if data is None:
+        return
+    devices: dict[str, LMTIoTDevice] = data["devices"]
+    wanted = _entry_devices(entry)
+
+    options_changed = dict(entry.options) != data["options"]
+    if options_changed:
+        await _async_apply_options(hass, entry, data)
+
+    api_key = entry.data.get(CONF_API_KEY)
+    if api_key != data["api_key"]:
+        data["api_key"] = api_key
+        _async_refresh_from_api(hass, entry, data)
+
+    connection = _connection_settings(entry)
+    reconnect_all = connection != data["connection"]
+    data["connection"] = connection
+
+    removed = [
+        devices.pop(device_id) for device_id in list(devices) if device_id not in wanted
+    ]
+    updated = []
+    reconnect = []
+    for device_id, device in devices.items():
+        credentials = wanted[device_id]
+        descriptions = _device_descriptions(hass, entry, credentials)
+        if descriptions is not device.descriptions:
+            device.async_set_descriptions(descriptions)
+            updated.append(device)
+        elif options_changed:
+            updated.append(device)
+        if reconnect_all or _certificates(credentials) != device.certificates:
+            reconnect.append((device, credentials))
+    added = []
+    for device_id in wanted:
+        if device_id not in devices:
+            devices[device_id] = _create_device(hass, entry, device_id, data)
+            added.append(devices[device_id])
+
+    if updated:
+        async_dispatcher_send(
+            hass, SIGNAL_SENSORS_UPDATED.format(entry.entry_id), updated
+        )
+    if added:
+        async_dispatcher_send(hass, SIGNAL_DEVICES_ADDED.format(entry.entry_id), added)
+        for device in added:
+            device.async_start()
+    if reconnect:
+        _LOGGER.info(
+            f"Reconnecting {len(reconnect)} device(s) with changed connection settings"
+        )
+        await asyncio.gather(
+            *(device.async_reconnect(credentials) for device, credentials in reconnect)
+        )
+    if removed:
+        await _async_remove_devices(hass, entry, removed)
+
+
+@callback
+def _async_refresh_from_api(
+    hass: HomeAssistant, entry: ConfigEntry, data: dict[str, Any]
+) -> None:
+    """Refresh the device list or sensor config in the background."""
+    if data["account"] is not None:
+        refresh = data["account"].async_sync()
+    else:
+        refresh = _refresh_sensor_config(hass, entry)
+    entry.async_create_background_task(
+        hass, refresh, f"{DOMAIN} API refresh {entry.entry_id}"
+    )
+
+
+async def _async_apply_options(
+    hass: HomeAssistant, entry: ConfigEntry, data: dict[str, Any]
+) -> None:
+    """Apply changed options to the entry's runtime and devices."""
+    previous = data["options"]
+    options = data["options"] = dict(entry.options)
+    data["fire_events"] = options.get(CONF_FIRE_EVENTS, DEFAULT_FIRE_EVENTS)
+    data["ingest"].set_overflow_policy(
+        options.get(CONF_OVERFLOW_POLICY, DEFAULT_OVERFLOW_POLICY),
+        backpressure=options.get(CONF_PERSISTENT_SESSION, DEFAULT_PERSISTENT_SESSION),
+    )
+
+    capture_key = (CONF_CAPTURE_UPLINKS, DEFAULT_CAPTURE_UPLINKS)
+    if options.get(*capture_key) != previous.get(*capture_key):
+        if data["capture"] is not None:
+            await data["capture"].async_stop()
+        data["capture"] = _async_start_capture(hass, entry)
+
+    for device in data["devices"].values():
+        device.async_apply_options(data["capture"])
+
+
+async def _async_remove_devices(
+    hass: HomeAssistant, entry: ConfigEntry, devices: list[LMTIoTDevice]
+) -> None:
+    """Disconnect removed devices and remove them with their entities."""
+    await asyncio.gather(*(device.async_stop() for device in devices))
+    device_registry = dr.async_get(hass)
+    for device in devices:
+        async_forget_ssl_context(hass, entry, device.device_id)
+        device_entry = device_registry.async_get_device(
+            identifiers={(DOMAIN, device.device_id)}
+        )
+        if device_entry is not None:
+            device_registry.async_update_device(
+                device_entry.id, remove_config_entry_id=entry.entry_id
+            )
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Forget state kept for a removed config entry."""
+    async_forget_ssl_context(hass, entry)
+
+
 def _notify_reload_fallback(
     hass: HomeAssistant, entry: ConfigEntry, reason: str
 ) -> None:
@@ -173,7 +416,7 @@ def _notify_reload_fallback(
         f"Failed to refresh sensor configuration for device **{device_id}**: {reason}.\n\n"
         "Your API key may have been deleted or disabled. "
         "You can provide a new one via **Settings → Devices & Services → LMT IoT → Configure**.\n\n"
-        "The integration was reloaded with the previously cached configuration.",
+        "The device keeps running with the previously cached configuration.",
         title="LMT IoT: Sensor config refresh failed",
         notification_id=f"{DOMAIN}_reload_{entry.entry_id}",
     )
@@ -187,36 +430,23 @@ async def _refresh_sensor_config(hass: HomeAssistant, entry: ConfigEntry) -> Non
         return
 
     try:
-        async with aiohttp.ClientSession() as session:
-            headers = {"X-API-KEY": api_key}
-            async with session.get(
-                f"{API_URL}/devices/types/{device_type}",
-                headers=headers,
-                timeout=aiohttp.ClientTimeout(total=30),
-            ) as response:
-                if response.status == 200:
-                    type_data = await response.json()
-                    sensors = (
-                        (type_data.get("measurements") or {}).get("smartHome") or {}
-                    ).get("sensors", [])
-                    new_data = {**entry.data, CONF_SENSOR_CONFIG: sensors}
-                    hass.config_entries.async_update_entry(entry, data=new_data)
-                    _LOGGER.info(
-                        "Refreshed sensor config from API (%d sensors)", len(sensors)
-                    )
-                else:
-                    _LOGGER.warning(
-                        "Failed to refresh sensor config: HTTP %s", response.status
-                    )
-                    _notify_reload_fallback(
-                        hass, entry, f"API returned HTTP {response.status}"
-                    )
+        device_types = await async_get_device_types(hass)
+        type_info = await device_types.async_get(device_type, api_key)
     except Exception as e:
         _LOGGER.warning("Failed to refresh sensor config: %s", e)
         _notify_reload_fallback(hass, entry, str(e))
+        return
+
+    sensors = type_info["sensors"]
+    if sensors == entry.data.get(CONF_SENSOR_CONFIG):
+        _LOGGER.debug("Sensor config unchanged (%d sensors)", len(sensors))
+        return
+
+    new_data = {**entry.data, CONF_SENSOR_CONFIG: sensors}
+    hass.config_entries.async_update_entry(entry, data=new_data)
+    _LOGGER.info("Refreshed sensor config from API (%d sensors)", len(sensors))
 
 
 async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
-    """Reload config entry."""
-    await async_unload_entry(hass, entry)
-    await async_setup_entry(hass, entry)
+    """Reload a config entry, reconnecting only what its changes require."""
+    await _async_entry_updated(hass, entry)
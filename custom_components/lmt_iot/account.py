@@ -0,0 +1,150 @@
+"""Account entries: keep a whole fleet of devices in step with the account."""
+
+import asyncio
+import logging
+from collections.abc import Callable
+from datetime import datetime, timedelta
+
+import aiohttp
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .api import LMTIoTApiError
+from .config import (
+    ACCOUNT_SYNC_INTERVAL,
+    CONF_ALL_DEVICES,
+    CONF_API_KEY,
+    CONF_DEVICE_TYPE,
+    CONF_DEVICES,
+    CONF_SELECTED_DEVICES,
+    CONF_SENSOR_CONFIGS,
+    DOMAIN,
+)
+from .discovery import async_discover_devices, async_provision_devices
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@callback
+def async_managed_device_ids(
+    hass: HomeAssistant, exclude: ConfigEntry | None = None
+) -> set[str]:
+    """Return the devices already set up by any entry other than ``exclude``."""
+    managed = set()
+    for entry in hass.config_entries.async_entries(DOMAIN):
+        if entry is exclude:
+            continue
+        if CONF_DEVICES in entry.data:
+            managed.update(entry.data[CONF_DEVICES])
+        elif entry.unique_id:
+            managed.add(entry.unique_id)
+    return managed
+
+
+class LMTIoTAccount:
+    """Add and remove an account entry's devices as the account changes.
+
+    The device list is fetched once per sync and compared with the entry.
+    Only devices that appeared are provisioned; the updated entry data is
+    then applied to the running devices by the entry's update listener.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+        """Initialize the account coordinator."""
+        self._hass = hass
+        self._entry = entry
+        self._lock = asyncio.Lock()
+        self._unsub_interval: Callable[[], None] | None = None
+
+    @callback
+    def async_start(self) -> None:
+        """Sync now in the background and then periodically."""
+        self._unsub_interval = async_track_time_interval(
+            self._hass,
+            self._async_scheduled_sync,
+            timedelta(seconds=ACCOUNT_SYNC_INTERVAL),
+        )
+        self._entry.async_create_background_task(
+            self._hass, self.async_sync(), f"{DOMAIN} account sync"
+        )
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop the periodic sync."""
+        if self._unsub_interval is not None:
+            self._unsub_interval()
+            self._unsub_interval = None
+
+    async def _async_scheduled_sync(self, now: datetime) -> None:
+        await self.async_sync()
+
+    async def async_sync(self) -> None:
+        """Bring the entry's devices in line with the account's device list."""
+        if self._lock.locked():
+            return
+        async with self._lock:
+            try:
+                await self._async_sync()
+            except (TimeoutError, aiohttp.ClientError, LMTIoTApiError) as e:
+                _LOGGER.warning(
+                    f"Failed to refresh the device list of {self._entry.title}: {e}"
+                )
+
+    async def _async_sync(self) -> None:
+        entry = self._entry
+        api_key = entry.data[CONF_API_KEY]
+        listing, type_info = await async_discover_devices(self._hass, api_key)
+        listed = {device["serialNumber"]: device["type"] for device in listing}
+        known: dict[str, dict] = entry.data.get(CONF_DEVICES, {})
+
+        if entry.data.get(CONF_ALL_DEVICES):
+            candidates = set(listed)
+        else:
+            candidates = set(entry.data.get(CONF_SELECTED_DEVICES, [])) & set(listed)
+        managed_elsewhere = async_managed_device_ids(self._hass, exclude=entry)
+        missing = [
+            device_id
+            for device_id in candidates
+            if device_id not in known
+            and device_id not in managed_elsewhere
+            and (type_info.get(listed[device_id]) or {}).get("enabled")
+        ]
+        removed = [device_id for device_id in known if device_id not in listed]
+
+        credentials = await async_provision_devices(self._hass, api_key, missing)
+        added = {
+            device_id: {CONF_DEVICE_TYPE: listed[device_id], **device_credentials}
+            for device_id, device_credentials in credentials.items()
+        }
+        devices = {
+            device_id: device
+            for device_id, device in known.items()
+            if device_id not in removed
+        }
+        devices.update(added)
+
+        sensor_configs = {}
+        old_sensor_configs = entry.data.get(CONF_SENSOR_CONFIGS, {})
+        for device_type in {device[CONF_DEVICE_TYPE] for device in devices.values()}:
+            info = type_info.get(device_type)
+            sensor_configs[device_type] = (
+                info["sensors"] if info else old_sensor_configs.get(device_type, [])
+            )
+
+        if not added and not removed and sensor_configs == old_sensor_configs:
+            _LOGGER.debug(f"Devices of {entry.title} unchanged ({len(devices)})")
+            return
+
+        self._hass.config_entries.async_update_entry(
+            entry,
+            data={
+                **entry.data,
+                CONF_DEVICES: devices,
+                CONF_SENSOR_CONFIGS: sensor_configs,
+            },
+        )
+        _LOGGER.info(
+            f"Synced devices of {entry.title}: {len(added)} added, "
+            f"{len(removed)} removed, {len(devices)} total"
+        )
@@ -0,0 +1,150 @@
+"""Rolling windowed aggregates of uplink values for derived sensors."""
+
+from collections import deque
+from typing import Any
+
+from homeassistant.core import callback
+
+from .config import AGGREGATE_MAX_SAMPLES
+
+# sensor_config key listing a sensor's derived aggregates, with the option
+# override format ``{"<sensor key>": {"mean": 900, "max": [900, 3600]}}``.
+AGGREGATES_KEY = "aggregates"
+AGGREGATE_STATS = ("mean", "min", "max", "rate")
+
+AggregateSpecs = tuple[tuple[str, int], ...]
+
+
+def parse_aggregates(config: Any) -> AggregateSpecs | None:
+    """Return sorted (stat, window seconds) pairs, or None if invalid."""
+    if not isinstance(config, dict):
+        return None
+    specs = set()
+    for stat, windows in config.items():
+        if stat not in AGGREGATE_STATS:
+            return None
+        if not isinstance(windows, list):
+            windows = [windows]
+        for window in windows:
+            if isinstance(window, bool) or not isinstance(window, int) or window <= 0:
+                return None
+            specs.add((stat, window))
+    return tuple(sorted(specs))
+
+
+def derived_key(key: str, stat: str, window: int) -> str:
+    """Return the entity key of one aggregate of a sensor."""
+    return f"{key}_{stat}_{window}"
+
+
+class RollingWindow:
+    """Mean, min, max and rate of change over the last ``window`` seconds.
+
+    Samples are kept in a ring buffer of at most ``AGGREGATE_MAX_SAMPLES``
+    entries, so memory stays bounded however often a device reports. Each
+    sample is added and evicted in amortized O(1): the mean comes from a
+    running sum, min and max from monotonic queues.
+    """
+
+    __slots__ = ("_max", "_min", "_samples", "_sum", "window")
+
+    def __init__(self, window: int) -> None:
+        """Initialize an empty window."""
+        self.window = window
+        self._samples: deque[tuple[float, float]] = deque()
+        self._sum = 0.0
+        self._min: deque[tuple[float, float]] = deque()
+        self._max: deque[tuple[float, float]] = deque()
+
+    def add(self, now: float, value: float) -> None:
+        """Add a sample taken at monotonic time ``now``."""
+        sample = (now, value)
+        if len(self._samples) >= AGGREGATE_MAX_SAMPLES:
+            self._pop()
+        self._samples.append(sample)
+        self._sum += value
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append(sample)
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append(sample)
+        self._evict(now)
+
+    def value(self, stat: str, now: float) -> float | None:
+        """Return an aggregate of the samples still inside the window."""
+        self._evict(now)
+        samples = self._samples
+        if not samples:
+            return None
+        if stat == "mean":
+            return self._sum / len(samples)
+        if stat == "min":
+            return self._min[0][1]
+        if stat == "max":
+            return self._max[0][1]
+        (first, first_value), (last, last_value) = samples[0], samples[-1]
+        if last <= first:
+            return None
+        return (last_value - first_value) / (last - first) * 3600
+
+    def _evict(self, now: float) -> None:
+        cutoff = now - self.window
+        while self._samples and self._samples[0][0] < cutoff:
+            self._pop()
+
+    def _pop(self) -> None:
+        sample = self._samples.popleft()
+        if self._samples:
+            self._sum -= sample[1]
+        else:
+            # Start over from zero so rounding errors cannot accumulate.
+            self._sum = 0.0
+        if self._min[0] is sample:
+            self._min.popleft()
+        if self._max[0] is sample:
+            self._max.popleft()
+
+
+class DeviceAggregates:
+    """A device's rolling windows, fed with every live uplink.
+
+    There is one window per sensor key and window length, shared by every
+    statistic computed over it.
+    """
+
+    def __init__(self, specs: dict[str, AggregateSpecs]) -> None:
+        """Initialize the windows of ``specs``."""
+        self.specs: dict[str, AggregateSpecs] = {}
+        self._windows: dict[str, dict[int, RollingWindow]] = {}
+        self.async_set_specs(specs)
+
+    @callback
+    def async_set_specs(self, specs: dict[str, AggregateSpecs]) -> None:
+        """Switch to changed aggregates, keeping windows that still apply."""
+        windows = {}
+        for key, key_specs in specs.items():
+            current = self._windows.get(key, {})
+            windows[key] = {
+                window: current.get(window) or RollingWindow(window)
+                for _, window in key_specs
+            }
+        self.specs = specs
+        self._windows = windows
+
+    @callback
+    def async_add(self, parsed: dict, now: float) -> None:
+        """Add the numeric values of a parsed uplink to their windows."""
+        if not self._windows:
+            return
+        for key, windows in self._windows.items():
+            value = parsed.get(key)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            for window in windows.values():
+                window.add(now, value)
+
+    def value(self, key: str, stat: str, window: int, now: float) -> float | None:
+        """Return one aggregate, or None while its window is empty."""
+        rolling = self._windows.get(key, {}).get(window)
+        return rolling.value(stat, now) if rolling is not None else None
@@ -0,0 +1,151 @@
+"""Shared HTTP client for the LMT IoT API."""
+
+import asyncio
+import logging
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any
+
+import aiohttp
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from yarl import URL
+
+from .config import (
+    API_HOST_CONCURRENCY,
+    API_RETRIES,
+    API_RETRY_BACKOFF,
+    API_TIMEOUT,
+    API_URL,
+    DOMAIN,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_API = f"{DOMAIN}_api"
+
+
+class LMTIoTApiError(HomeAssistantError):
+    """The LMT IoT API answered with an error status."""
+
+    def __init__(self, status: int, url: str) -> None:
+        """Initialize the error."""
+        super().__init__(f"API returned HTTP {status} for {url}")
+        self.status = status
+
+
+@dataclass(slots=True)
+class ApiResponse:
+    """Status, headers and decoded body of an API response.
+
+    ``data`` is the undecoded body as bytes for requests made with ``raw``.
+    """
+
+    url: str
+    status: int
+    headers: Mapping[str, str]
+    data: Any
+
+    def raise_for_status(self) -> None:
+        """Raise LMTIoTApiError for 4xx and 5xx responses."""
+        if self.status >= 400:
+            raise LMTIoTApiError(self.status, self.url)
+
+
+@callback
+def async_get_api(hass: HomeAssistant) -> "LMTIoTApiClient":
+    """Return the API client shared by config flows and config entries."""
+    api = hass.data.get(DATA_API)
+    if api is None:
+        api = hass.data[DATA_API] = LMTIoTApiClient(hass)
+    return api
+
+
+class LMTIoTApiClient:
+    """LMT IoT API client on Home Assistant's pooled aiohttp session.
+
+    Requests reuse keep-alive connections across flows and entries, are
+    limited to ``API_HOST_CONCURRENCY`` in flight per host and share one
+    default timeout. Idempotent requests are retried with exponential
+    backoff on 5xx responses, timeouts and connection errors.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the client."""
+        self._session = async_get_clientsession(hass)
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+    async def async_request(
+        self,
+        method: str,
+        path: str,
+        api_key: str | None = None,
+        *,
+        params: Mapping[str, Any] | None = None,
+        json: Any = None,
+        headers: Mapping[str, str] | None = None,
+        timeout: float = API_TIMEOUT,
+        retry: bool | None = None,
+        raw: bool = False,
+    ) -> ApiResponse:
+        """Send a request and return the response, whatever its status.
+
+        ``path`` is relative to the API URL unless it is an absolute URL.
+        Retries default to on for GET requests only. Connection errors and
+        timeouts of the last attempt are raised to the caller. With ``raw``
+        the body is returned undecoded, for callers that decode it off the
+        event loop.
+        """
+        url = path if "://" in path else f"{API_URL}{path}"
+        request_headers = dict(headers or {})
+        if api_key is not None:
+            request_headers["X-API-KEY"] = api_key
+        if retry is None:
+            retry = method == "GET"
+        retries = API_RETRIES if retry else 0
+        semaphore = self._semaphores.setdefault(
+            URL(url).host or "", asyncio.Semaphore(API_HOST_CONCURRENCY)
+        )
+
+        attempt = 0
+        while True:
+            try:
+                async with (
+                    semaphore,
+                    self._session.request(
+                        method,
+                        url,
+                        params=params,
+                        json=json,
+                        headers=request_headers,
+                        timeout=aiohttp.ClientTimeout(total=timeout),
+                    ) as response,
+                ):
+                    if response.status < 500 or attempt >= retries:
+                        return ApiResponse(
+                            url,
+                            response.status,
+                            response.headers,
+                            await response.read()
+                            if raw
+                            else await self._async_read(response),
+                        )
+                    reason = f"HTTP {response.status}"
+            except (TimeoutError, aiohttp.ClientConnectionError) as e:
+                if attempt >= retries:
+                    raise
+                reason = str(e) or type(e).__name__
+
+            delay = API_RETRY_BACKOFF * 2**attempt
+            attempt += 1
+            _LOGGER.debug(f"{method} {url} failed ({reason}), retrying in {delay}s")
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    async def _async_read(response: aiohttp.ClientResponse) -> Any:
+        if response.status in (204, 304):
+            return None
+        if "json" in response.content_type:
+            return await response.json()
+        return await response.text()
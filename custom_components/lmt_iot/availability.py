@@ -0,0 +1,165 @@
+"""Per-device availability watchdog for LMT IoT devices."""
+
+import logging
+import time
+from collections.abc import Callable, Iterable
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .config import (
+    AVAILABILITY_MIN_SAMPLES,
+    AVAILABILITY_MIN_TIMEOUT,
+    AVAILABILITY_SMOOTHING,
+    DEFAULT_AVAILABILITY_TIMEOUT,
+)
+from .descriptions import LMTIoTSensorDescription
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _configured_timeout(descriptions: Iterable[LMTIoTSensorDescription]) -> float:
+    return max(
+        (description.availability_timeout for description in descriptions),
+        default=DEFAULT_AVAILABILITY_TIMEOUT,
+    )
+
+
+class DeviceAvailability:
+    """Mark all of a device's entities unavailable when its uplinks stop.
+
+    The device's reporting interval is learned as an exponential moving
+    average, and the device is considered stale after ``multiplier`` times
+    that interval. Until enough uplinks have been seen, the sensors'
+    ``availabilityTimeout`` is used instead.
+
+    There is a single timer per device, and uplinks normally leave it alone:
+    when it fires before the deadline it simply re-arms for the remaining
+    time.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        device_id: str,
+        descriptions: Iterable[LMTIoTSensorDescription],
+        multiplier: float,
+    ) -> None:
+        """Initialize the watchdog."""
+        self._hass = hass
+        self._device_id = device_id
+        self._multiplier = multiplier
+        self._fallback_timeout = _configured_timeout(descriptions)
+        self._listeners: list[Callable[[], None]] = []
+        self._last_seen = time.monotonic()
+        self._last_uplink: float | None = None
+        self._interval: float | None = None
+        self._samples = 0
+        self._unsub_timer: CALLBACK_TYPE | None = None
+        self._armed_until = 0.0
+        self.available = True
+
+    @property
+    def interval(self) -> float | None:
+        """Return the learned reporting interval in seconds."""
+        return self._interval
+
+    @property
+    def timeout(self) -> float:
+        """Return how long the device may stay silent before it is stale."""
+        if self._interval is None or self._samples < AVAILABILITY_MIN_SAMPLES:
+            return self._fallback_timeout
+        return max(self._interval * self._multiplier, AVAILABILITY_MIN_TIMEOUT)
+
+    @callback
+    def async_set_descriptions(
+        self, descriptions: Iterable[LMTIoTSensorDescription]
+    ) -> None:
+        """Take the fallback timeout from a changed sensor config."""
+        self._fallback_timeout = _configured_timeout(descriptions)
+
+    @callback
+    def async_set_multiplier(self, multiplier: float) -> None:
+        """Use a changed number of reporting intervals before going stale."""
+        self._multiplier = multiplier
+
+    @callback
+    def async_subscribe(self, listener: Callable[[], None]) -> CALLBACK_TYPE:
+        """Call ``listener`` whenever the device's availability changes."""
+        self._listeners.append(listener)
+
+        @callback
+        def unsubscribe() -> None:
+            self._listeners.remove(listener)
+
+        return unsubscribe
+
+    @callback
+    def async_start(self) -> None:
+        """Start watching; a device that never reports becomes unavailable."""
+        self._last_seen = time.monotonic()
+        self._async_arm(self.timeout)
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop the watchdog timer."""
+        if self._unsub_timer:
+            self._unsub_timer()
+            self._unsub_timer = None
+
+    @callback
+    def async_seen(self, cadence: bool = True) -> None:
+        """Record a live uplink from the device.
+
+        Without ``cadence`` (a redelivered copy), the device counts as
+        reporting but the uplink does not teach its reporting interval.
+        """
+        now = time.monotonic()
+        # Silence that made the device unavailable is an outage, not cadence.
+        if cadence and self.available and self._last_uplink is not None:
+            interval = now - self._last_uplink
+            if self._interval is None:
+                self._interval = interval
+            else:
+                self._interval += AVAILABILITY_SMOOTHING * (interval - self._interval)
+            self._samples += 1
+        if cadence:
+            self._last_uplink = now
+        self._last_seen = now
+
+        if not self.available:
+            self.available = True
+            _LOGGER.info(f"Device {self._device_id} is reporting again")
+            self._async_notify()
+        # Re-arm only if the timer is idle or would now fire too late, which
+        # happens while the cadence is still being learned.
+        deadline = now + self.timeout
+        if self._unsub_timer is None or self._armed_until > deadline:
+            self.async_stop()
+            self._async_arm(deadline - now)
+
+    @callback
+    def _async_arm(self, delay: float) -> None:
+        self._armed_until = time.monotonic() + delay
+        self._unsub_timer = async_call_later(self._hass, delay, self._async_check)
+
+    @callback
+    def _async_check(self, _now) -> None:
+        self._unsub_timer = None
+        timeout = self.timeout
+        remaining = self._last_seen + timeout - time.monotonic()
+        if remaining > 0:
+            self._async_arm(remaining)
+            return
+
+        self.available = False
+        _LOGGER.warning(
+            f"Device {self._device_id} marked unavailable "
+            f"(no data for {round(timeout)}s)"
+        )
+        self._async_notify()
+
+    @callback
+    def _async_notify(self) -> None:
+        for listener in list(self._listeners):
+            listener()
@@ -0,0 +1,230 @@
+"""Gap backfill of missed uplinks from the LMT IoT API."""
+
+import asyncio
+import logging
+import math
+import time
+from typing import Any
+
+import aiohttp
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .api import LMTIoTApiError, async_get_api
+from .config import (
+    BACKFILL_CONCURRENCY,
+    BACKFILL_GAP_INTERVALS,
+    BACKFILL_MAX_AGE,
+    BACKFILL_MAX_PAGES,
+    BACKFILL_MIN_GAP,
+    BACKFILL_PAGE_SIZE,
+    BACKFILL_UNSUPPORTED_RETRY,
+    DOMAIN,
+)
+from .dedup import UplinkDeduplicator
+from .ingest import UplinkIngestQueue
+from .parse_pool import async_parse_uplink_page
+from .parser import UplinkBatch
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_BACKFILL = f"{DOMAIN}_backfill"
+STORAGE_KEY = f"{DOMAIN}.last_seen"
+STORAGE_VERSION = 1
+SAVE_DELAY = 60
+
+BACKFILL_TOPIC = "backfill"
+
+
+async def async_get_backfill(hass: HomeAssistant) -> "UplinkBackfill":
+    """Return the shared backfill manager, loading it on first use."""
+    backfill = hass.data.get(DATA_BACKFILL)
+    if backfill is None:
+        backfill = hass.data[DATA_BACKFILL] = UplinkBackfill(hass)
+    await backfill.async_load()
+    return backfill
+
+
+class UplinkBackfill:
+    """Track when each device was last heard and fetch what was missed.
+
+    Last-seen times are persisted, so a gap is detected both after a Home
+    Assistant restart and after an MQTT reconnect. Missed uplinks are fetched
+    page by page, with a shared limit on how many devices backfill at once,
+    and the newest value of each key is fed through the ingest queue, so
+    entity state is current right after reconnecting. Their samples can be
+    fed to statistics as well.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the backfill manager."""
+        self._hass = hass
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._semaphore = asyncio.Semaphore(BACKFILL_CONCURRENCY)
+        self._last_seen: dict[str, float] = {}
+        self._load_task: asyncio.Task | None = None
+        self._save_pending = False
+        # Set when the API answers 404, i.e. it has no measurement history
+        self._unsupported_until = 0.0
+
+    async def async_load(self) -> None:
+        """Load persisted last-seen times once."""
+        if self._load_task is None:
+            self._load_task = self._hass.async_create_task(self._async_load())
+        await self._load_task
+
+    async def _async_load(self) -> None:
+        data = await self._store.async_load()
+        if data:
+            self._last_seen = {**data, **self._last_seen}
+
+    @callback
+    def async_seen(self, device_id: str, timestamp: float | None = None) -> None:
+        """Record that a device delivered an uplink."""
+        self._last_seen[device_id] = timestamp or time.time()
+        if not self._save_pending:
+            self._save_pending = True
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict[str, float]:
+        self._save_pending = False
+        return dict(self._last_seen)
+
+    async def async_backfill(
+        self,
+        device_id: str,
+        api_key: str | None,
+        ingest: UplinkIngestQueue,
+        dedup: UplinkDeduplicator | None = None,
+        interval: float | None = None,
+        samples: bool = False,
+    ) -> None:
+        """Fetch the uplinks published since the device was last seen.
+
+        Only a silence longer than ``BACKFILL_GAP_INTERVALS`` times the
+        device's learned reporting ``interval`` (``BACKFILL_MIN_GAP`` until
+        it is learned) counts as a gap. With ``dedup``, uplinks not newer
+        than the newest one received before the backfill started are
+        skipped, so they are not ingested twice. The newest value of each
+        key is queued to prime entity state, along with every sample if
+        ``samples`` is set.
+        """
+        last_seen = self._last_seen.get(device_id)
+        newest = dedup.newest if dedup is not None else None
+        now = time.time()
+        min_gap = (
+            interval * BACKFILL_GAP_INTERVALS
+            if interval is not None
+            else BACKFILL_MIN_GAP
+        )
+        if (
+            now < self._unsupported_until
+            or not api_key
+            or last_seen is None
+            or now - last_seen < min_gap
+        ):
+            return
+
+        since = max(last_seen, now - BACKFILL_MAX_AGE)
+        async with self._semaphore:
+            _LOGGER.info(
+                f"Backfilling device {device_id} since "
+                f"{dt_util.utc_from_timestamp(since).isoformat()}"
+            )
+            try:
+                batches = await self._async_fetch(
+                    device_id, api_key, since, now, newest, samples
+                )
+            except (aiohttp.ClientError, TimeoutError, LMTIoTApiError) as e:
+                _LOGGER.warning(f"Backfill for device {device_id} failed: {e}")
+                return
+
+        rows: dict[str, tuple[float, Any]] = {}
+        history: dict[str, list[tuple[float, float]]] = {}
+        count = 0
+        for batch in batches:
+            count += batch.parsed
+            # Pages are in ascending time order; as within a page, rows
+            # without a timestamp count as older than any row with one.
+            for key, row in batch.latest_rows().items():
+                previous = rows.get(key)
+                if previous is None or math.isnan(previous[0]) or row[0] >= previous[0]:
+                    rows[key] = row
+            for key, key_samples in batch.history().items():
+                history.setdefault(key, []).extend(key_samples)
+        # Entity state is only primed if no live uplink was heard since the
+        # fetch started: live uplinks are queued when they are received, and
+        # a newer one may already be ahead of the backfill in the queue.
+        # Untimestamped ones only show in the last-seen time.
+        timestamps = [
+            timestamp for timestamp, _ in rows.values() if not math.isnan(timestamp)
+        ]
+        stale = (
+            dedup is not None and bool(timestamps) and dedup.stale(max(timestamps))
+        ) or self._last_seen.get(device_id, 0) > now
+        parsed = {} if stale else {key: value for key, (_, value) in rows.items()}
+        if parsed or history:
+            ingest.put(device_id, BACKFILL_TOPIC, parsed, history or None)
+        # A live uplink may have been seen since the fetch started.
+        if self._last_seen.get(device_id, 0) < now:
+            self.async_seen(device_id, now)
+        _LOGGER.info(f"Backfilled {count} uplinks for device {device_id}")
+
+    async def _async_fetch(
+        self,
+        device_id: str,
+        api_key: str,
+        since: float,
+        until: float,
+        newer_than: float | None,
+        samples: bool,
+    ) -> list[UplinkBatch]:
+        """Fetch and parse missed uplinks, one page at a time.
+
+        Pages are fetched undecoded and each is decoded and parsed as one
+        job, so large pages go to the parse worker instead of the event loop.
+        """
+        batches = []
+        api = async_get_api(self._hass)
+        for page in range(BACKFILL_MAX_PAGES):
+            params = {
+                "from": dt_util.utc_from_timestamp(since).isoformat(),
+                "to": dt_util.utc_from_timestamp(until).isoformat(),
+                "limit": BACKFILL_PAGE_SIZE,
+                "offset": page * BACKFILL_PAGE_SIZE,
+            }
+            response = await api.async_request(
+                "GET",
+                f"/devices/{device_id}/measurements",
+                api_key,
+                params=params,
+                raw=True,
+            )
+            if response.status == 404:
+                self._unsupported_until = time.time() + BACKFILL_UNSUPPORTED_RETRY
+                _LOGGER.warning(
+                    "The LMT IoT API has no measurement history; "
+                    f"backfill is off for {BACKFILL_UNSUPPORTED_RETRY // 3600} hours"
+                )
+                return []
+            response.raise_for_status()
+            try:
+                batch = await async_parse_uplink_page(
+                    self._hass, response.data, newer_than, samples
+                )
+            except ValueError:
+                batch = None
+            if batch is None:
+                _LOGGER.warning(f"Unexpected backfill response for device {device_id}")
+                break
+            batches.append(batch)
+            if batch.parsed + batch.failed + batch.skipped < BACKFILL_PAGE_SIZE:
+                break
+        else:
+            _LOGGER.warning(
+                f"Backfill for device {device_id} stopped after "
+                f"{BACKFILL_MAX_PAGES} pages"
+            )
+        return batches
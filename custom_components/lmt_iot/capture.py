@@ -0,0 +1,162 @@
+"""Opt-in capture of raw uplinks for offline replay."""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from datetime import datetime, timedelta
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .config import (
+    CAPTURE_BACKUPS,
+    CAPTURE_BUFFER_SIZE,
+    CAPTURE_FLUSH_INTERVAL,
+    CAPTURE_MAX_BYTES,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class UplinkCapture:
+    """Append raw uplinks to a size-capped, rotating JSON lines log.
+
+    ``record`` only buffers in memory; the buffer is written out from the
+    executor every few seconds. When the log grows past ``max_bytes`` it is
+    renamed to ``<path>.1`` (older logs shift up to ``<path>.<backups>``)
+    and a new one is started. Each line holds the receive time, device id,
+    topic and payload, which round-trips byte for byte.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        path: str,
+        max_bytes: int = CAPTURE_MAX_BYTES,
+        backups: int = CAPTURE_BACKUPS,
+    ) -> None:
+        """Initialize the capture."""
+        self._hass = hass
+        self.path = path
+        self._max_bytes = max_bytes
+        self._backups = backups
+        self._buffer: deque[tuple[float, str, str, bytes]] = deque(
+            maxlen=CAPTURE_BUFFER_SIZE
+        )
+        self._lock = asyncio.Lock()
+        self._unsub_interval: Callable[[], None] | None = None
+        self.recorded = 0
+        self.dropped = 0
+
+    def record(self, device_id: str, topic: str, raw: bytes) -> None:
+        """Buffer one raw uplink."""
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append((time.time(), device_id, topic, raw))
+        self.recorded += 1
+
+    @callback
+    def async_start(self) -> None:
+        """Start flushing the buffer periodically."""
+        self._unsub_interval = async_track_time_interval(
+            self._hass,
+            self._async_scheduled_flush,
+            timedelta(seconds=CAPTURE_FLUSH_INTERVAL),
+        )
+        _LOGGER.info(f"Capturing raw uplinks to {self.path}")
+
+    async def async_stop(self) -> None:
+        """Stop flushing and write out what is still buffered."""
+        if self._unsub_interval is not None:
+            self._unsub_interval()
+            self._unsub_interval = None
+        await self.async_flush()
+
+    async def _async_scheduled_flush(self, now: datetime) -> None:
+        if not self._lock.locked():
+            await self.async_flush()
+
+    async def async_flush(self) -> None:
+        """Write the buffered uplinks from the executor."""
+        async with self._lock:
+            if not self._buffer:
+                return
+            records = list(self._buffer)
+            self._buffer.clear()
+            try:
+                await self._hass.async_add_executor_job(self._write, records)
+            except OSError as e:
+                _LOGGER.warning(f"Failed to write uplink capture {self.path}: {e}")
+
+    def _write(self, records: list[tuple[float, str, str, bytes]]) -> None:
+        lines = "".join(
+            json.dumps(
+                {
+                    "t": round(received, 3),
+                    "device": device_id,
+                    "topic": topic,
+                    "payload": raw.decode(errors="surrogateescape"),
+                },
+                separators=(",", ":"),
+            )
+            + "\n"
+            for received, device_id, topic, raw in records
+        ).encode()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            size = 0
+        if size and size + len(lines) > self._max_bytes:
+            self._rotate()
+        with open(self.path, "ab") as log:
+            log.write(lines)
+
+    def _rotate(self) -> None:
+        for index in range(self._backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self._backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+def capture_files(path: str) -> list[str]:
+    """Return a capture log and its rotated predecessors, oldest first."""
+    files = []
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        files.append(f"{path}.{index}")
+        index += 1
+    files.reverse()
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_capture(path: str) -> Iterator[tuple[float, str, str, bytes]]:
+    """Yield (received, device id, topic, raw payload) from a capture log.
+
+    Rotated logs of ``path`` are read first, so uplinks come out in the
+    order they were received.
+    """
+    for file in capture_files(path):
+        with open(file, encoding="utf-8", errors="surrogateescape") as log:
+            for line in log:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short when Home Assistant stopped mid-write
+                    continue
+                yield (
+                    record["t"],
+                    record["device"],
+                    record["topic"],
+                    record["payload"].encode(errors="surrogateescape"),
+                )
@@ -10,6 +10,114 @@ CONF_CLIENT_KEY = "client_key"
 CONF_SENSOR_CONFIG = "sensor_config"
 CONF_DEVICE_TYPE = "device_type"
 
+# Account entries: one entry manages every (or every selected) device
+CONF_ENTRY_TYPE = "entry_type"
+CONF_DEVICES = "devices"
+CONF_SELECTED_DEVICES = "selected_devices"
+CONF_ALL_DEVICES = "all_devices"
+CONF_SENSOR_CONFIGS = "sensor_configs"
+
+ENTRY_TYPE_DEVICE = "device"
+ENTRY_TYPE_ACCOUNT = "account"
+
+# Dispatcher signals carrying devices added to an entry, or whose sensor
+# config changed, formatted with the entry id
+SIGNAL_DEVICES_ADDED = f"{DOMAIN}_devices_added_{{}}"
+SIGNAL_SENSORS_UPDATED = f"{DOMAIN}_sensors_updated_{{}}"
+# Carries a device and the parsed uplink in which it reported new keys
+SIGNAL_SENSORS_DISCOVERED = f"{DOMAIN}_sensors_discovered_{{}}"
+
+# Options
+CONF_FIRE_EVENTS = "fire_events"
+CONF_OVERFLOW_POLICY = "overflow_policy"
+CONF_IMPORT_STATISTICS = "import_statistics"
+CONF_AVAILABILITY_MULTIPLIER = "availability_multiplier"
+CONF_SENSOR_FILTERS = "sensor_filters"
+CONF_CAPTURE_UPLINKS = "capture_uplinks"
+CONF_DERIVED_SENSORS = "derived_sensors"
+CONF_PERSISTENT_SESSION = "persistent_session"
+CONF_BACKFILL = "backfill"
+
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_DROP_NEWEST = "drop_newest"
+
+DEFAULT_FIRE_EVENTS = False
+DEFAULT_OVERFLOW_POLICY = OVERFLOW_DROP_OLDEST
+DEFAULT_IMPORT_STATISTICS = False
+DEFAULT_AVAILABILITY_MULTIPLIER = 3.0
+DEFAULT_CAPTURE_UPLINKS = False
+DEFAULT_PERSISTENT_SESSION = False
+DEFAULT_BACKFILL = False
+
+INGEST_QUEUE_SIZE = 1000
+INGEST_BATCH_SIZE = 100
+
+# Raw uplinks kept per device for the diagnostics download
+RECENT_PAYLOADS = 20
+
+# Raw uplink capture for offline replay
+CAPTURE_MAX_BYTES = 10 * 1024 * 1024
+CAPTURE_BACKUPS = 3
+CAPTURE_BUFFER_SIZE = 10000
+CAPTURE_FLUSH_INTERVAL = 5
+
+# Duplicate and out-of-order uplink suppression
+DEDUP_SIZE = 256
+DEDUP_MAX_AGE = 86400
+DEDUP_REDELIVERY_WINDOW = 60
+
+# Availability watchdog
+DEFAULT_AVAILABILITY_TIMEOUT = 7200
+AVAILABILITY_MIN_TIMEOUT = 60
+AVAILABILITY_MIN_SAMPLES = 3
+AVAILABILITY_SMOOTHING = 0.25
+
+# Rolling aggregates of derived sensors
+AGGREGATE_MAX_SAMPLES = 1024
+
+# State write filtering
+DEFAULT_WRITE_HEARTBEAT = 3600
+
+# Gap backfill from the LMT IoT API
+BACKFILL_MIN_GAP = 300
+# Reporting intervals without an uplink that count as a gap, once learned
+BACKFILL_GAP_INTERVALS = 1.5
+BACKFILL_MAX_AGE = 86400
+BACKFILL_PAGE_SIZE = 100
+BACKFILL_MAX_PAGES = 20
+BACKFILL_CONCURRENCY = 4
+# Seconds before asking again once the API answers without measurement history
+BACKFILL_UNSUPPORTED_RETRY = 86400
+
+# Batch parsing off the event loop
+PARSE_THREAD_MIN_UPLINKS = 500
+PARSE_THREAD_MIN_BYTES = 64 * 1024
+# Raw payload bytes worth copying to and from the worker process
+PARSE_PROCESS_MIN_BYTES = 256 * 1024
+PARSE_POOL_WORKERS = 1
+
+# Fleet-wide MQTT connect admission
+CONNECT_RATE = 20
+CONNECT_BURST = 20
+CONNECT_CONCURRENCY = 8
+
+# Device type metadata cache
+DEVICE_TYPE_TTL = 86400
+
+# Config flow device discovery
+DISCOVERY_PAGE_SIZE = 50
+DISCOVERY_MAX_PAGES = 100
+
+# Account device list refresh
+ACCOUNT_SYNC_INTERVAL = 3600
+
+# LMT IoT API client
+API_TIMEOUT = 30
+API_LOOKUP_TIMEOUT = 10
+API_HOST_CONCURRENCY = 8
+API_RETRIES = 2
+API_RETRY_BACKOFF = 0.5
+
 API_URL = "https://mobile-api.lmt-iot.com/api"
 MQTT_HOST = "a9eo836zhfe6w-ats.iot.eu-central-1.amazonaws.com"
 MQTT_PORT = 8883
@@ -4,29 +4,103 @@ Developed by LMT IoT
 https://github.com/lmt-lv/lmt-iot-ha-integration
 """
 
+import asyncio
+import hashlib
 import logging
-import voluptuous as vol
+
 import aiohttp
+import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.const import CONF_HOST, CONF_PORT
 from homeassistant.core import callback
 from homeassistant.helpers import selector
 
 from . import (
-    DOMAIN,
-    CONF_DEVICE_ID,
     CONF_API_KEY,
+    CONF_DEVICE_ID,
+    CONF_DEVICE_TYPE,
+    CONF_SENSOR_CONFIG,
+    DOMAIN,
+)
+from .account import async_managed_device_ids
+from .aggregates import parse_aggregates
+from .api import LMTIoTApiError, async_get_api
+from .config import (
+    API_LOOKUP_TIMEOUT,
+    CONF_ALL_DEVICES,
+    CONF_AVAILABILITY_MULTIPLIER,
+    CONF_BACKFILL,
     CONF_CA_CERT,
+    CONF_CAPTURE_UPLINKS,
     CONF_CLIENT_CERT,
     CONF_CLIENT_KEY,
-    CONF_SENSOR_CONFIG,
-    CONF_DEVICE_TYPE,
+    CONF_DERIVED_SENSORS,
+    CONF_DEVICES,
+    CONF_ENTRY_TYPE,
+    CONF_FIRE_EVENTS,
+    CONF_IMPORT_STATISTICS,
+    CONF_OVERFLOW_POLICY,
+    CONF_PERSISTENT_SESSION,
+    CONF_SELECTED_DEVICES,
+    CONF_SENSOR_CONFIGS,
+    CONF_SENSOR_FILTERS,
+    DEFAULT_AVAILABILITY_MULTIPLIER,
+    DEFAULT_BACKFILL,
+    DEFAULT_CAPTURE_UPLINKS,
+    DEFAULT_FIRE_EVENTS,
+    DEFAULT_IMPORT_STATISTICS,
+    DEFAULT_OVERFLOW_POLICY,
+    DEFAULT_PERSISTENT_SESSION,
+    ENTRY_TYPE_ACCOUNT,
+    MQTT_HOST,
+    MQTT_PORT,
+    OVERFLOW_DROP_NEWEST,
+    OVERFLOW_DROP_OLDEST,
+)
+from .discovery import (
+    async_discover_devices,
+    async_provision_devices,
+    async_request_certificates,
+    format_device_name,
 )
-from .config import API_URL, MQTT_HOST, MQTT_PORT
+from .filters import FILTER_KEYS
 
 _LOGGER = logging.getLogger(__name__)
 
 CONF_DEVICE_LIST = "device_list"
+# Extra device_select choices that create an account entry instead
+ACCOUNT_ALL_DEVICES = "account:all"
+ACCOUNT_SELECT_DEVICES = "account:select"
+AMAZON_ROOT_CA_URL = "https://www.amazontrust.com/repository/AmazonRootCA1.pem"
+
+
+def _valid_sensor_filters(filters) -> bool:
+    """Check sensor filter overrides: {sensor key: {filter key: seconds/amount}}."""
+    if not isinstance(filters, dict):
+        return False
+    for settings in filters.values():
+        if not isinstance(settings, dict):
+            return False
+        for key, value in settings.items():
+            if key not in FILTER_KEYS:
+                return False
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return False
+            if value < 0:
+                return False
+    return True
+
+
+def _valid_derived_sensors(derived) -> bool:
+    """Check derived sensors: {sensor key: {statistic: window seconds}}."""
+    if not isinstance(derived, dict):
+        return False
+    return all(parse_aggregates(config) is not None for config in derived.values())
+
+
+def _account_unique_id(api_key: str) -> str:
+    """Return the unique id of the account entry for an API key."""
+    return f"account_{hashlib.sha256(api_key.encode()).hexdigest()[:16]}"
 
 
 class LMTIoTMQTTConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -44,33 +118,11 @@ class LMTIoTMQTTConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         """Initialize the config flow."""
         self._device_id = None
         self._device_name = None
-        self._api_url = API_URL
         self._api_key = None
         self._device_list = []
         self._sensor_configs = {}
         self._skip_existing_key = False
 
-    def _format_device_display_name(self, device: dict, device_id: str) -> str:
-        """Format device display name from device data."""
-        room = device.get("room") or {}
-        custom_name = room.get("customName")
-        default_name = room.get("name") or ""
-        room_name = (
-            custom_name
-            if custom_name
-            else (default_name.title() if default_name else "")
-        )
-        house_name = (room.get("house") or {}).get("name", "")
-
-        display_parts = []
-        if house_name:
-            display_parts.append(house_name)
-        if room_name:
-            display_parts.append(room_name)
-        display_parts.append(f"({device_id})")
-
-        return " - ".join(display_parts)
-
     async def async_step_user(self, user_input=None):
         """Handle the initial step - API key input or device selection."""
         errors = {}
@@ -111,9 +163,10 @@ class LMTIoTMQTTConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         """Show account confirmation with user info and option to change API key."""
         self._account_options = {}
         options = []
-        for key in api_keys:
-            self._api_key = key
-            user_info = await self._get_user_info()
+        user_infos = await asyncio.gather(
+            *(self._get_user_info(key) for key in api_keys)
+        )
+        for key, user_info in zip(api_keys, user_infos):
             if user_info is None:
                 continue
             name = user_info.get("name")
@@ -169,21 +222,14 @@ class LMTIoTMQTTConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             return await self._get_device_list()
         return await self._get_device_list()
 
-    async def _get_user_info(self):
+    async def _get_user_info(self, api_key):
         try:
-            async with aiohttp.ClientSession() as session:
-                headers = {"X-API-KEY": self._api_key}
-                async with session.get(
-                    f"{self._api_url}/user",
-                    headers=headers,
-                    timeout=aiohttp.ClientTimeout(total=10),
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data
-                    _LOGGER.warning(
-                        f"User info request failed with status {response.status}"
-                    )
+            response = await async_get_api(self.hass).async_request(
+                "GET", "/user", api_key, timeout=API_LOOKUP_TIMEOUT
+            )
+            if response.status == 200:
+                return response.data
+            _LOGGER.warning(f"User info request failed with status {response.status}")
         except Exception as e:
             _LOGGER.warning(f"Failed to fetch user info: {e}")
         return None
@@ -193,67 +239,16 @@ class LMTIoTMQTTConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         self._device_list = []
         self._sensor_configs = {}
         try:
-            async with aiohttp.ClientSession() as session:
-                headers = {"X-API-KEY": self._api_key}
-                async with session.get(
-                    f"{self._api_url}/devices?limit=50",
-                    headers=headers,
-                    timeout=aiohttp.ClientTimeout(total=30),
-                ) as response:
-                    if response.status == 401:
-                        return self._show_api_error("invalid_api_key")
-                    elif response.status == 403:
-                        return self._show_api_error("insufficient_permissions")
-                    elif response.status >= 500:
-                        return self._show_api_error("server_error")
-                    elif response.status >= 400:
-                        return self._show_api_error("api_error")
-
-                    devices = (await response.json()).get("data", [])
-
-                    type_cache = {}
-                    for device in devices:
-                        device_type = device["type"]
-                        if device_type not in type_cache:
-                            async with session.get(
-                                f"{self._api_url}/devices/types/{device_type}",
-                                headers=headers,
-                                timeout=aiohttp.ClientTimeout(total=30),
-                            ) as type_response:
-                                if type_response.status >= 300:
-                                    continue
-                                type_data = await type_response.json()
-                                smart_home = (type_data.get("measurements") or {}).get(
-                                    "smartHome"
-                                ) or {}
-                                type_cache[device_type] = {
-                                    "enabled": smart_home.get("enabled", False),
-                                    "sensors": smart_home.get("sensors", []),
-                                }
-
-                        if type_cache.get(device_type, {}).get("enabled"):
-                            device_id = device["serialNumber"]
-                            display_name = self._format_device_display_name(
-                                device, device_id
-                            )
-
-                            self._device_list.append(
-                                {
-                                    "id": device_id,
-                                    "name": display_name,
-                                    "device_name": display_name,
-                                    "type": device_type,
-                                }
-                            )
-                            self._sensor_configs[device_id] = type_cache[device_type][
-                                "sensors"
-                            ]
-
-                    if not self._device_list:
-                        return self.async_abort(reason="no_devices")
-
-                    return await self.async_step_device_select()
-        except aiohttp.ClientTimeout:
+            devices, type_info = await async_discover_devices(self.hass, self._api_key)
+        except LMTIoTApiError as e:
+            if e.status == 401:
+                return self._show_api_error("invalid_api_key")
+            elif e.status == 403:
+                return self._show_api_error("insufficient_permissions")
+            elif e.status >= 500:
+                return self._show_api_error("server_error")
+            return self._show_api_error("api_error")
+        except TimeoutError:
             return self._show_api_error("timeout")
         except aiohttp.ClientError:
             return self._show_api_error("connection_error")
@@ -261,6 +256,27 @@ class LMTIoTMQTTConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             _LOGGER.error(f"Failed to get devices: {e}", exc_info=True)
             return self._show_api_error("cannot_connect")
 
+        for device in devices:
+            device_type = device["type"]
+            if (type_info.get(device_type) or {}).get("enabled"):
+                device_id = device["serialNumber"]
+                display_name = format_device_name(device, device_id)
+
+                self._device_list.append(
+                    {
+                        "id": device_id,
+                        "name": display_name,
+                        "device_name": display_name,
+                        "type": device_type,
+                    }
+                )
+                self._sensor_configs[device_id] = type_info[device_type]["sensors"]
+
+        if not self._device_list:
+            return self.async_abort(reason="no_devices")
+
+        return await self.async_step_device_select()
+
     def _show_api_error(self, error_key):
         """Show API error form."""
         self._api_key = None
@@ -289,6 +305,13 @@ class LMTIoTMQTTConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         errors = {}
 
         if user_input is not None:
+            if user_input[CONF_DEVICE_ID] == ACCOUNT_ALL_DEVICES:
+                return await self._create_account_entry(
+                    [dev["id"] for dev in self._unmanaged_devices()], True
+                )
+            if user_input[CONF_DEVICE_ID] == ACCOUNT_SELECT_DEVICES:
+                return await self.async_step_account_devices()
+
             self._device_id = user_input[CONF_DEVICE_ID]
             selected_device = next(
                 (dev for dev in self._device_list if dev["id"] == self._device_id), None
@@ -298,37 +321,30 @@ class LMTIoTMQTTConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
             await self.async_set_unique_id(self._device_id)
             self._abort_if_unique_id_configured()
+            if self._device_id in async_managed_device_ids(self.hass):
+                return self.async_abort(reason="already_configured")
 
             _LOGGER.info(f"User selected device: {self._device_id}")
 
             try:
-                _LOGGER.info(f"Requesting certificates for device: {self._device_id}")
-                async with aiohttp.ClientSession() as session:
-                    headers = {"X-API-KEY": self._api_key}
-                    data = {"target": "SMART_HOME"}
-                    async with session.post(
-                        f"{self._api_url}/devices/{self._device_id}/certificates",
-                        headers=headers,
-                        json=data,
-                        timeout=aiohttp.ClientTimeout(total=30),
-                    ) as response:
-                        if response.status == 401:
-                            errors["base"] = "invalid_api_key"
-                        elif response.status == 403:
-                            errors["base"] = "insufficient_permissions"
-                        elif response.status == 404:
-                            errors["base"] = "device_not_found"
-                        elif response.status >= 500:
-                            errors["base"] = "server_error"
-                        elif response.status >= 400:
-                            errors["base"] = "api_error"
-                        else:
-                            provision_data = await response.json()
-                            _LOGGER.info(f"Certificate response: {provision_data}")
-                            return await self._provision_device(
-                                provision_data, device_type
-                            )
-            except aiohttp.ClientTimeout:
+                response = await async_request_certificates(
+                    self.hass, self._api_key, self._device_id
+                )
+                if response.status == 401:
+                    errors["base"] = "invalid_api_key"
+                elif response.status == 403:
+                    errors["base"] = "insufficient_permissions"
+                elif response.status == 404:
+                    errors["base"] = "device_not_found"
+                elif response.status >= 500:
+                    errors["base"] = "server_error"
+                elif response.status >= 400:
+                    errors["base"] = "api_error"
+                else:
+                    provision_data = response.data
+                    _LOGGER.info(f"Certificate response: {provision_data}")
+                    return await self._provision_device(provision_data, device_type)
+            except TimeoutError:
                 errors["base"] = "timeout"
             except aiohttp.ClientError:
                 errors["base"] = "connection_error"
@@ -339,7 +355,13 @@ class LMTIoTMQTTConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 )
                 errors["base"] = "cannot_connect"
 
+        return self._show_device_select(errors)
+
+    def _show_device_select(self, errors):
+        """Show the device list with the account entry choices at the end."""
         device_options = {dev["id"]: dev["name"] for dev in self._device_list}
+        device_options[ACCOUNT_ALL_DEVICES] = "All devices on this account"
+        device_options[ACCOUNT_SELECT_DEVICES] = "Several devices on this account"
 
         return self.async_show_form(
             step_id="device_select",
@@ -351,6 +373,84 @@ class LMTIoTMQTTConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             errors=errors,
         )
 
+    def _unmanaged_devices(self):
+        """Return the listed devices not yet set up by any entry."""
+        managed = async_managed_device_ids(self.hass)
+        return [dev for dev in self._device_list if dev["id"] not in managed]
+
+    async def async_step_account_devices(self, user_input=None):
+        """Handle choosing the devices an account entry manages."""
+        if user_input is not None:
+            return await self._create_account_entry(
+                user_input[CONF_SELECTED_DEVICES], False
+            )
+
+        options = [
+            selector.SelectOptionDict(value=dev["id"], label=dev["name"])
+            for dev in self._unmanaged_devices()
+        ]
+        return self.async_show_form(
+            step_id="account_devices",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_SELECTED_DEVICES,
+                        default=[option["value"] for option in options],
+                    ): selector.SelectSelector(
+                        selector.SelectSelectorConfig(
+                            options=options,
+                            multiple=True,
+                            mode=selector.SelectSelectorMode.LIST,
+                        )
+                    ),
+                }
+            ),
+        )
+
+    async def _create_account_entry(self, device_ids, all_devices):
+        """Provision devices in bulk and create an account entry for them.
+
+        With ``all_devices`` the entry also picks up devices added to the
+        account later; otherwise it keeps to the selected ones.
+        """
+        await self.async_set_unique_id(_account_unique_id(self._api_key))
+        self._abort_if_unique_id_configured()
+
+        _LOGGER.info(f"Provisioning {len(device_ids)} devices for an account entry")
+        credentials = await async_provision_devices(
+            self.hass, self._api_key, device_ids
+        )
+        if device_ids and not credentials:
+            return self._show_device_select({"base": "provisioning_failed"})
+
+        types = {dev["id"]: dev["type"] for dev in self._device_list}
+        devices = {
+            device_id: {CONF_DEVICE_TYPE: types[device_id], **device_credentials}
+            for device_id, device_credentials in credentials.items()
+        }
+        sensor_configs = {
+            types[device_id]: self._sensor_configs.get(device_id, [])
+            for device_id in devices
+        }
+        ca_cert = await self._get_amazon_root_ca()
+        user_info = await self._get_user_info(self._api_key) or {}
+        account_name = user_info.get("name") or user_info.get("phoneNumber")
+
+        return self.async_create_entry(
+            title=f"Account {account_name}" if account_name else "LMT IoT account",
+            data={
+                CONF_ENTRY_TYPE: ENTRY_TYPE_ACCOUNT,
+                CONF_HOST: MQTT_HOST,
+                CONF_PORT: MQTT_PORT,
+                CONF_CA_CERT: ca_cert,
+                CONF_API_KEY: self._api_key,
+                CONF_ALL_DEVICES: all_devices,
+                CONF_SELECTED_DEVICES: list(device_ids),
+                CONF_DEVICES: devices,
+                CONF_SENSOR_CONFIGS: sensor_configs,
+            },
+        )
+
     async def _provision_device(self, data, device_type):
         """Provision device with received credentials."""
         _LOGGER.info(f"Provisioning device: {self._device_id}")
@@ -382,6 +482,21 @@ class LMTIoTMQTTConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             },
         )
 
+    async def _get_amazon_root_ca(self):
+        """Download Amazon Root CA 1 certificate."""
+        try:
+            _LOGGER.info("Downloading Amazon Root CA certificate")
+            response = await async_get_api(self.hass).async_request(
+                "GET", AMAZON_ROOT_CA_URL, timeout=API_LOOKUP_TIMEOUT
+            )
+            _LOGGER.info(f"Amazon Root CA download status: {response.status}")
+            response.raise_for_status()
+            return response.data
+        except Exception as e:
+            _LOGGER.error(f"Failed to download Amazon Root CA: {e}", exc_info=True)
+            _LOGGER.warning("Using fallback Amazon Root CA certificate")
+            return "-----BEGIN CERTIFICATE-----\nMIIDQTCCAimgAwIBAgITBmyfz5m/jAo54vB4ikPmljZbyjANBgkqhkiG9w0BAQsF\nADA5MQswCQYDVQQGEwJVUzEPMA0GA1UEChMGQW1hem9uMRkwFwYDVQQDExBBbWF6\nb24gUm9vdCBDQSAxMB4XDTE1MDUyNjAwMDAwMFoXDTM4MDExNzAwMDAwMFowOTEL\nMAkGA1UEBhMCVVMxDzANBgNVBAoTBkFtYXpvbjEZMBcGA1UEAxMQQW1hem9uIFJv\nb3QgQ0EgMTCCASIwDQYJKoZIhvcNAQEBBQADggEPADCCAQoCggEBALJ4gHHKeNXj\nca9HgFB0fW7Y14h29Jlo91ghYPl0hAEvrAIthtOgQ3pOsqTQNroBvo3bSMgHFzZM\n9O6II8c+6zf1tRn4SWiw3te5djgdYZ6k/oI2peVKVuRF4fn9tBb6dNqcmzU5L/qw\nIFAGbHrQgLKm+a/sRxmPUDgH3KKHOVj4utWp+UhnMJbulHheb4mjUcAwhmahRWa6\nVOujw5H5SNz/0egwLX0tdHA114gk957EWW67c4cX8jJGKLhD+rcdqsq08p8kDi1L\n93FcXmn/6pUCyziKrlA4b9v7LWIbxcceVOF34GfID5yHI9Y/QCB/IIDEgEw+OyQm\njgSubJrIqg0CAwEAAaNCMEAwDwYDVR0TAQH/BAUwAwEB/zAOBgNVHQ8BAf8EBAMC\nAYYwHQYDVR0OBBYEFIQYzIU07LwMlJQuCFmcx7IQTgoIMA0GCSqGSIb3DQEBCwUA\nA4IBAQCY8jdaQZChGsV2USggNiMOruYou6r4lK5IpDB/G/wkjUu0yKGX9rbxenDI\nU5PMCCjjmCXPI6T53iHTfIuJruydjsw2hUwsOjsQl/8gDHmG5Oq14cNA4+7QKj2V\n11RUYfXTpz0AhHsHnoDcTDMxnpXb78ieQw2E+MPWbbWmXw/VWJJwpxn4OkqNGpF8\nShQl5Z6psk4ajJaGSiJOrM8fDS8acDRRVCs0Uc7pmAoTGnHXXXO2VEA5Y9Xig3CH\n82o9RpR1BSiMDx0GXEcSUk1EZfFDgqSWjOhK1J8Z4jNVrqI1qbFff3RHksVK1EPe\nOAD0C/X7RxbAnp/XDjgA+RFrOO/r\n-----END CERTIFICATE-----"
+
 
 class LMTIoTOptionsFlow(config_entries.OptionsFlow):
     def __init__(self, config_entry):
@@ -391,54 +506,117 @@ class LMTIoTOptionsFlow(config_entries.OptionsFlow):
         errors = {}
 
         if user_input is not None:
-            new_key = user_input[CONF_API_KEY]
-            try:
-                async with aiohttp.ClientSession() as session:
-                    headers = {"X-API-KEY": new_key}
-                    async with session.get(
-                        f"{API_URL}/user",
-                        headers=headers,
-                        timeout=aiohttp.ClientTimeout(total=10),
-                    ) as response:
-                        if response.status != 200:
-                            errors["base"] = "invalid_api_key"
-            except Exception:
-                errors["base"] = "cannot_connect"
+            new_key = user_input.get(CONF_API_KEY)
+            if new_key:
+                try:
+                    response = await async_get_api(self.hass).async_request(
+                        "GET", "/user", new_key, timeout=API_LOOKUP_TIMEOUT
+                    )
+                    if response.status != 200:
+                        errors["base"] = "invalid_api_key"
+                except Exception:
+                    errors["base"] = "cannot_connect"
+
+            if not _valid_sensor_filters(user_input.get(CONF_SENSOR_FILTERS, {})):
+                errors[CONF_SENSOR_FILTERS] = "invalid_sensor_filters"
+
+            if not _valid_derived_sensors(user_input.get(CONF_DERIVED_SENSORS, {})):
+                errors[CONF_DERIVED_SENSORS] = "invalid_derived_sensors"
 
             if not errors:
-                new_data = {**self._config_entry.data, CONF_API_KEY: new_key}
+                new_data = dict(self._config_entry.data)
+                unique_id = self._config_entry.unique_id
+                if new_key:
+                    new_data[CONF_API_KEY] = new_key
+                    if new_data.get(CONF_ENTRY_TYPE) == ENTRY_TYPE_ACCOUNT:
+                        unique_id = _account_unique_id(new_key)
+                new_options = {
+                    **self._config_entry.options,
+                    **{
+                        key: value
+                        for key, value in user_input.items()
+                        if key != CONF_API_KEY
+                    },
+                }
                 self.hass.config_entries.async_update_entry(
-                    self._config_entry, data=new_data
+                    self._config_entry,
+                    data=new_data,
+                    options=new_options,
+                    unique_id=unique_id,
                 )
-                await self.hass.config_entries.async_reload(self._config_entry.entry_id)
-                return self.async_create_entry(title="", data={})
+                # The entry's update listener applies the changes in place.
+                return self.async_create_entry(title="", data=new_options)
 
+        options = self._config_entry.options
         return self.async_show_form(
             step_id="init",
             data_schema=vol.Schema(
                 {
-                    vol.Required(CONF_API_KEY): selector.TextSelector(
+                    vol.Optional(CONF_API_KEY): selector.TextSelector(
                         selector.TextSelectorConfig(
                             type=selector.TextSelectorType.PASSWORD
                         )
                     ),
+                    vol.Optional(
+                        CONF_FIRE_EVENTS,
+                        default=options.get(CONF_FIRE_EVENTS, DEFAULT_FIRE_EVENTS),
+                    ): selector.BooleanSelector(),
+                    vol.Optional(
+                        CONF_OVERFLOW_POLICY,
+                        default=options.get(
+                            CONF_OVERFLOW_POLICY, DEFAULT_OVERFLOW_POLICY
+                        ),
+                    ): selector.SelectSelector(
+                        selector.SelectSelectorConfig(
+                            options=[OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST],
+                            translation_key=CONF_OVERFLOW_POLICY,
+                        )
+                    ),
+                    vol.Optional(
+                        CONF_IMPORT_STATISTICS,
+                        default=options.get(
+                            CONF_IMPORT_STATISTICS, DEFAULT_IMPORT_STATISTICS
+                        ),
+                    ): selector.BooleanSelector(),
+                    vol.Optional(
+                        CONF_AVAILABILITY_MULTIPLIER,
+                        default=options.get(
+                            CONF_AVAILABILITY_MULTIPLIER,
+                            DEFAULT_AVAILABILITY_MULTIPLIER,
+                        ),
+                    ): selector.NumberSelector(
+                        selector.NumberSelectorConfig(
+                            min=1.5,
+                            max=20,
+                            step=0.5,
+                            mode=selector.NumberSelectorMode.BOX,
+                        )
+                    ),
+                    vol.Optional(
+                        CONF_SENSOR_FILTERS,
+                        default=options.get(CONF_SENSOR_FILTERS) or {},
+                    ): selector.ObjectSelector(),
+                    vol.Optional(
+                        CONF_DERIVED_SENSORS,
+                        default=options.get(CONF_DERIVED_SENSORS) or {},
+                    ): selector.ObjectSelector(),
+                    vol.Optional(
+                        CONF_CAPTURE_UPLINKS,
+                        default=options.get(
+                            CONF_CAPTURE_UPLINKS, DEFAULT_CAPTURE_UPLINKS
+                        ),
+                    ): selector.BooleanSelector(),
+                    vol.Optional(
+                        CONF_PERSISTENT_SESSION,
+                        default=options.get(
+                            CONF_PERSISTENT_SESSION, DEFAULT_PERSISTENT_SESSION
+                        ),
+                    ): selector.BooleanSelector(),
+                    vol.Optional(
+                        CONF_BACKFILL,
+                        default=options.get(CONF_BACKFILL, DEFAULT_BACKFILL),
+                    ): selector.BooleanSelector(),
                 }
             ),
             errors=errors,
         )
-
-    async def _get_amazon_root_ca(self):
-        """Download Amazon Root CA 1 certificate."""
-        try:
-            _LOGGER.info("Downloading Amazon Root CA certificate")
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    "https://www.amazontrust.com/repository/AmazonRootCA1.pem",
-                    timeout=aiohttp.ClientTimeout(total=10),
-                ) as response:
-                    _LOGGER.info(f"Amazon Root CA download status: {response.status}")
-                    return await response.text()
-        except Exception as e:
-            _LOGGER.error(f"Failed to download Amazon Root CA: {e}", exc_info=True)
-            _LOGGER.warning("Using fallback Amazon Root CA certificate")
-            return "-----BEGIN CERTIFICATE-----\nMIIDQTCCAimgAwIBAgITBmyfz5m/jAo54vB4ikPmljZbyjANBgkqhkiG9w0BAQsF\nADA5MQswCQYDVQQGEwJVUzEPMA0GA1UEChMGQW1hem9uMRkwFwYDVQQDExBBbWF6\nb24gUm9vdCBDQSAxMB4XDTE1MDUyNjAwMDAwMFoXDTM4MDExNzAwMDAwMFowOTEL\nMAkGA1UEBhMCVVMxDzANBgNVBAoTBkFtYXpvbjEZMBcGA1UEAxMQQW1hem9uIFJv\nb3QgQ0EgMTCCASIwDQYJKoZIhvcNAQEBBQADggEPADCCAQoCggEBALJ4gHHKeNXj\nca9HgFB0fW7Y14h29Jlo91ghYPl0hAEvrAIthtOgQ3pOsqTQNroBvo3bSMgHFzZM\n9O6II8c+6zf1tRn4SWiw3te5djgdYZ6k/oI2peVKVuRF4fn9tBb6dNqcmzU5L/qw\nIFAGbHrQgLKm+a/sRxmPUDgH3KKHOVj4utWp+UhnMJbulHheb4mjUcAwhmahRWa6\nVOujw5H5SNz/0egwLX0tdHA114gk957EWW67c4cX8jJGKLhD+rcdqsq08p8kDi1L\n93FcXmn/6pUCyziKrlA4b9v7LWIbxcceVOF34GfID5yHI9Y/QCB/IIDEgEw+OyQm\njgSubJrIqg0CAwEAAaNCMEAwDwYDVR0TAQH/BAUwAwEB/zAOBgNVHQ8BAf8EBAMC\nAYYwHQYDVR0OBBYEFIQYzIU07LwMlJQuCFmcx7IQTgoIMA0GCSqGSIb3DQEBCwUA\nA4IBAQCY8jdaQZChGsV2USggNiMOruYou6r4lK5IpDB/G/wkjUu0yKGX9rbxenDI\nU5PMCCjjmCXPI6T53iHTfIuJruydjsw2hUwsOjsQl/8gDHmG5Oq14cNA4+7QKj2V\n11RUYfXTpz0AhHsHnoDcTDMxnpXb78ieQw2E+MPWbbWmXw/VWJJwpxn4OkqNGpF8\nShQl5Z6psk4ajJaGSiJOrM8fDS8acDRRVCs0Uc7pmAoTGnHXXXO2VEA5Y9Xig3CH\n82o9RpR1BSiMDx0GXEcSUk1EZfFDgqSWjOhK1J8Z4jNVrqI1qbFff3RHksVK1EPe\nOAD0C/X7RxbAnp/XDjgA+RFrOO/r\n-----END CERTIFICATE-----"
@@ -0,0 +1,82 @@
+"""Duplicate and out-of-order uplink suppression."""
+
+import hashlib
+from collections import OrderedDict
+
+from .config import DEDUP_MAX_AGE, DEDUP_REDELIVERY_WINDOW, DEDUP_SIZE
+
+
+class UplinkDeduplicator:
+    """Recognise redelivered and out-of-order uplinks of one device.
+
+    Digests of recent raw payloads are kept in a bounded LRU index that also
+    forgets entries older than ``max_age`` seconds, so a redelivered copy is
+    dropped before it is decoded. Uplinks that embed sample timestamps (V2)
+    only share a digest when both content and timestamps match, and are
+    recognised for ``max_age``. Uplinks without them (V1) share a digest
+    whenever a device reports the same reading again, so their copies are
+    only recognised within ``redelivery_window`` seconds. An uplink whose
+    newest sample is older than the newest one accepted so far is stale.
+    """
+
+    __slots__ = ("_last", "_max_age", "_redelivery_window", "_seen", "_size", "newest")
+
+    def __init__(
+        self,
+        size: int = DEDUP_SIZE,
+        max_age: float = DEDUP_MAX_AGE,
+        redelivery_window: float = DEDUP_REDELIVERY_WINDOW,
+    ) -> None:
+        """Initialize an empty index."""
+        # digest -> (last seen, whether the uplink carries timestamps)
+        self._seen: OrderedDict[bytes, tuple[float, bool]] = OrderedDict()
+        self._size = size
+        self._max_age = max_age
+        self._redelivery_window = redelivery_window
+        self._last: bytes | None = None
+        self.newest: float | None = None
+
+    def duplicate(self, raw: bytes, now: float) -> bool:
+        """Return True for a copy of a recent uplink, otherwise remember it.
+
+        Until ``timestamped`` is called for it, an uplink counts as carrying
+        no timestamps.
+        """
+        digest = hashlib.blake2b(raw, digest_size=16).digest()
+        seen = self._seen
+        entry = seen.get(digest)
+        if entry is not None:
+            last_seen, timestamped = entry
+            window = self._max_age if timestamped else self._redelivery_window
+            if now - last_seen <= window:
+                seen.move_to_end(digest)
+                seen[digest] = (now, timestamped)
+                return True
+            del seen[digest]
+
+        seen[digest] = (now, False)
+        self._last = digest
+        if len(seen) > self._size:
+            seen.popitem(last=False)
+        cutoff = now - self._max_age
+        while seen and next(iter(seen.values()))[0] < cutoff:
+            seen.popitem(last=False)
+        return False
+
+    def timestamped(self) -> None:
+        """Mark the uplink ``duplicate`` last remembered as timestamped."""
+        entry = self._seen.get(self._last) if self._last is not None else None
+        if entry is not None:
+            self._seen[self._last] = (entry[0], True)
+
+    def stale(self, timestamp: float | None) -> bool:
+        """Return True for an uplink older than the newest accepted one.
+
+        Uplinks without a timestamp are never stale.
+        """
+        if timestamp is None:
+            return False
+        if self.newest is not None and timestamp < self.newest:
+            return True
+        self.newest = timestamp
+        return False
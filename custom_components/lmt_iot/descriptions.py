@@ -0,0 +1,177 @@
+"""Compiled sensor descriptions shared by every device of a type."""
+
+import dataclasses
+import logging
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.core import HomeAssistant, callback
+
+from .aggregates import (
+    AGGREGATES_KEY,
+    AggregateSpecs,
+    derived_key,
+    parse_aggregates,
+)
+from .config import DEFAULT_AVAILABILITY_TIMEOUT, DOMAIN
+from .filters import FILTER_KEYS
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_SENSOR_DESCRIPTIONS = f"{DOMAIN}_sensor_descriptions"
+
+
+def _numeric(value: Any) -> Any:
+    if isinstance(value, (int, float)):
+        return float(value)
+    return value
+
+
+def _passthrough(value: Any) -> Any:
+    return value
+
+
+@dataclass(frozen=True, kw_only=True)
+class LMTIoTSensorDescription(SensorEntityDescription):
+    """Describes an uplink sensor, compiled from one sensor_config entry."""
+
+    convert: Callable[[Any], Any] = _passthrough
+    write_filter: tuple[tuple[str, float], ...] = ()
+    availability_timeout: float = DEFAULT_AVAILABILITY_TIMEOUT
+    aggregates: AggregateSpecs = ()
+
+
+def compile_sensor_description(config: dict) -> LMTIoTSensorDescription:
+    """Interpret one sensor_config entry of the LMT IoT API."""
+    state_class = None
+    if config.get("stateClass"):
+        value = config["stateClass"].lower()
+        try:
+            state_class = SensorStateClass(value)
+        except ValueError:
+            _LOGGER.warning(f"Unknown state class: {value}")
+
+    device_class = None
+    if config.get("deviceClass"):
+        value = config["deviceClass"].lower()
+        try:
+            device_class = SensorDeviceClass(value)
+        except ValueError:
+            _LOGGER.warning(f"Unknown device class: {value}")
+
+    aggregates = ()
+    if AGGREGATES_KEY in config:
+        aggregates = parse_aggregates(config[AGGREGATES_KEY])
+        if aggregates is None:
+            _LOGGER.warning(f"Invalid aggregates for {config['key']}")
+            aggregates = ()
+
+    return LMTIoTSensorDescription(
+        key=config["key"],
+        name=config["name"],
+        native_unit_of_measurement=config.get("unit"),
+        suggested_display_precision=config.get("precision"),
+        state_class=state_class,
+        device_class=device_class,
+        convert=_numeric if state_class is not None else _passthrough,
+        write_filter=tuple((key, config[key]) for key in FILTER_KEYS if key in config),
+        availability_timeout=config.get(
+            "availabilityTimeout", DEFAULT_AVAILABILITY_TIMEOUT
+        ),
+        aggregates=aggregates,
+    )
+
+
+@callback
+def async_get_sensor_descriptions(
+    hass: HomeAssistant, device_type: str, sensor_config: list[dict]
+) -> tuple[LMTIoTSensorDescription, ...]:
+    """Return the compiled descriptions of a device type's sensor config.
+
+    Descriptions are compiled once per device type and shared by every
+    device and entry of that type; the same tuple is returned for as long
+    as the type's sensor config stays the same.
+    """
+    cache: dict[str, tuple[list[dict], tuple[LMTIoTSensorDescription, ...]]]
+    cache = hass.data.setdefault(DATA_SENSOR_DESCRIPTIONS, {})
+    cached = cache.get(device_type)
+    if cached is not None and (
+        cached[0] is sensor_config or cached[0] == sensor_config
+    ):
+        return cached[1]
+
+    descriptions = tuple(compile_sensor_description(config) for config in sensor_config)
+    cache[device_type] = (sensor_config, descriptions)
+    return descriptions
+
+
+def discovered_description(
+    key: str, value: Any, sensor_config: list[dict]
+) -> LMTIoTSensorDescription:
+    """Describe a sensor for an uplink key missing from the sensor config.
+
+    ``sensor_config`` is the device type's latest known config: if it lists
+    the key, that entry is used. Otherwise the sensor is named after the key
+    and numeric values are recorded as measurements.
+    """
+    for config in sensor_config:
+        if isinstance(config, dict) and config.get("key") == key and "name" in config:
+            return compile_sensor_description(config)
+    numeric = isinstance(value, (int, float)) and not isinstance(value, bool)
+    return LMTIoTSensorDescription(
+        key=key,
+        name=key.replace("_", " ").capitalize(),
+        state_class=SensorStateClass.MEASUREMENT if numeric else None,
+        convert=_numeric if numeric else _passthrough,
+    )
+
+
+def aggregate_specs(
+    descriptions: Iterable[LMTIoTSensorDescription], overrides: dict
+) -> dict[str, AggregateSpecs]:
+    """Return the aggregates of each numeric sensor key.
+
+    A user override replaces the device type's aggregates for that key.
+    """
+    specs = {}
+    for description in descriptions:
+        if description.state_class is None:
+            continue
+        if description.key in overrides:
+            key_specs = parse_aggregates(overrides[description.key]) or ()
+        else:
+            key_specs = description.aggregates
+        if key_specs:
+            specs[description.key] = key_specs
+    return specs
+
+
+def _window_label(window: int) -> str:
+    if window % 3600 == 0:
+        return f"{window // 3600} h"
+    if window % 60 == 0:
+        return f"{window // 60} min"
+    return f"{window} s"
+
+
+def derived_description(
+    description: LMTIoTSensorDescription, stat: str, window: int
+) -> LMTIoTSensorDescription:
+    """Describe the sensor showing one aggregate of ``description``."""
+    unit = description.native_unit_of_measurement
+    if stat == "rate":
+        unit = f"{unit}/h" if unit else None
+    return dataclasses.replace(
+        description,
+        key=derived_key(description.key, stat, window),
+        name=f"{description.name} {stat} {_window_label(window)}",
+        native_unit_of_measurement=unit,
+        state_class=SensorStateClass.MEASUREMENT,
+        device_class=description.device_class if stat != "rate" else None,
+    )
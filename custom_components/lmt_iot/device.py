@@ -0,0 +1,350 @@
+"""Runtime of a single LMT IoT device: MQTT connection and uplink parsing."""
+
+import asyncio
+import json
+import logging
+import ssl
+import time
+from collections.abc import Callable
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_HOST, CONF_PORT
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity import DeviceInfo
+
+from .aggregates import DeviceAggregates
+from .availability import DeviceAvailability
+from .backfill import UplinkBackfill
+from .capture import UplinkCapture
+from .config import (
+    CONF_API_KEY,
+    CONF_AVAILABILITY_MULTIPLIER,
+    CONF_BACKFILL,
+    CONF_CLIENT_CERT,
+    CONF_CLIENT_KEY,
+    CONF_DERIVED_SENSORS,
+    CONF_IMPORT_STATISTICS,
+    CONF_PERSISTENT_SESSION,
+    DEFAULT_AVAILABILITY_MULTIPLIER,
+    DEFAULT_BACKFILL,
+    DEFAULT_IMPORT_STATISTICS,
+    DEFAULT_PERSISTENT_SESSION,
+    DOMAIN,
+)
+from .dedup import UplinkDeduplicator
+from .descriptions import (
+    LMTIoTSensorDescription,
+    aggregate_specs,
+    discovered_description,
+)
+from .device_types import async_get_cached_sensor_config
+from .ingest import UplinkIngestQueue
+from .metrics import DeviceMetrics
+from .parser import (
+    decode_uplink,
+    parse_uplink_message,
+    parse_uplink_samples,
+    uplink_timestamp,
+)
+from .scheduler import async_get_connection_scheduler
+from .statistics import DeviceStatistics
+from .tls import async_get_ssl_context
+from .transport import MQTTTransport
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class LMTIoTDevice:
+    """One device's MQTT connection, watchdog and pipeline counters.
+
+    Parsed uplinks are handed to the config entry's ingest queue, which is
+    shared by every device of the entry.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        device_id: str,
+        device_type: str,
+        descriptions: tuple[LMTIoTSensorDescription, ...],
+        credentials: dict,
+        ingest: UplinkIngestQueue,
+        backfill: UplinkBackfill,
+        capture: UplinkCapture | None = None,
+    ) -> None:
+        """Initialize the device runtime."""
+        self._hass = hass
+        self._entry = entry
+        self._credentials = credentials
+        self._backfill = backfill
+        self._capture = capture
+        self.device_id = device_id
+        self.device_type = device_type
+        self.descriptions = descriptions
+        # Sensors for uplink keys the sensor config does not list
+        self.discovered: dict[str, LMTIoTSensorDescription] = {}
+        self._known_keys = frozenset(description.key for description in descriptions)
+        self.device_info = DeviceInfo(
+            identifiers={(DOMAIN, device_id)},
+            name=f"LMT IoT {device_id}",
+            manufacturer="LMT IoT",
+            model=device_type,
+        )
+        self.ingest = ingest
+        self.metrics = DeviceMetrics()
+        self.dedup = UplinkDeduplicator()
+        self.availability = DeviceAvailability(
+            hass,
+            device_id,
+            descriptions,
+            entry.options.get(
+                CONF_AVAILABILITY_MULTIPLIER, DEFAULT_AVAILABILITY_MULTIPLIER
+            ),
+        )
+        self.statistics = None
+        if entry.options.get(CONF_IMPORT_STATISTICS, DEFAULT_IMPORT_STATISTICS):
+            self.statistics = DeviceStatistics(hass, device_id, descriptions)
+        self.aggregates = DeviceAggregates(
+            aggregate_specs(descriptions, self.aggregate_overrides)
+        )
+        self.client: MQTTTransport | None = None
+        self._connect_task: asyncio.Task | None = None
+        self._unsub_backpressure: Callable[[], None] | None = None
+
+    @property
+    def connected(self) -> bool:
+        """Return whether the MQTT connection is up."""
+        return self.client is not None and self.client.connected
+
+    @property
+    def aggregate_overrides(self) -> dict:
+        """Return the user's derived sensor overrides by sensor key."""
+        return self._entry.options.get(CONF_DERIVED_SENSORS) or {}
+
+    @property
+    def sensor_descriptions(self) -> tuple[LMTIoTSensorDescription, ...]:
+        """Return the configured and the discovered uplink sensors."""
+        return self.descriptions + tuple(self.discovered.values())
+
+    @property
+    def persistent_session(self) -> bool:
+        """Return whether the broker keeps the device's MQTT session."""
+        return self._entry.options.get(
+            CONF_PERSISTENT_SESSION, DEFAULT_PERSISTENT_SESSION
+        )
+
+    @property
+    def certificates(self) -> tuple[str, str]:
+        """Return the client certificate and key the device connects with."""
+        return self._credentials[CONF_CLIENT_CERT], self._credentials[CONF_CLIENT_KEY]
+
+    @property
+    def reconnects(self) -> int:
+        """Return the number of successful reconnects."""
+        return self.client.reconnects if self.client is not None else 0
+
+    @callback
+    def async_start(self) -> None:
+        """Start the availability watchdog and connect in the background.
+
+        Setup does not wait for the TLS handshake; a failed connection is
+        retried with backoff by the transport.
+        """
+        self.availability.async_start()
+        self._connect_task = self._entry.async_create_background_task(
+            self._hass, self._async_connect(), f"{DOMAIN} connect {self.device_id}"
+        )
+
+    async def _async_connect(self) -> None:
+        try:
+            context = await async_get_ssl_context(
+                self._hass,
+                self._entry,
+                self.device_id,
+                self._credentials[CONF_CLIENT_CERT],
+                self._credentials[CONF_CLIENT_KEY],
+            )
+        except ssl.SSLError as e:
+            _LOGGER.error(f"Invalid certificates for device {self.device_id}: {e}")
+            return
+        self.client = MQTTTransport(
+            self._hass,
+            client_id=self.device_id,
+            host=self._entry.data[CONF_HOST],
+            port=self._entry.data.get(CONF_PORT, 8883),
+            ssl_context=context,
+            scheduler=async_get_connection_scheduler(self._hass),
+            topic=f"things/{self.device_id}/telemetry",
+            on_message=self._on_message,
+            on_connect=self._async_on_connect,
+            persistent_session=self.persistent_session,
+        )
+        self._unsub_backpressure = self.ingest.async_subscribe_backpressure(
+            self.client.async_pause_reading
+        )
+        await self.client.async_connect(retry=True)
+
+    async def async_stop(self) -> None:
+        """Disconnect and stop the availability watchdog."""
+        self.availability.async_stop()
+        await self._async_disconnect()
+
+    async def async_reconnect(self, credentials: dict) -> None:
+        """Reconnect with changed broker settings or certificates."""
+        self._credentials = credentials
+        await self._async_disconnect()
+        self.client = None
+        self._connect_task = self._entry.async_create_background_task(
+            self._hass, self._async_connect(), f"{DOMAIN} connect {self.device_id}"
+        )
+
+    async def _async_disconnect(self) -> None:
+        if self._connect_task is not None and not self._connect_task.done():
+            if self.client is None or not self.client.connecting:
+                # Still waiting for its turn to connect
+                self._connect_task.cancel()
+            # Let a connect already handed to the executor finish, so its
+            # socket is closed below rather than left behind.
+            await asyncio.wait([self._connect_task])
+        if self._unsub_backpressure is not None:
+            self._unsub_backpressure()
+            self._unsub_backpressure = None
+        if self.client is not None:
+            await self.client.async_disconnect()
+
+    @callback
+    def async_apply_options(self, capture: UplinkCapture | None) -> None:
+        """Apply changed entry options without reconnecting."""
+        options = self._entry.options
+        self._capture = capture
+        self.availability.async_set_multiplier(
+            options.get(CONF_AVAILABILITY_MULTIPLIER, DEFAULT_AVAILABILITY_MULTIPLIER)
+        )
+        if not options.get(CONF_IMPORT_STATISTICS, DEFAULT_IMPORT_STATISTICS):
+            self.statistics = None
+        elif self.statistics is None:
+            self.statistics = DeviceStatistics(
+                self._hass, self.device_id, self.sensor_descriptions
+            )
+        self._async_apply_sensor_descriptions()
+
+    @callback
+    def async_set_descriptions(
+        self, descriptions: tuple[LMTIoTSensorDescription, ...]
+    ) -> None:
+        """Switch to a changed sensor config without reconnecting."""
+        self.descriptions = descriptions
+        configured = {description.key for description in descriptions}
+        # A key the config now lists takes its sensor from the config.
+        self.discovered = {
+            key: description
+            for key, description in self.discovered.items()
+            if key not in configured
+        }
+        self._known_keys = frozenset(configured | self.discovered.keys())
+        self.availability.async_set_descriptions(descriptions)
+        self._async_apply_sensor_descriptions()
+
+    @callback
+    def async_discover_keys(self, parsed: dict) -> list[LMTIoTSensorDescription]:
+        """Add sensors for keys of ``parsed`` that no sensor reads yet.
+
+        Returns the new sensors' descriptions, taken from the device type's
+        cached sensor config when it lists the key.
+        """
+        if parsed.keys() <= self._known_keys:
+            return []
+        sensor_config = async_get_cached_sensor_config(self._hass, self.device_type)
+        added = []
+        for key, value in parsed.items():
+            if key in self._known_keys:
+                continue
+            description = discovered_description(key, value, sensor_config)
+            self.discovered[key] = description
+            self._known_keys |= {key}
+            added.append(description)
+        _LOGGER.info(
+            f"Device {self.device_id} reports new keys: "
+            f"{', '.join(description.key for description in added)}"
+        )
+        self._async_apply_sensor_descriptions()
+        return added
+
+    @callback
+    def _async_apply_sensor_descriptions(self) -> None:
+        descriptions = self.sensor_descriptions
+        self.aggregates.async_set_specs(
+            aggregate_specs(descriptions, self.aggregate_overrides)
+        )
+        if self.statistics is not None:
+            self.statistics.async_set_descriptions(descriptions)
+
+    def _on_message(self, topic: str, raw: bytes) -> None:
+        _LOGGER.debug("Received message on %s: %s", topic, raw)
+        metrics = self.metrics
+        metrics.message(topic, raw)
+        if self._capture is not None:
+            self._capture.record(self.device_id, topic, raw)
+        if self.dedup.duplicate(raw, time.monotonic()):
+            metrics.duplicates += 1
+            # The device is still reporting, even if this copy is dropped.
+            # Packets are read on the event loop.
+            self.availability.async_seen(cadence=False)
+            self._backfill.async_seen(self.device_id)
+            return
+        started = time.perf_counter()
+        try:
+            payload = decode_uplink(raw)
+            if payload is None:
+                metrics.parse_failure("not_an_object")
+                return
+            timestamp = uplink_timestamp(payload)
+            if timestamp is not None:
+                self.dedup.timestamped()
+            if self.dedup.stale(timestamp):
+                metrics.stale += 1
+                return
+            parsed = parse_uplink_message(payload) if payload else None
+            if not parsed:
+                metrics.parse_failure("no_values")
+                return
+            samples = (
+                parse_uplink_samples(payload) if self.statistics is not None else None
+            )
+        except json.JSONDecodeError as e:
+            metrics.parse_failure("invalid_json")
+            _LOGGER.error(f"Error parsing message: {e}")
+            return
+        except (KeyError, ValueError, TypeError) as e:
+            metrics.parse_failure("malformed")
+            _LOGGER.error(f"Error parsing message: {e}")
+            return
+        finally:
+            metrics.parse_time.record(time.perf_counter() - started)
+
+        self.ingest.put(self.device_id, topic, parsed, samples)
+        _LOGGER.debug("Parsed data: %s", parsed)
+
+    @callback
+    def _async_on_connect(self, session_present: bool) -> None:
+        """Fetch anything published while the device was not connected.
+
+        A resumed persistent session redelivers what was missed itself.
+        """
+        if session_present or not self._entry.options.get(
+            CONF_BACKFILL, DEFAULT_BACKFILL
+        ):
+            return
+        self._entry.async_create_background_task(
+            self._hass,
+            self._backfill.async_backfill(
+                self.device_id,
+                self._entry.data.get(CONF_API_KEY),
+                self.ingest,
+                self.dedup,
+                self.availability.interval,
+                samples=self.statistics is not None,
+            ),
+            f"{DOMAIN} backfill {self.device_id}",
+        )
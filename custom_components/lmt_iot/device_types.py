@@ -0,0 +1,124 @@
+"""Shared, persisted cache of LMT IoT device type metadata."""
+
+import asyncio
+import logging
+import time
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .api import LMTIoTApiError, async_get_api
+from .config import DEVICE_TYPE_TTL, DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_DEVICE_TYPES = f"{DOMAIN}_device_types"
+STORAGE_KEY = f"{DOMAIN}.device_types"
+STORAGE_VERSION = 1
+SAVE_DELAY = 10
+
+
+async def async_get_device_types(hass: HomeAssistant) -> "DeviceTypeCache":
+    """Return the shared device type cache, loading it on first use."""
+    cache = hass.data.get(DATA_DEVICE_TYPES)
+    if cache is None:
+        cache = hass.data[DATA_DEVICE_TYPES] = DeviceTypeCache(hass)
+    await cache.async_load()
+    return cache
+
+
+@callback
+def async_get_cached_sensor_config(hass: HomeAssistant, device_type: str) -> list:
+    """Return a type's cached sensor config, without loading or fetching."""
+    cache: DeviceTypeCache | None = hass.data.get(DATA_DEVICE_TYPES)
+    cached = cache.async_get_cached(device_type) if cache is not None else None
+    return cached["sensors"] if cached else []
+
+
+def _smart_home(type_data: dict) -> dict:
+    return (type_data.get("measurements") or {}).get("smartHome") or {}
+
+
+class DeviceTypeCache:
+    """Device type metadata keyed by type, shared by all config entries.
+
+    Entries younger than ``DEVICE_TYPE_TTL`` are served without a request.
+    Older entries are revalidated with ETag / If-Modified-Since, and
+    concurrent lookups of the same type share one in-flight request.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the cache."""
+        self._hass = hass
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._types: dict[str, dict] = {}
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._load_task: asyncio.Task | None = None
+
+    async def async_load(self) -> None:
+        """Load persisted type metadata once."""
+        if self._load_task is None:
+            self._load_task = self._hass.async_create_task(self._async_load())
+        await self._load_task
+
+    async def _async_load(self) -> None:
+        data = await self._store.async_load()
+        if data:
+            self._types = {**data, **self._types}
+
+    @callback
+    def _data_to_save(self) -> dict[str, dict]:
+        return self._types
+
+    @callback
+    def async_get_cached(self, device_type: str) -> dict | None:
+        """Return cached metadata for a type without any request."""
+        return self._types.get(device_type)
+
+    async def async_get(self, device_type: str, api_key: str) -> dict:
+        """Return metadata for a type, fetching or revalidating it if stale.
+
+        The returned dict has ``enabled`` and ``sensors`` keys.
+        """
+        cached = self._types.get(device_type)
+        if cached and time.time() - cached["fetched"] < DEVICE_TYPE_TTL:
+            return cached
+
+        task = self._inflight.get(device_type)
+        if task is None:
+            task = self._inflight[device_type] = self._hass.async_create_task(
+                self._async_fetch(device_type, api_key)
+            )
+            task.add_done_callback(lambda _: self._inflight.pop(device_type, None))
+        return await asyncio.shield(task)
+
+    async def _async_fetch(self, device_type: str, api_key: str) -> dict:
+        cached = self._types.get(device_type)
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        response = await async_get_api(self._hass).async_request(
+            "GET", f"/devices/types/{device_type}", api_key, headers=headers
+        )
+        if response.status == 304 and cached:
+            _LOGGER.debug(f"Device type {device_type} not modified")
+            entry = {**cached, "fetched": time.time()}
+        elif response.status == 200:
+            smart_home = _smart_home(response.data)
+            entry = {
+                "enabled": smart_home.get("enabled", False),
+                "sensors": smart_home.get("sensors", []),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched": time.time(),
+            }
+        else:
+            raise LMTIoTApiError(response.status, response.url)
+
+        self._types[device_type] = entry
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+        return entry
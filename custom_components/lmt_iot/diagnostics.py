@@ -0,0 +1,86 @@
+"""Diagnostics support for LMT IoT."""
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from .config import (
+    CONF_API_KEY,
+    CONF_CA_CERT,
+    CONF_CLIENT_CERT,
+    CONF_CLIENT_KEY,
+    DOMAIN,
+)
+from .device import LMTIoTDevice
+from .scheduler import async_get_connection_scheduler
+
+TO_REDACT = {CONF_API_KEY, CONF_CA_CERT, CONF_CLIENT_CERT, CONF_CLIENT_KEY}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    diagnostics: dict[str, Any] = {
+        "entry": {
+            "data": async_redact_data(entry.data, TO_REDACT),
+            "options": dict(entry.options),
+        }
+    }
+
+    data = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+    if data is None:
+        return diagnostics
+
+    ingest = data["ingest"]
+    diagnostics["ingest"] = {
+        "depth": ingest.depth,
+        "received": ingest.received,
+        "dropped": ingest.dropped,
+        "high_watermark": ingest.high_watermark,
+        "pauses": ingest.pauses,
+        "handoff_latency": ingest.handoff_latency.as_dict(),
+    }
+    diagnostics["connection_scheduler"] = async_get_connection_scheduler(hass).as_dict()
+    capture = data["capture"]
+    if capture is not None:
+        diagnostics["capture"] = {
+            "path": capture.path,
+            "recorded": capture.recorded,
+            "dropped": capture.dropped,
+        }
+    diagnostics["devices"] = {
+        device_id: _device_diagnostics(device)
+        for device_id, device in data["devices"].items()
+    }
+    return diagnostics
+
+
+def _device_diagnostics(device: LMTIoTDevice) -> dict[str, Any]:
+    availability = device.availability
+    return {
+        "device_type": device.device_type,
+        "metrics": device.metrics.as_dict(),
+        "connection": {
+            "connected": device.connected,
+            "reconnects": device.reconnects,
+            "persistent_session": device.persistent_session,
+        },
+        "availability": {
+            "available": availability.available,
+            "learned_interval": availability.interval,
+            "timeout": availability.timeout,
+        },
+        "discovered_sensors": list(device.discovered),
+        "recent_payloads": [
+            {
+                "received": dt_util.utc_from_timestamp(received).isoformat(),
+                "topic": topic,
+                "payload": raw.decode(errors="replace"),
+            }
+            for received, topic, raw in device.metrics.recent_payloads
+        ],
+    }
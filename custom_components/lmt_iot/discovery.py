@@ -0,0 +1,138 @@
+"""Device discovery and certificate provisioning against the LMT IoT API."""
+
+import asyncio
+import logging
+
+import aiohttp
+from homeassistant.core import HomeAssistant
+
+from .api import ApiResponse, LMTIoTApiError, async_get_api
+from .config import (
+    CONF_CLIENT_CERT,
+    CONF_CLIENT_KEY,
+    DISCOVERY_MAX_PAGES,
+    DISCOVERY_PAGE_SIZE,
+)
+from .device_types import async_get_device_types
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_discover_devices(
+    hass: HomeAssistant, api_key: str
+) -> tuple[list[dict], dict[str, dict | None]]:
+    """Fetch every page of the account's devices and their type metadata.
+
+    Each unseen device type is resolved in the background as soon as its
+    page arrives, so type lookups overlap with the remaining pages. Types
+    that cannot be looked up map to None.
+    """
+    api = async_get_api(hass)
+    device_types = await async_get_device_types(hass)
+    devices = []
+    type_tasks = {}
+
+    async def resolve_type(device_type):
+        try:
+            return await device_types.async_get(device_type, api_key)
+        except LMTIoTApiError as e:
+            _LOGGER.warning(f"Skipping device type {device_type}: {e}")
+            return None
+
+    try:
+        for page in range(DISCOVERY_MAX_PAGES):
+            response = await api.async_request(
+                "GET",
+                "/devices",
+                api_key,
+                params={
+                    "limit": DISCOVERY_PAGE_SIZE,
+                    "offset": page * DISCOVERY_PAGE_SIZE,
+                },
+            )
+            response.raise_for_status()
+            items = response.data.get("data", [])
+            devices.extend(items)
+            for device in items:
+                if device["type"] not in type_tasks:
+                    type_tasks[device["type"]] = hass.async_create_task(
+                        resolve_type(device["type"])
+                    )
+            if len(items) < DISCOVERY_PAGE_SIZE:
+                break
+        else:
+            _LOGGER.warning(
+                f"Device discovery stopped after {DISCOVERY_MAX_PAGES} pages"
+            )
+        results = await asyncio.gather(*type_tasks.values())
+    except BaseException:
+        for task in type_tasks.values():
+            task.cancel()
+        raise
+
+    return devices, dict(zip(type_tasks, results))
+
+
+async def async_request_certificates(
+    hass: HomeAssistant, api_key: str, device_id: str
+) -> ApiResponse:
+    """Request smart home MQTT credentials for a device.
+
+    The response is returned as is; callers map error statuses themselves.
+    """
+    _LOGGER.info(f"Requesting certificates for device: {device_id}")
+    return await async_get_api(hass).async_request(
+        "POST",
+        f"/devices/{device_id}/certificates",
+        api_key,
+        json={"target": "SMART_HOME"},
+    )
+
+
+async def async_provision_devices(
+    hass: HomeAssistant, api_key: str, device_ids: list[str]
+) -> dict[str, dict]:
+    """Request credentials for several devices at once.
+
+    Requests run concurrently, bounded by the API client's per-host limit.
+    Devices whose request fails are logged and left out of the result.
+    """
+
+    async def provision(device_id):
+        try:
+            response = await async_request_certificates(hass, api_key, device_id)
+            response.raise_for_status()
+        except (TimeoutError, aiohttp.ClientError, LMTIoTApiError) as e:
+            _LOGGER.warning(f"Failed to provision device {device_id}: {e}")
+            return None
+        return {
+            CONF_CLIENT_CERT: response.data["certificatePem"],
+            CONF_CLIENT_KEY: response.data["privateKey"],
+        }
+
+    results = await asyncio.gather(*(provision(device_id) for device_id in device_ids))
+    return {
+        device_id: credentials
+        for device_id, credentials in zip(device_ids, results)
+        if credentials
+    }
+
+
+def format_device_name(device: dict, device_id: str) -> str:
+    """Format a device's display name from its house and room."""
+    room = device.get("room") or {}
+    custom_name = room.get("customName")
+    default_name = room.get("name") or ""
+    room_name = (
+        custom_name if custom_name else (default_name.title() if default_name else "")
+    )
+    house_name = (room.get("house") or {}).get("name", "")
+
+    display_parts = []
+    if house_name:
+        display_parts.append(house_name)
+    if room_name:
+        display_parts.append(room_name)
+    display_parts.append(f"({device_id})")
+
+    return " - ".join(display_parts)
@@ -0,0 +1,103 @@
+"""State write filtering for LMT IoT sensors."""
+
+from typing import Any
+
+from .config import DEFAULT_WRITE_HEARTBEAT
+
+# sensor_config keys that tune write filtering, with the option override
+# format ``{"<sensor key>": {"deadband": 0.5, "minInterval": 300}}``.
+FILTER_KEYS = ("deadband", "deadbandPercent", "minInterval", "heartbeat")
+
+
+class StateWriteFilter:
+    """Decide whether a new sensor value is worth a state write.
+
+    Unchanged values, numeric changes within the absolute (``deadband``) or
+    relative (``deadbandPercent``) deadband and changes arriving sooner than
+    ``minInterval`` seconds after the last write are suppressed. A change
+    held back by ``minInterval`` is still due once the interval has passed
+    (see ``write_delay``). A value is always written once ``heartbeat``
+    seconds have passed since the last write, so the state keeps being
+    refreshed.
+    """
+
+    __slots__ = (
+        "_last_value",
+        "_last_write",
+        "deadband",
+        "deadband_percent",
+        "heartbeat",
+        "min_interval",
+    )
+
+    def __init__(
+        self,
+        deadband: float = 0,
+        deadband_percent: float = 0,
+        min_interval: float = 0,
+        heartbeat: float = DEFAULT_WRITE_HEARTBEAT,
+    ) -> None:
+        """Initialize the filter."""
+        self.deadband = deadband
+        self.deadband_percent = deadband_percent
+        self.min_interval = min_interval
+        self.heartbeat = heartbeat
+        self._last_value: Any = None
+        self._last_write: float | None = None
+
+    @classmethod
+    def from_config(
+        cls, config: dict, override: dict | None = None
+    ) -> "StateWriteFilter":
+        """Build a filter from a sensor_config entry and a user override."""
+        settings = {key: config[key] for key in FILTER_KEYS if key in config}
+        settings.update(override or {})
+        return cls(
+            deadband=settings.get("deadband", 0),
+            deadband_percent=settings.get("deadbandPercent", 0),
+            min_interval=settings.get("minInterval", 0),
+            heartbeat=settings.get("heartbeat", DEFAULT_WRITE_HEARTBEAT),
+        )
+
+    @property
+    def settings(self) -> tuple[float, float, float, float]:
+        """Return the thresholds, to tell whether another filter differs."""
+        return self.deadband, self.deadband_percent, self.min_interval, self.heartbeat
+
+    def should_write(self, value: Any, now: float) -> bool:
+        """Return whether ``value`` arriving at ``now`` should be written."""
+        return self.write_delay(value, now) == 0
+
+    def write_delay(self, value: Any, now: float) -> float | None:
+        """Return in how many seconds ``value`` arriving at ``now`` may be written.
+
+        0 means right away. None means it is not worth writing at all, while
+        a change held back only by ``minInterval`` gets the time left, so
+        the caller can write it then if nothing newer arrives.
+        """
+        if self._last_write is None:
+            return 0
+        elapsed = now - self._last_write
+        if self.heartbeat and elapsed >= self.heartbeat:
+            return 0
+        last = self._last_value
+        if value == last:
+            return None
+        if (
+            isinstance(value, (int, float))
+            and isinstance(last, (int, float))
+            and not isinstance(value, bool)
+        ):
+            delta = abs(value - last)
+            if delta < self.deadband:
+                return None
+            if delta < abs(last) * self.deadband_percent / 100:
+                return None
+        if elapsed < self.min_interval:
+            return self.min_interval - elapsed
+        return 0
+
+    def written(self, value: Any, now: float) -> None:
+        """Record that ``value`` was written at ``now``."""
+        self._last_value = value
+        self._last_write = now
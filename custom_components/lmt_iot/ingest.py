@@ -0,0 +1,190 @@
+"""Ingest queue between the MQTT network thread and the event loop."""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+
+from homeassistant.core import HomeAssistant, callback
+
+from .config import OVERFLOW_DROP_NEWEST
+from .metrics import Histogram
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class UplinkIngestQueue:
+    """Bounded, batching handoff of parsed uplinks to the event loop.
+
+    Uplinks may be put from any thread. Only one drain callback is pending on
+    the event loop at a time; it takes up to ``batch_size`` uplinks, merges
+    repeated updates of the same device, topic and key (latest value wins)
+    and hands one payload per device and topic to ``handler``. Live and
+    backfilled uplinks have different topics and are never merged, so older
+    backfilled values cannot replace live ones or hide that they were live.
+    Sample history attached to the uplinks is concatenated rather than
+    coalesced. The time each uplink spent queued is recorded in
+    ``handoff_latency``.
+
+    With ``backpressure`` the queue never drops, since uplinks acknowledged
+    to the broker (QoS 1 on a persistent session) would be lost for good.
+    Once it holds ``maxsize`` uplinks it asks its backpressure listeners,
+    the MQTT transports, to stop reading, so the broker keeps the rest
+    unacknowledged, and lets them resume once it has drained to half. Only
+    the packets of a read already in progress are queued past ``maxsize``.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        handler: Callable[[str, str, dict, dict | None], None],
+        maxsize: int,
+        batch_size: int,
+        overflow_policy: str,
+        backpressure: bool = False,
+    ) -> None:
+        """Initialize the queue."""
+        self._hass = hass
+        self._handler = handler
+        self._maxsize = maxsize
+        self._batch_size = batch_size
+        self._overflow_policy = overflow_policy
+        self._backpressure = backpressure
+        self._backpressure_listeners: list[Callable[[bool], None]] = []
+        self._paused = False
+        self._lock = threading.Lock()
+        self._items: deque[tuple[str, str, dict, dict | None, float]] = deque()
+        self._drain_scheduled = False
+        self._dropped_reported = 0
+        self.received = 0
+        self.dropped = 0
+        self.high_watermark = 0
+        self.pauses = 0
+        self.handoff_latency = Histogram()
+
+    @property
+    def depth(self) -> int:
+        """Return the number of uplinks waiting to be drained."""
+        return len(self._items)
+
+    def set_overflow_policy(self, overflow_policy: str, backpressure: bool) -> None:
+        """Switch the policy applied once the queue is full."""
+        self._overflow_policy = overflow_policy
+        self._backpressure = backpressure
+        if self._paused and not backpressure:
+            self._paused = False
+            self._async_notify_backpressure(False)
+
+    @callback
+    def async_subscribe_backpressure(
+        self, listener: Callable[[bool], None]
+    ) -> Callable[[], None]:
+        """Register a listener called with True to pause reading, False to resume."""
+        self._backpressure_listeners.append(listener)
+        if self._paused:
+            listener(True)
+
+        @callback
+        def unsubscribe() -> None:
+            self._backpressure_listeners.remove(listener)
+
+        return unsubscribe
+
+    def put(
+        self, device_id: str, topic: str, parsed: dict, samples: dict | None = None
+    ) -> bool:
+        """Queue a parsed uplink; safe to call from any thread.
+
+        Returns False when the uplink was rejected by the overflow policy.
+        """
+        with self._lock:
+            self.received += 1
+            full = len(self._items) >= self._maxsize
+            if full and not self._backpressure:
+                self.dropped += 1
+                if self._overflow_policy == OVERFLOW_DROP_NEWEST:
+                    return False
+                self._items.popleft()
+            self._items.append((device_id, topic, parsed, samples, time.monotonic()))
+            self.high_watermark = max(self.high_watermark, len(self._items))
+            pause = full and self._backpressure and not self._paused
+            if pause:
+                self._paused = True
+                self.pauses += 1
+            schedule = not self._drain_scheduled
+            self._drain_scheduled = True
+
+        if pause:
+            self._run_on_loop(self._async_notify_backpressure, True)
+        if schedule:
+            self._hass.loop.call_soon_threadsafe(self._async_drain)
+        return True
+
+    def clear(self) -> None:
+        """Discard all queued uplinks."""
+        with self._lock:
+            self._items.clear()
+
+    def _run_on_loop(self, func: Callable, *args) -> None:
+        """Run a callback on the event loop, right away if already on it."""
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._hass.loop:
+            func(*args)
+        else:
+            self._hass.loop.call_soon_threadsafe(func, *args)
+
+    @callback
+    def _async_notify_backpressure(self, paused: bool) -> None:
+        for listener in list(self._backpressure_listeners):
+            listener(paused)
+
+    @callback
+    def _async_drain(self) -> None:
+        """Deliver one batch of queued uplinks, coalesced per device and topic."""
+        items = self._items
+        with self._lock:
+            batch = [items.popleft() for _ in range(min(self._batch_size, len(items)))]
+            more = bool(items)
+            if not more:
+                self._drain_scheduled = False
+            resume = self._paused and len(items) <= self._maxsize // 2
+            if resume:
+                self._paused = False
+
+        if resume:
+            self._async_notify_backpressure(False)
+
+        now = time.monotonic()
+        record_latency = self.handoff_latency.record
+        merged: dict[tuple[str, str], list] = {}
+        for device_id, topic, parsed, samples, queued_at in batch:
+            record_latency(now - queued_at)
+            pending = merged.get((device_id, topic))
+            if pending is None:
+                merged[device_id, topic] = [parsed, samples]
+                continue
+            pending[0].update(parsed)
+            if samples:
+                if pending[1] is None:
+                    pending[1] = samples
+                else:
+                    for key, series in samples.items():
+                        pending[1].setdefault(key, []).extend(series)
+
+        for (device_id, topic), (payload, samples) in merged.items():
+            self._handler(device_id, topic, payload, samples)
+
+        if self.dropped != self._dropped_reported:
+            _LOGGER.warning(
+                f"Ingest queue overflow: dropped {self.dropped - self._dropped_reported} "
+                f"uplinks (policy {self._overflow_policy}, limit {self._maxsize})"
+            )
+            self._dropped_reported = self.dropped
+
+        if more:
+            self._hass.loop.call_soon(self._async_drain)
@@ -0,0 +1,98 @@
+"""Runtime pipeline metrics for LMT IoT devices."""
+
+import time
+from bisect import bisect_left
+from collections import deque
+
+from .config import RECENT_PAYLOADS
+
+# Histogram bucket upper bounds in milliseconds; the last bucket is open.
+HISTOGRAM_BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram, cheap enough for the hot path."""
+
+    __slots__ = ("buckets", "count", "maximum", "total")
+
+    def __init__(self) -> None:
+        """Initialize an empty histogram."""
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+
+    def record(self, seconds: float) -> None:
+        """Add one observation given in seconds."""
+        milliseconds = seconds * 1000
+        self.count += 1
+        self.total += milliseconds
+        self.maximum = max(self.maximum, milliseconds)
+        self.buckets[bisect_left(HISTOGRAM_BUCKETS_MS, milliseconds)] += 1
+
+    @property
+    def mean(self) -> float | None:
+        """Return the mean in milliseconds, or None without observations."""
+        return self.total / self.count if self.count else None
+
+    def as_dict(self) -> dict:
+        """Return the histogram as plain data."""
+        labels = [f"<={bound}ms" for bound in HISTOGRAM_BUCKETS_MS]
+        labels.append(f">{HISTOGRAM_BUCKETS_MS[-1]}ms")
+        return {
+            "count": self.count,
+            "mean_ms": round(self.mean, 3) if self.count else None,
+            "max_ms": round(self.maximum, 3),
+            "buckets": dict(zip(labels, self.buckets)),
+        }
+
+
+class DeviceMetrics:
+    """Counters for one device's uplink pipeline.
+
+    Updated on the event loop only. The raw payloads of the last
+    ``RECENT_PAYLOADS`` uplinks are kept for the diagnostics download.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        self.messages_received = 0
+        self.parse_failures: dict[str, int] = {}
+        self.duplicates = 0
+        self.stale = 0
+        self.parse_time = Histogram()
+        self.state_writes = 0
+        self.suppressed_writes = 0
+        self.last_message: float | None = None
+        self.recent_payloads: deque[tuple[float, str, bytes]] = deque(
+            maxlen=RECENT_PAYLOADS
+        )
+
+    def message(self, topic: str, raw: bytes) -> None:
+        """Record a received raw uplink."""
+        now = time.time()
+        self.messages_received += 1
+        self.last_message = now
+        self.recent_payloads.append((now, topic, raw))
+
+    def parse_failure(self, reason: str) -> None:
+        """Record an uplink that could not be parsed."""
+        self.parse_failures[reason] = self.parse_failures.get(reason, 0) + 1
+
+    @property
+    def parse_failures_total(self) -> int:
+        """Return the number of unparseable uplinks."""
+        return sum(self.parse_failures.values())
+
+    def as_dict(self) -> dict:
+        """Return the counters as plain data."""
+        return {
+            "messages_received": self.messages_received,
+            "parse_failures": dict(self.parse_failures),
+            "duplicates": self.duplicates,
+            "stale": self.stale,
+            "parse_time": self.parse_time.as_dict(),
+            "state_writes": self.state_writes,
+            "suppressed_writes": self.suppressed_writes,
+            "last_message": self.last_message,
+        }
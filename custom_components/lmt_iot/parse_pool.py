@@ -0,0 +1,151 @@
+"""Batch uplink parsing off the event loop."""
+
+import logging
+import multiprocessing
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from pathlib import Path
+from typing import TypeVar
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import Event, HomeAssistant, callback
+
+from .config import (
+    DOMAIN,
+    PARSE_POOL_WORKERS,
+    PARSE_PROCESS_MIN_BYTES,
+    PARSE_THREAD_MIN_BYTES,
+    PARSE_THREAD_MIN_UPLINKS,
+)
+from .parser import UplinkBatch, parse_uplink_batch, parse_uplink_page
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_PARSE_POOL = f"{DOMAIN}_parse_pool"
+
+_T = TypeVar("_T")
+
+# Run in each worker before the first job. Unpickling a parse job
+# imports this package's parser module, which would otherwise run the
+# package __init__ and pull in Home Assistant and paho. The parser only
+# needs the standard library, so register a bare package module instead.
+_WORKER_INIT = (
+    "import sys, types\n"
+    f"package = types.ModuleType({__package__!r})\n"
+    f"package.__path__ = [{str(Path(__file__).parent)!r}]\n"
+    f"sys.modules.setdefault({__package__!r}, package)\n"
+)
+
+
+async def async_parse_uplink_batch(
+    hass: HomeAssistant,
+    payloads: Sequence[bytes | dict],
+    device_ids: Sequence[str | None] | None = None,
+    samples: bool = False,
+) -> UplinkBatch:
+    """Parse a batch of uplinks without blocking the event loop for long.
+
+    Decoded payloads are parsed inline, or in the executor from
+    ``PARSE_THREAD_MIN_UPLINKS`` uplinks on; they are never sent to the
+    worker process, as pickling them costs about as much as parsing them.
+    Raw payloads are routed by size, see ``_async_parse``.
+    """
+    return await _async_parse(
+        hass,
+        partial(parse_uplink_batch, payloads, device_ids, samples),
+        _raw_size(payloads),
+        len(payloads) >= PARSE_THREAD_MIN_UPLINKS,
+    )
+
+
+async def async_parse_uplink_page(
+    hass: HomeAssistant,
+    raw: bytes,
+    newer_than: float | None = None,
+    samples: bool = False,
+) -> UplinkBatch | None:
+    """Parse a raw API page of uplinks without blocking the event loop for long."""
+    return await _async_parse(
+        hass, partial(parse_uplink_page, raw, newer_than, samples), len(raw)
+    )
+
+
+async def _async_parse(
+    hass: HomeAssistant, job: Callable[[], _T], raw_size: int, large: bool = False
+) -> _T:
+    """Run a parse job where it costs the event loop least.
+
+    Jobs of fewer than ``PARSE_THREAD_MIN_BYTES`` raw bytes run inline,
+    unless ``large``, and larger ones in the executor. From
+    ``PARSE_PROCESS_MIN_BYTES`` on they go to the worker process shared by
+    every entry, where decoding and parsing hold neither the event loop nor
+    its GIL; below that, copying the payload and result between processes
+    costs more than it saves. If the worker cannot be used, the job runs in
+    the executor instead.
+    """
+    if raw_size >= PARSE_PROCESS_MIN_BYTES:
+        pool = _async_get_pool(hass)
+        if pool is not None:
+            try:
+                return await hass.loop.run_in_executor(pool, job)
+            except (BrokenProcessPool, OSError) as e:
+                _LOGGER.warning(f"Parse worker failed, parsing in a thread: {e}")
+                async_shutdown_pool(hass, restart=False)
+    elif raw_size < PARSE_THREAD_MIN_BYTES and not large:
+        return job()
+    return await hass.async_add_executor_job(job)
+
+
+def _raw_size(payloads: Sequence[bytes | dict]) -> int:
+    """Return the total size of a batch of raw payloads, or 0 if any is decoded."""
+    size = 0
+    for payload in payloads:
+        if not isinstance(payload, bytes | bytearray):
+            return 0
+        size += len(payload)
+    return size
+
+
+@callback
+def _async_get_pool(hass: HomeAssistant) -> ProcessPoolExecutor | None:
+    """Return the shared parse pool, starting it on first use."""
+    if DATA_PARSE_POOL in hass.data:
+        return hass.data[DATA_PARSE_POOL]
+    try:
+        # Spawned, not forked: forking the running core is not safe.
+        pool = ProcessPoolExecutor(
+            max_workers=PARSE_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=exec,
+            initargs=(_WORKER_INIT,),
+        )
+    except (OSError, NotImplementedError) as e:
+        _LOGGER.warning(f"Cannot start a parse worker, parsing in threads: {e}")
+        pool = None
+    hass.data[DATA_PARSE_POOL] = pool
+
+    @callback
+    def _async_stop(event: Event) -> None:
+        async_shutdown_pool(hass, restart=False)
+
+    if pool is not None:
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_stop)
+    return pool
+
+
+@callback
+def async_shutdown_pool(hass: HomeAssistant, restart: bool = True) -> None:
+    """Stop the shared parse worker, if it is running.
+
+    With ``restart`` the next large batch starts a new worker; without it
+    the remaining batches are parsed in the executor.
+    """
+    pool = hass.data.get(DATA_PARSE_POOL)
+    if restart:
+        hass.data.pop(DATA_PARSE_POOL, None)
+    else:
+        hass.data[DATA_PARSE_POOL] = None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -1,5 +1,38 @@
 """Message parser for LMT IoT Device uplink messages."""
 
+import itertools
+import json
+import math
+from array import array
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+_MISSING = object()
+
+_SMOKE_STATUS = {0: "No smoke", 1: "Warning", 2: "Alarm"}
+
+
+def decode_uplink(raw: bytes) -> dict | None:
+    """Decode a raw uplink payload, returning None if it is not a JSON object."""
+    payload = _json_loads(raw)
+    return payload if isinstance(payload, dict) else None
+
+
+def parse_uplink_bytes(raw: bytes) -> dict | None:
+    """Decode and parse a raw uplink payload (V1 or V2 format)."""
+    payload = decode_uplink(raw)
+    if payload is None:
+        return None
+    return parse_uplink_message(payload)
+
 
 def parse_uplink_message(payload: dict) -> dict | None:
     """Parse uplink message (V1 or V2 format)."""
@@ -11,6 +44,59 @@ def parse_uplink_message(payload: dict) -> dict | None:
     return None
 
 
+def _classify_signal(rsrp: int) -> str:
+    if rsrp >= -95:
+        return "Good"
+    elif rsrp >= -105:
+        return "Moderate"
+    return "Bad"
+
+
+def _v1_series(key: str):
+    """Build an extractor reporting the newest sample of a V1 series."""
+
+    def extract(value, parsed: dict) -> None:
+        if value:
+            samples = value[0]["mData"]
+            if samples:
+                parsed[key] = samples[-1]
+
+    return extract
+
+
+def _v1_scalar(key: str):
+    """Build an extractor copying a non-null V1 scalar."""
+
+    def extract(value, parsed: dict) -> None:
+        if value is not None:
+            parsed[key] = value
+
+    return extract
+
+
+def _v1_smoke_status(value, parsed: dict) -> None:
+    parsed["SMOKE_STATUS"] = _SMOKE_STATUS.get(value, "UNKNOWN")
+
+
+def _v1_rsrp(value, parsed: dict) -> None:
+    if value is not None:
+        parsed["RSRP"] = value
+        parsed["SIGNAL_STRENGTH"] = _classify_signal(value)
+
+
+# V1 source field -> extractor, in output key order.
+_V1_FIELDS = (
+    ("mTempData", _v1_series("TEMPERATURE")),
+    ("mHumidData", _v1_series("HUMIDITY")),
+    ("mCoData", _v1_series("CO")),
+    ("mIaqData", _v1_series("IAQ")),
+    ("mSmokeStatus", _v1_smoke_status),
+    ("mRsrp", _v1_rsrp),
+    ("mRsrq", _v1_scalar("RSRQ")),
+    ("mSinr", _v1_scalar("SINR")),
+)
+
+
 def _parse_v1_uplink(payload: dict) -> dict | None:
     """Parse v1 uplink message format."""
     if not isinstance(payload["data"], list):
@@ -23,77 +109,435 @@ def _parse_v1_uplink(payload: dict) -> dict | None:
             continue
 
         parsed = {}
-
-        if "mTempData" in device_data and device_data["mTempData"]:
-            temp_data = device_data["mTempData"][0]["mData"]
-            if temp_data:
-                parsed["TEMPERATURE"] = temp_data[-1]
-
-        if "mHumidData" in device_data and device_data["mHumidData"]:
-            humid_data = device_data["mHumidData"][0]["mData"]
-            if humid_data:
-                parsed["HUMIDITY"] = humid_data[-1]
-
-        if "mCoData" in device_data and device_data["mCoData"]:
-            co_data = device_data["mCoData"][0]["mData"]
-            if co_data:
-                parsed["CO"] = co_data[-1]
-
-        if "mIaqData" in device_data and device_data["mIaqData"]:
-            iaq_data = device_data["mIaqData"][0]["mData"]
-            if iaq_data:
-                parsed["IAQ"] = iaq_data[-1]
-
-        if "mSmokeStatus" in device_data:
-            smoke_status = device_data["mSmokeStatus"]
-            status_map = {0: "No smoke", 1: "Warning", 2: "Alarm"}
-            parsed["SMOKE_STATUS"] = status_map.get(smoke_status, "UNKNOWN")
-
-        if "mRsrp" in device_data and device_data["mRsrp"] is not None:
-            parsed["RSRP"] = device_data["mRsrp"]
-            parsed["SIGNAL_STRENGTH"] = _classify_signal(device_data["mRsrp"])
-        if "mRsrq" in device_data and device_data["mRsrq"] is not None:
-            parsed["RSRQ"] = device_data["mRsrq"]
-        if "mSinr" in device_data and device_data["mSinr"] is not None:
-            parsed["SINR"] = device_data["mSinr"]
+        get = device_data.get
+        for source, extract in _V1_FIELDS:
+            value = get(source, _MISSING)
+            if value is not _MISSING:
+                extract(value, parsed)
 
         return parsed if parsed else None
 
     return None
 
 
-def _classify_signal(rsrp: int) -> str:
-    if rsrp >= -95:
-        return "Good"
-    elif rsrp >= -105:
-        return "Moderate"
-    return "Bad"
+def _v2_signal_strength(values: list, parsed: dict) -> None:
+    signal = values[-1]
+    if len(signal) >= 4:
+        try:
+            rsrp = int(signal[1])
+            parsed["RSRP"] = rsrp
+            parsed["RSRQ"] = int(signal[2])
+            parsed["SINR"] = int(signal[3])
+            parsed["SIGNAL_STRENGTH"] = _classify_signal(rsrp)
+        except (ValueError, TypeError, IndexError):
+            pass
+
+
+# V2 measurements needing special handling; all others report the newest
+# [timestamp, value] sample as a float.
+_V2_FIELDS = {
+    "SIGNAL_STRENGTH": _v2_signal_strength,
+}
 
 
 def _parse_v2_uplink(payload: dict) -> dict | None:
     """Parse v2 uplink message format."""
-    measurements = payload.get("measurements", {})
+    measurements = payload.get("measurements")
     if not measurements:
         return None
 
     parsed = {}
+    special = _V2_FIELDS
+
+    for key, values in measurements.items():
+        if not values:
+            continue
+        extract = special.get(key)
+        if extract is not None:
+            extract(values, parsed)
+            continue
+        try:
+            parsed[key] = float(values[-1][1])
+        except (ValueError, TypeError, IndexError):
+            pass
+
+    return parsed if parsed else None
+
+
+def uplink_timestamp(payload: dict) -> float | None:
+    """Return the epoch seconds of an uplink's newest sample.
 
+    Only V2 uplinks carry timestamps; V1 uplinks return None.
+    """
+    if payload.get("version") != "V2":
+        return None
+
+    measurements = payload.get("measurements")
+    if not isinstance(measurements, dict):
+        return None
+
+    newest = None
+    for values in measurements.values():
+        if not values:
+            continue
+        try:
+            timestamp = _to_epoch(values[-1][0])
+        except (ValueError, TypeError, IndexError, KeyError):
+            continue
+        if newest is None or timestamp > newest:
+            newest = timestamp
+    return newest
+
+
+def parse_uplink_samples(payload: dict) -> dict | None:
+    """Extract every (timestamp, value) sample per key from an uplink.
+
+    Timestamps are returned as epoch seconds. Only V2 uplinks carry per-sample
+    timestamps; V1 uplinks return None.
+    """
+    if payload.get("version") != "V2":
+        return None
+
+    measurements = payload.get("measurements")
+    if not measurements:
+        return None
+
+    samples = {}
     for key, values in measurements.items():
-        if key == "SIGNAL_STRENGTH" and values:
-            signal = values[-1]
-            if len(signal) >= 4:
-                try:
-                    rsrp = int(signal[1])
-                    parsed["RSRP"] = rsrp
-                    parsed["RSRQ"] = int(signal[2])
-                    parsed["SINR"] = int(signal[3])
-                    parsed["SIGNAL_STRENGTH"] = _classify_signal(rsrp)
-                except (ValueError, TypeError, IndexError):
-                    pass
-        elif values:
+        if not values:
+            continue
+        if key == "SIGNAL_STRENGTH":
+            _v2_signal_samples(values, samples)
+            continue
+        series = []
+        for sample in values:
             try:
-                parsed[key] = float(values[-1][1])
+                series.append((_to_epoch(sample[0]), float(sample[1])))
             except (ValueError, TypeError, IndexError):
                 pass
+        if series:
+            samples[key] = series
 
-    return parsed if parsed else None
+    return samples if samples else None
+
+
+def _v2_signal_samples(values: list, samples: dict) -> None:
+    rsrp, rsrq, sinr = [], [], []
+    for signal in values:
+        try:
+            timestamp = _to_epoch(signal[0])
+            reading = (int(signal[1]), int(signal[2]), int(signal[3]))
+        except (ValueError, TypeError, IndexError):
+            continue
+        rsrp.append((timestamp, float(reading[0])))
+        rsrq.append((timestamp, float(reading[1])))
+        sinr.append((timestamp, float(reading[2])))
+    for key, series in (("RSRP", rsrp), ("RSRQ", rsrq), ("SINR", sinr)):
+        if series:
+            samples[key] = series
+
+
+def _to_epoch(timestamp) -> float:
+    """Convert an epoch (seconds or milliseconds) or ISO timestamp to seconds."""
+    if isinstance(timestamp, str):
+        try:
+            timestamp = float(timestamp)
+        except ValueError:
+            parsed = datetime.fromisoformat(timestamp)
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=UTC)
+            return parsed.timestamp()
+    timestamp = float(timestamp)
+    # Millisecond epochs are already past 1e11 (year 5138 in seconds).
+    return timestamp / 1000 if timestamp > 1e11 else timestamp
+
+
+@dataclass(slots=True)
+class UplinkColumn:
+    """One key's rows of a parsed batch, as parallel arrays.
+
+    Timestamps are epoch seconds, or NaN where the uplink carries none (V1).
+    ``uplinks`` holds each row's position in the batch input, which also
+    indexes ``UplinkBatch.device_ids``.
+    """
+
+    timestamps: array = field(default_factory=lambda: array("d"))
+    values: list = field(default_factory=list)
+    uplinks: array = field(default_factory=lambda: array("L"))
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+@dataclass(slots=True)
+class UplinkBatch:
+    """Columnar result of ``parse_uplink_batch``.
+
+    ``values`` has one row per uplink and key, with the value
+    ``parse_uplink_message`` reports for it. ``samples`` has one row per
+    timestamped sample, as ``parse_uplink_samples`` reports them, and is
+    only filled on request. Rows keep the order of the input.
+    """
+
+    values: dict[str, UplinkColumn] = field(default_factory=dict)
+    samples: dict[str, UplinkColumn] = field(default_factory=dict)
+    device_ids: list = field(default_factory=list)
+    parsed: int = 0
+    failed: int = 0
+    skipped: int = 0
+
+    def latest(self) -> dict:
+        """Return the newest value per key, like merging each parsed uplink."""
+        return {key: value for key, (_, value) in self.latest_rows().items()}
+
+    def latest_rows(self) -> dict[str, tuple[float, object]]:
+        """Return the (timestamp, value) with the newest timestamp per key.
+
+        Rows without a timestamp (V1) count as older than any row with one;
+        otherwise, and between equal timestamps, the later row wins.
+        """
+        latest = {}
+        for key, column in self.values.items():
+            newest = -math.inf
+            row = 0
+            for index, timestamp in enumerate(column.timestamps):
+                if not math.isnan(timestamp) and timestamp >= newest:
+                    newest = timestamp
+                    row = index
+                elif newest == -math.inf:
+                    row = index
+            latest[key] = (column.timestamps[row], column.values[row])
+        return latest
+
+    def history(self) -> dict[str, list[tuple[float, float]]]:
+        """Return the samples per key as (timestamp, value) pairs."""
+        return {
+            key: list(zip(column.timestamps, column.values))
+            for key, column in self.samples.items()
+        }
+
+    def column_device_ids(self, column: UplinkColumn) -> list:
+        """Return the device id of each row of ``column``."""
+        device_ids = self.device_ids
+        return [device_ids[uplink] for uplink in column.uplinks]
+
+
+def parse_uplink_batch(
+    payloads: Iterable[bytes | dict],
+    device_ids: Iterable[str | None] | None = None,
+    samples: bool = False,
+) -> UplinkBatch:
+    """Parse many uplinks (raw or decoded) into per-key columns.
+
+    No dict is built per uplink: values are appended straight to their
+    key's column. ``device_ids``, when given, runs parallel to
+    ``payloads``. Uplinks that cannot be decoded, are malformed or carry no
+    values are counted in ``failed`` instead of raising.
+    """
+    batch = UplinkBatch()
+    values = _ColumnWriter(batch.values)
+    sample_values = _ColumnWriter(batch.samples)
+    batch_device_ids = batch.device_ids
+    if device_ids is None:
+        device_ids = itertools.repeat(None)
+
+    for index, (payload, device_id) in enumerate(zip(payloads, device_ids)):
+        batch_device_ids.append(device_id)
+        values.index = sample_values.index = index
+        try:
+            if not isinstance(payload, dict):
+                payload = decode_uplink(payload)
+                if payload is None:
+                    batch.failed += 1
+                    continue
+            if payload.get("version") == "V2":
+                rows = _batch_v2_uplink(payload, values)
+                if rows and samples:
+                    _batch_v2_samples(payload["measurements"], sample_values)
+            elif "data" in payload and "msdInfoData" in payload:
+                rows = _batch_v1_uplink(payload, values)
+            else:
+                rows = 0
+        except (ValueError, KeyError, TypeError, IndexError, AttributeError):
+            values.discard()
+            sample_values.discard()
+            batch.failed += 1
+            continue
+        if rows:
+            batch.parsed += 1
+        else:
+            batch.failed += 1
+
+    return batch
+
+
+def parse_uplink_page(
+    raw: bytes, newer_than: float | None = None, samples: bool = False
+) -> UplinkBatch | None:
+    """Parse a raw API page of uplinks, ``{"data": [uplink, ...]}``, as a batch.
+
+    Uplinks whose newest sample is not newer than ``newer_than`` are
+    counted in ``skipped`` instead. Returns None if the page is not shaped
+    like that.
+    """
+    page = _json_loads(raw)
+    uplinks = page.get("data") if isinstance(page, dict) else None
+    if not isinstance(uplinks, list):
+        return None
+    if newer_than is not None:
+        kept = []
+        for uplink in uplinks:
+            timestamp = uplink_timestamp(uplink) if isinstance(uplink, dict) else None
+            if timestamp is None or timestamp > newer_than:
+                kept.append(uplink)
+    else:
+        kept = uplinks
+    batch = parse_uplink_batch(kept, samples=samples)
+    batch.skipped = len(uplinks) - len(kept)
+    return batch
+
+
+class _ColumnWriter:
+    """Append rows of the current uplink to a batch's columns.
+
+    Also stands in for the parsed dict of the shared field extractors, so
+    ``writer[key] = value`` adds a row with the current ``timestamp``.
+    """
+
+    __slots__ = ("_appenders", "columns", "index", "rows", "timestamp")
+
+    def __init__(self, columns: dict[str, UplinkColumn]) -> None:
+        self.columns = columns
+        self.index = 0
+        self.timestamp = math.nan
+        self.rows = 0
+        self._appenders: dict[str, tuple] = {}
+
+    def appender(self, key: str) -> tuple:
+        """Return the bound (timestamps, values, uplinks) appends of a key."""
+        appenders = self._appenders.get(key)
+        if appenders is None:
+            column = self.columns.get(key)
+            if column is None:
+                column = self.columns[key] = UplinkColumn()
+            appenders = self._appenders[key] = (
+                column.timestamps.append,
+                column.values.append,
+                column.uplinks.append,
+            )
+        return appenders
+
+    def __setitem__(self, key: str, value) -> None:
+        add_timestamp, add_value, add_uplink = self.appender(key)
+        add_timestamp(self.timestamp)
+        add_value(value)
+        add_uplink(self.index)
+        self.rows += 1
+
+    def discard(self) -> None:
+        """Remove the rows the current uplink added before it failed."""
+        index = self.index
+        for key, column in list(self.columns.items()):
+            uplinks = column.uplinks
+            while uplinks and uplinks[-1] == index:
+                uplinks.pop()
+                column.timestamps.pop()
+                column.values.pop()
+            if not uplinks:
+                del self.columns[key]
+                self._appenders.pop(key, None)
+
+
+def _sample_epoch(sample) -> float:
+    """Return a V2 sample's timestamp in epoch seconds, or NaN."""
+    try:
+        timestamp = sample[0]
+        if type(timestamp) is int or type(timestamp) is float:
+            return timestamp / 1000 if timestamp > 1e11 else float(timestamp)
+        return _to_epoch(timestamp)
+    except (ValueError, TypeError, IndexError, KeyError):
+        return math.nan
+
+
+def _batch_v1_uplink(payload: dict, writer: _ColumnWriter) -> int:
+    if not isinstance(payload["data"], list):
+        return 0
+    server_identity = payload["msdInfoData"].get("mServerIdentity")
+    for device_data in payload["data"]:
+        if device_data.get("mSerial") != server_identity:
+            continue
+        writer.timestamp = math.nan
+        writer.rows = 0
+        get = device_data.get
+        for source, extract in _V1_FIELDS:
+            value = get(source, _MISSING)
+            if value is not _MISSING:
+                extract(value, writer)
+        return writer.rows
+    return 0
+
+
+def _batch_v2_uplink(payload: dict, writer: _ColumnWriter) -> int:
+    measurements = payload.get("measurements")
+    if not measurements:
+        return 0
+    writer.rows = 0
+    index = writer.index
+    appender = writer.appender
+    special = _V2_FIELDS
+    for key, values in measurements.items():
+        if not values:
+            continue
+        last = values[-1]
+        extract = special.get(key)
+        if extract is not None:
+            writer.timestamp = _sample_epoch(last)
+            extract(values, writer)
+            continue
+        try:
+            value = float(last[1])
+        except (ValueError, TypeError, IndexError):
+            continue
+        add_timestamp, add_value, add_uplink = appender(key)
+        add_timestamp(_sample_epoch(last))
+        add_value(value)
+        add_uplink(index)
+        writer.rows += 1
+    return writer.rows
+
+
+def _batch_v2_samples(measurements: dict, writer: _ColumnWriter) -> None:
+    index = writer.index
+    for key, values in measurements.items():
+        if not values:
+            continue
+        if key == "SIGNAL_STRENGTH":
+            _batch_v2_signal_samples(values, writer)
+            continue
+        appenders = None
+        for sample in values:
+            timestamp = _sample_epoch(sample)
+            if math.isnan(timestamp):
+                continue
+            try:
+                value = float(sample[1])
+            except (ValueError, TypeError, IndexError):
+                continue
+            if appenders is None:
+                appenders = writer.appender(key)
+            appenders[0](timestamp)
+            appenders[1](value)
+            appenders[2](index)
+
+
+def _batch_v2_signal_samples(values: list, writer: _ColumnWriter) -> None:
+    for signal in values:
+        try:
+            timestamp = _to_epoch(signal[0])
+            reading = (int(signal[1]), int(signal[2]), int(signal[3]))
+        except (ValueError, TypeError, IndexError):
+            continue
+        writer.timestamp = timestamp
+        writer["RSRP"] = float(reading[0])
+        writer["RSRQ"] = float(reading[1])
+        writer["SINR"] = float(reading[2])
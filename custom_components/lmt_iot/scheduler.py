@@ -0,0 +1,93 @@
+"""Fleet-wide admission control for MQTT connects."""
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from homeassistant.core import HomeAssistant, callback
+
+from .config import CONNECT_BURST, CONNECT_CONCURRENCY, CONNECT_RATE, DOMAIN
+
+DATA_CONNECTION_SCHEDULER = f"{DOMAIN}_connection_scheduler"
+
+
+@callback
+def async_get_connection_scheduler(hass: HomeAssistant) -> "ConnectionScheduler":
+    """Return the connection scheduler shared by every config entry."""
+    scheduler = hass.data.get(DATA_CONNECTION_SCHEDULER)
+    if scheduler is None:
+        scheduler = hass.data[DATA_CONNECTION_SCHEDULER] = ConnectionScheduler(hass)
+    return scheduler
+
+
+class ConnectionScheduler:
+    """Admit connects and reconnects of every device at a bounded pace.
+
+    Connects are admitted first come, first served through a token bucket
+    (``CONNECT_RATE`` per second, bursts of ``CONNECT_BURST``), and at most
+    ``CONNECT_CONCURRENCY`` TLS handshakes run at once. After a restart or a
+    broker-wide disconnect the fleet therefore reconnects at a steady rate
+    instead of all in the same second.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        rate: float = CONNECT_RATE,
+        burst: int = CONNECT_BURST,
+        concurrency: int = CONNECT_CONCURRENCY,
+    ) -> None:
+        """Initialize the scheduler."""
+        self._loop = hass.loop
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = self._loop.time()
+        self._queue = asyncio.Lock()
+        self._handshakes = asyncio.Semaphore(concurrency)
+        self.waiting = 0
+        self.max_waiting = 0
+        self.connecting = 0
+        self.admitted = 0
+
+    @asynccontextmanager
+    async def async_admit(self) -> AsyncIterator[None]:
+        """Wait for a connect slot and hold it while the handshake runs."""
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            async with self._queue:
+                await self._async_take_token()
+            await self._handshakes.acquire()
+        finally:
+            self.waiting -= 1
+        self.admitted += 1
+        self.connecting += 1
+        try:
+            yield
+        finally:
+            self.connecting -= 1
+            self._handshakes.release()
+
+    async def _async_take_token(self) -> None:
+        while True:
+            now = self._loop.time()
+            self._tokens = min(
+                self._burst, self._tokens + (now - self._updated) * self._rate
+            )
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self._rate)
+
+    def as_dict(self) -> dict:
+        """Return the admission state as plain data."""
+        return {
+            "rate": self._rate,
+            "burst": self._burst,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "connecting": self.connecting,
+            "admitted": self.admitted,
+        }
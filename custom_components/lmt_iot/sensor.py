@@ -1,154 +1,448 @@
 """Sensor platform for LMT IoT Device integration."""
 
 import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import timedelta
 
 from homeassistant.components.sensor import (
-    SensorEntity,
+    RestoreEntity,
     SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
     SensorStateClass,
-    RestoreEntity,
 )
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfTime
 from homeassistant.core import HomeAssistant, callback
-from homeassistant.helpers.event import async_track_point_in_utc_time
-from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.event import async_call_later
 from homeassistant.util import dt as dt_util
-from datetime import timedelta
 
-from . import DOMAIN, CONF_DEVICE_ID, CONF_SENSOR_CONFIG, CONF_DEVICE_TYPE
+from . import DOMAIN, UplinkRouter
+from .config import (
+    CONF_SENSOR_FILTERS,
+    SIGNAL_DEVICES_ADDED,
+    SIGNAL_SENSORS_DISCOVERED,
+    SIGNAL_SENSORS_UPDATED,
+)
+from .descriptions import LMTIoTSensorDescription, derived_description
+from .device import LMTIoTDevice
+from .filters import StateWriteFilter
 
 _LOGGER = logging.getLogger(__name__)
 
+# Only the diagnostic metric sensors poll; uplink sensors are pushed.
+SCAN_INTERVAL = timedelta(seconds=60)
+
+# An entity's description, the uplink sensor it reads and, for derived
+# sensors, the (statistic, window seconds) it shows
+SensorSpec = tuple[LMTIoTSensorDescription, LMTIoTSensorDescription, tuple | None]
+
+
+@dataclass(frozen=True, kw_only=True)
+class LMTIoTMetricDescription(SensorEntityDescription):
+    """Describes a pipeline metric sensor."""
+
+    value_fn: Callable[[LMTIoTDevice], object]
+    attributes_fn: Callable[[LMTIoTDevice], dict] | None = None
+
+
+def _mean(value: float | None) -> float | None:
+    return round(value, 3) if value is not None else None
+
+
+METRIC_SENSORS = (
+    LMTIoTMetricDescription(
+        key="messages_received",
+        name="Messages received",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda device: device.metrics.messages_received,
+    ),
+    LMTIoTMetricDescription(
+        key="parse_failures",
+        name="Parse failures",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda device: device.metrics.parse_failures_total,
+        attributes_fn=lambda device: dict(device.metrics.parse_failures),
+    ),
+    LMTIoTMetricDescription(
+        key="dropped_uplinks",
+        name="Duplicate or stale uplinks",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda device: device.metrics.duplicates + device.metrics.stale,
+        attributes_fn=lambda device: {
+            "duplicates": device.metrics.duplicates,
+            "stale": device.metrics.stale,
+        },
+    ),
+    LMTIoTMetricDescription(
+        key="parse_time",
+        name="Parse time",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda device: _mean(device.metrics.parse_time.mean),
+        attributes_fn=lambda device: device.metrics.parse_time.as_dict(),
+    ),
+    LMTIoTMetricDescription(
+        key="handoff_latency",
+        name="Queue handoff latency",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda device: _mean(device.ingest.handoff_latency.mean),
+        attributes_fn=lambda device: device.ingest.handoff_latency.as_dict(),
+    ),
+    LMTIoTMetricDescription(
+        key="state_writes",
+        name="State writes",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda device: device.metrics.state_writes,
+    ),
+    LMTIoTMetricDescription(
+        key="suppressed_writes",
+        name="Suppressed state writes",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda device: device.metrics.suppressed_writes,
+    ),
+    LMTIoTMetricDescription(
+        key="reconnects",
+        name="Reconnects",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda device: device.reconnects,
+    ),
+    LMTIoTMetricDescription(
+        key="last_message",
+        name="Last message",
+        device_class=SensorDeviceClass.TIMESTAMP,
+        value_fn=lambda device: (
+            dt_util.utc_from_timestamp(device.metrics.last_message)
+            if device.metrics.last_message is not None
+            else None
+        ),
+    ),
+)
+
 
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities
 ):
     """Set up LMT IoT sensors dynamically based on device config."""
-    device_id = entry.data[CONF_DEVICE_ID]
-    sensor_config = entry.data.get(CONF_SENSOR_CONFIG, [])
-    device_type = entry.data[CONF_DEVICE_TYPE]
+    data = hass.data[DOMAIN][entry.entry_id]
+    # Uplink and derived sensors by device id and entity key, to apply
+    # config changes.
+    entities: dict[str, dict[str, LMTIoTDynamicSensor]] = {}
 
-    sensors = [
-        LMTIoTDynamicSensor(device_id, sensor, device_type) for sensor in sensor_config
-    ]
+    def sensor_descriptions(device: LMTIoTDevice) -> dict[str, SensorSpec]:
+        """Return the uplink and derived sensors a device should have."""
+        wanted = {}
+        specs = device.aggregates.specs
+        for source in device.sensor_descriptions:
+            wanted[source.key] = (source, source, None)
+            for aggregate in specs.get(source.key, ()):
+                description = derived_description(source, *aggregate)
+                wanted[description.key] = (description, source, aggregate)
+        return wanted
 
-    _LOGGER.info(f"Creating {len(sensors)} sensors for device {device_id}")
-    async_add_entities(sensors)
+    def create_sensor(device: LMTIoTDevice, spec: SensorSpec) -> LMTIoTDynamicSensor:
+        description, source, aggregate = spec
+        if aggregate is None:
+            sensor = LMTIoTDynamicSensor(
+                device, description, data["router"], write_filter(source)
+            )
+        else:
+            sensor = LMTIoTDerivedSensor(
+                device,
+                description,
+                source.key,
+                aggregate,
+                data["router"],
+                write_filter(source),
+            )
+        entities[device.device_id][description.key] = sensor
+        return sensor
+
+    def write_filter(source: LMTIoTSensorDescription) -> StateWriteFilter:
+        overrides = entry.options.get(CONF_SENSOR_FILTERS) or {}
+        return StateWriteFilter.from_config(
+            dict(source.write_filter), overrides.get(source.key)
+        )
+
+    @callback
+    def async_add_devices(devices: list[LMTIoTDevice]) -> None:
+        sensors = []
+        for device in devices:
+            entities[device.device_id] = {}
+            sensors.extend(
+                create_sensor(device, spec)
+                for spec in sensor_descriptions(device).values()
+            )
+            sensors.extend(
+                LMTIoTMetricSensor(device, description)
+                for description in METRIC_SENSORS
+            )
+
+        _LOGGER.info(f"Creating {len(sensors)} sensors for {len(devices)} device(s)")
+        async_add_entities(sensors)
+
+    @callback
+    def async_update_devices(devices: list[LMTIoTDevice]) -> list[LMTIoTDynamicSensor]:
+        entity_registry = er.async_get(hass)
+        sensors = []
+        for device in devices:
+            current = entities.setdefault(device.device_id, {})
+            wanted = sensor_descriptions(device)
+            for key in [key for key in current if key not in wanted]:
+                sensor = current.pop(key)
+                if sensor.entity_id and entity_registry.async_get(sensor.entity_id):
+                    entity_registry.async_remove(sensor.entity_id)
+            for key, spec in wanted.items():
+                description, source, _ = spec
+                sensor = current.get(key)
+                if sensor is None:
+                    sensors.append(create_sensor(device, spec))
+                elif sensor.entity_description != description:
+                    sensor.async_update_description(description, write_filter(source))
+                else:
+                    sensor.async_set_write_filter(write_filter(source))
+
+        if sensors:
+            _LOGGER.info(f"Creating {len(sensors)} sensors for changed device types")
+            async_add_entities(sensors)
+        return sensors
+
+    @callback
+    def async_discover_sensors(device: LMTIoTDevice, parsed: dict) -> None:
+        # New entities subscribe once added, after this uplink is routed, so
+        # they take their first value from it here.
+        for sensor in async_update_devices([device]):
+            if sensor.source_key in parsed:
+                sensor.async_set_initial_value(parsed[sensor.source_key])
+
+    async_add_devices(list(data["devices"].values()))
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_DEVICES_ADDED.format(entry.entry_id), async_add_devices
+        )
+    )
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_SENSORS_UPDATED.format(entry.entry_id), async_update_devices
+        )
+    )
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass,
+            SIGNAL_SENSORS_DISCOVERED.format(entry.entry_id),
+            async_discover_sensors,
+        )
+    )
 
 
 class LMTIoTDynamicSensor(RestoreEntity, SensorEntity):
     """Dynamic sensor for LMT IoT device."""
 
-    def __init__(self, device_id: str, config: dict, device_type: str):
+    entity_description: LMTIoTSensorDescription
+
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+
+    def __init__(
+        self,
+        device: LMTIoTDevice,
+        description: LMTIoTSensorDescription,
+        router: UplinkRouter,
+        write_filter: StateWriteFilter,
+    ):
         """Initialize the sensor."""
-        self._device_id = device_id
-        self._key = config["key"]
-        self._attr_name = config["name"]
-        self._attr_unique_id = f"{device_id}_{config['key']}"
-        self._attr_has_entity_name = True
-        self._attr_native_unit_of_measurement = config.get("unit")
-        self._attr_native_value = None
-        self._attr_available = True
-        self._availability_timeout = timedelta(
-            seconds=config.get("availabilityTimeout", 7200)
-        )
-        self._unsub_availability = None
-        self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, device_id)},
-            name=f"LMT IoT {device_id}",
-            manufacturer="LMT IoT",
-            model=device_type,
-        )
+        self.entity_description = description
+        self._convert = description.convert
+        self._device_id = device.device_id
+        self._router = router
+        self._availability = device.availability
+        self._write_filter = write_filter
+        self._unsub_trailing_write: Callable[[], None] | None = None
+        self._metrics = device.metrics
+        self._key = description.key
+        self._attr_unique_id = f"{device.device_id}_{description.key}"
+        self._attr_device_info = device.device_info
 
-        precision = config.get("precision")
-        if precision is not None:
-            self._attr_suggested_display_precision = precision
+    @callback
+    def async_update_description(
+        self, description: LMTIoTSensorDescription, write_filter: StateWriteFilter
+    ) -> None:
+        """Apply a changed sensor config in place."""
+        self.entity_description = description
+        self._convert = description.convert
+        self._write_filter = write_filter
+        # Explicit attributes take precedence over values already cached
+        # from the previous description.
+        self._attr_name = description.name
+        self._attr_native_unit_of_measurement = description.native_unit_of_measurement
+        self._attr_suggested_display_precision = description.suggested_display_precision
+        self._attr_state_class = description.state_class
+        self._attr_device_class = description.device_class
+        if self.hass is not None:
+            self.async_write_ha_state()
 
-        state_class = config.get("stateClass")
-        if state_class:
-            state_class = state_class.lower()
-            try:
-                self._attr_state_class = SensorStateClass(state_class)
-            except ValueError:
-                _LOGGER.warning(f"Unknown state class: {state_class}")
-        else:
-            self._attr_state_class = None
+    @callback
+    def async_set_write_filter(self, write_filter: StateWriteFilter) -> None:
+        """Switch to changed write filter settings."""
+        if write_filter.settings != self._write_filter.settings:
+            self._write_filter = write_filter
 
-        device_class = config.get("deviceClass")
-        if device_class:
-            device_class = device_class.lower()
-            try:
-                self._attr_device_class = SensorDeviceClass(device_class)
-            except ValueError:
-                _LOGGER.warning(f"Unknown device class: {device_class}")
+    @property
+    def source_key(self) -> str:
+        """Return the uplink key this sensor reads."""
+        return self._key
+
+    @callback
+    def async_set_initial_value(self, value) -> None:
+        """Start from ``value`` instead of the restored state."""
+        try:
+            self._attr_native_value = self._native_value(value)
+        except (KeyError, ValueError, TypeError) as e:
+            _LOGGER.error(f"Error parsing {self._key}: {e}")
 
     async def async_added_to_hass(self):
-        """Subscribe to MQTT messages via event bus."""
+        """Subscribe to uplink values for this sensor's key."""
         await super().async_added_to_hass()
 
         _LOGGER.info(
-            f"Setting up sensor: {self._attr_name} (unique_id: {self._attr_unique_id})"
+            f"Setting up sensor: {self._key} (unique_id: {self._attr_unique_id})"
         )
 
         last_state = await self.async_get_last_state()
-        _LOGGER.info(f"Last state for {self._attr_name}: {last_state}")
+        _LOGGER.info(f"Last state for {self._key}: {last_state}")
 
-        if last_state and last_state.state not in ("unknown", "unavailable", None):
+        if self._attr_native_value is not None:
+            _LOGGER.info(f"Starting {self._key} from {self._attr_native_value}")
+        elif last_state and last_state.state not in ("unknown", "unavailable", None):
             try:
-                if self._attr_state_class is None:
+                if self.state_class is None:
                     self._attr_native_value = last_state.state
                 else:
                     self._attr_native_value = float(last_state.state)
-                _LOGGER.info(f"Restored {self._attr_name}: {self._attr_native_value}")
+                _LOGGER.info(f"Restored {self._key}: {self._attr_native_value}")
             except (ValueError, TypeError) as e:
                 _LOGGER.warning(
-                    f"Could not restore state for {self._attr_name}: {last_state.state} - {e}"
+                    f"Could not restore state for {self._key}: {last_state.state} - {e}"
                 )
         else:
-            _LOGGER.info(f"No valid last state to restore for {self._attr_name}")
+            _LOGGER.info(f"No valid last state to restore for {self._key}")
 
-        @callback
-        def handle_message(event):
-            """Handle MQTT message event."""
-            if event.data["device_id"] != self._device_id:
-                return
+        self.async_on_remove(
+            self._router.async_subscribe(self._device_id, self._key, self._handle_value)
+        )
+        self.async_on_remove(
+            self._availability.async_subscribe(self.async_write_ha_state)
+        )
+        self.async_on_remove(self._async_cancel_trailing_write)
 
-            try:
-                payload = event.data["payload"]
-                if self._key in payload:
-                    value = payload[self._key]
-                    if self._attr_state_class is not None and isinstance(
-                        value, (int, float)
-                    ):
-                        self._attr_native_value = float(value)
-                    else:
-                        self._attr_native_value = value
-                    self._attr_available = True
-                    self._schedule_availability_check()
-                    self.async_write_ha_state()
-                    _LOGGER.debug(
-                        f"{self._attr_name} updated: {self._attr_native_value}{self._attr_native_unit_of_measurement or ''}"
+    @property
+    def available(self) -> bool:
+        """Return whether the device has reported recently."""
+        return self._availability.available
+
+    @callback
+    def _handle_value(self, value):
+        """Handle a new value routed from an uplink message."""
+        try:
+            self._attr_native_value = self._native_value(value)
+            now = time.monotonic()
+            delay = self._write_filter.write_delay(self._attr_native_value, now)
+            if delay != 0:
+                self._metrics.suppressed_writes += 1
+                if delay is not None and self._unsub_trailing_write is None:
+                    # Held back by minInterval: write the newest value once
+                    # it has passed, or the state stays behind until the
+                    # next uplink or heartbeat.
+                    self._unsub_trailing_write = async_call_later(
+                        self.hass, delay, self._async_trailing_write
                     )
-            except Exception as e:
-                _LOGGER.error(f"Error parsing {self._key}: {e}")
+                return
+            self._async_write_value(now)
+            _LOGGER.debug(f"{self._key} updated: {self._attr_native_value}")
+        except Exception as e:
+            _LOGGER.error(f"Error parsing {self._key}: {e}")
 
-        self.async_on_remove(
-            self.hass.bus.async_listen(f"{DOMAIN}_uplink_message", handle_message)
-        )
+    @callback
+    def _async_trailing_write(self, _now) -> None:
+        self._unsub_trailing_write = None
+        now = time.monotonic()
+        if self._write_filter.write_delay(self._attr_native_value, now) == 0:
+            self._async_write_value(now)
 
-    def _schedule_availability_check(self):
-        """Schedule availability timeout check."""
-        if self._unsub_availability:
-            self._unsub_availability()
+    @callback
+    def _async_write_value(self, now: float) -> None:
+        self._async_cancel_trailing_write()
+        self._write_filter.written(self._attr_native_value, now)
+        self._metrics.state_writes += 1
+        self.async_write_ha_state()
 
-        @callback
-        def mark_unavailable(_):
-            self._attr_available = False
-            self.async_write_ha_state()
-            _LOGGER.warning(
-                f"{self._attr_name} marked unavailable (no data for {self._availability_timeout})"
-            )
+    @callback
+    def _async_cancel_trailing_write(self) -> None:
+        if self._unsub_trailing_write is not None:
+            self._unsub_trailing_write()
+            self._unsub_trailing_write = None
+
+    def _native_value(self, value):
+        return self._convert(value)
 
-        self._unsub_availability = async_track_point_in_utc_time(
-            self.hass, mark_unavailable, dt_util.utcnow() + self._availability_timeout
+
+class LMTIoTDerivedSensor(LMTIoTDynamicSensor):
+    """Rolling aggregate of an uplink sensor, such as its 15-minute mean.
+
+    The device's rolling windows are fed before values are routed, so the
+    aggregate is read when the source sensor's key arrives.
+    """
+
+    def __init__(
+        self,
+        device: LMTIoTDevice,
+        description: LMTIoTSensorDescription,
+        source_key: str,
+        aggregate: tuple[str, int],
+        router: UplinkRouter,
+        write_filter: StateWriteFilter,
+    ):
+        """Initialize the sensor."""
+        super().__init__(device, description, router, write_filter)
+        self._key = source_key
+        self._aggregates = device.aggregates
+        self._stat, self._window = aggregate
+
+    def _native_value(self, value):
+        return self._aggregates.value(
+            self._key, self._stat, self._window, time.monotonic()
         )
+
+
+class LMTIoTMetricSensor(SensorEntity):
+    """Diagnostic sensor exposing one of a device's pipeline metrics."""
+
+    entity_description: LMTIoTMetricDescription
+
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(self, device: LMTIoTDevice, description: LMTIoTMetricDescription):
+        """Initialize the metric sensor."""
+        self.entity_description = description
+        self._device = device
+        self._attr_unique_id = f"{device.device_id}_metric_{description.key}"
+        self._attr_device_info = device.device_info
+
+    @property
+    def native_value(self):
+        """Return the current metric value."""
+        return self.entity_description.value_fn(self._device)
+
+    @property
+    def extra_state_attributes(self) -> dict | None:
+        """Return metric details such as histogram buckets."""
+        if self.entity_description.attributes_fn is None:
+            return None
+        return self.entity_description.attributes_fn(self._device)
@@ -0,0 +1,144 @@
+"""Long-term statistics import for buffered uplink samples."""
+
+import logging
+from collections.abc import Iterable
+
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+)
+from homeassistant.components.sensor import SensorStateClass
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import dt as dt_util
+from homeassistant.util import slugify
+
+from .config import DOMAIN
+from .descriptions import LMTIoTSensorDescription
+
+try:
+    from homeassistant.components.recorder.models import StatisticMeanType
+except ImportError:  # Home Assistant < 2025.4
+    StatisticMeanType = None
+
+_LOGGER = logging.getLogger(__name__)
+
+_HOUR = 3600
+# Hourly buckets kept per key so samples spread over several uplinks
+# are merged into the same statistics row instead of overwriting it.
+RETAINED_HOURS = 3
+
+
+class _HourBucket:
+    """Running mean/min/max of the samples seen within one hour."""
+
+    __slots__ = ("maximum", "minimum", "seen", "total")
+
+    def __init__(self, value: float) -> None:
+        self.seen: set[float] = set()
+        self.total = 0.0
+        self.minimum = value
+        self.maximum = value
+
+    def add(self, timestamp: float, value: float) -> bool:
+        """Fold in a sample; returns False for an already seen timestamp."""
+        if timestamp in self.seen:
+            return False
+        self.seen.add(timestamp)
+        self.total += value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        return True
+
+
+class DeviceStatistics:
+    """Import a device's uplink sample history as hourly external statistics.
+
+    Only sensors with the ``measurement`` state class are imported, under the
+    statistic id ``lmt_iot:<device>_<key>``. Every touched hour of a key is
+    imported in one recorder call per uplink batch.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        device_id: str,
+        descriptions: Iterable[LMTIoTSensorDescription],
+    ) -> None:
+        """Initialize statistics metadata from the device's sensor config."""
+        self._hass = hass
+        self._device_id = device_id
+        self._metadata: dict[str, dict] = {}
+        self._buckets: dict[str, dict[int, _HourBucket]] = {}
+        self.async_set_descriptions(descriptions)
+
+    @callback
+    def async_set_descriptions(
+        self, descriptions: Iterable[LMTIoTSensorDescription]
+    ) -> None:
+        """Rebuild statistics metadata, keeping the buckets of unchanged keys."""
+        device_id = self._device_id
+        self._metadata = {}
+        for description in descriptions:
+            if description.state_class != SensorStateClass.MEASUREMENT:
+                continue
+            key = description.key
+            metadata = {
+                "has_sum": False,
+                "name": f"LMT IoT {device_id} {description.name}",
+                "source": DOMAIN,
+                "statistic_id": f"{DOMAIN}:{slugify(f'{device_id}_{key}')}",
+                "unit_of_measurement": description.native_unit_of_measurement,
+            }
+            if StatisticMeanType is not None:
+                metadata["mean_type"] = StatisticMeanType.ARITHMETIC
+            else:
+                metadata["has_mean"] = True
+            self._metadata[key] = metadata
+        for key in [key for key in self._buckets if key not in self._metadata]:
+            del self._buckets[key]
+
+    @callback
+    def async_add_samples(self, samples: dict[str, list[tuple[float, float]]]) -> None:
+        """Fold (timestamp, value) samples into hourly rows and import them."""
+        if "recorder" not in self._hass.config.components:
+            return
+
+        for key, series in samples.items():
+            metadata = self._metadata.get(key)
+            if metadata is None:
+                continue
+
+            buckets = self._buckets.setdefault(key, {})
+            touched = set()
+            for timestamp, value in series:
+                hour = int(timestamp // _HOUR) * _HOUR
+                bucket = buckets.get(hour)
+                if bucket is None:
+                    bucket = buckets[hour] = _HourBucket(value)
+                if bucket.add(timestamp, value):
+                    touched.add(hour)
+
+            if not touched:
+                continue
+
+            async_add_external_statistics(
+                self._hass,
+                metadata,
+                [
+                    {
+                        "start": dt_util.utc_from_timestamp(hour),
+                        "mean": buckets[hour].total / len(buckets[hour].seen),
+                        "min": buckets[hour].minimum,
+                        "max": buckets[hour].maximum,
+                    }
+                    for hour in sorted(touched)
+                ],
+            )
+            _LOGGER.debug(
+                "Imported %d hourly statistics for %s",
+                len(touched),
+                metadata["statistic_id"],
+            )
+
+            oldest_kept = max(buckets) - (RETAINED_HOURS - 1) * _HOUR
+            for hour in [hour for hour in buckets if hour < oldest_kept]:
+                del buckets[hour]
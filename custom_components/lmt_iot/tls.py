@@ -0,0 +1,121 @@
+"""Mutual-TLS contexts for LMT IoT MQTT connections."""
+
+import hashlib
+import os
+import ssl
+import tempfile
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+
+from .config import CONF_CA_CERT, DOMAIN
+
+DATA_SSL_CONTEXTS = f"{DOMAIN}_ssl_contexts"
+
+
+def _fingerprint(ca_cert: str, client_cert: str, client_key: str) -> str:
+    digest = hashlib.sha256()
+    for pem in (ca_cert, client_cert, client_key):
+        digest.update(pem.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+async def async_get_ssl_context(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    device_id: str,
+    client_cert: str,
+    client_key: str,
+) -> ssl.SSLContext:
+    """Return a device's TLS context, building it only when credentials change."""
+    contexts: dict[str, dict[str, tuple[str, ssl.SSLContext]]] = hass.data.setdefault(
+        DATA_SSL_CONTEXTS, {}
+    ).setdefault(entry.entry_id, {})
+    ca_cert = entry.data[CONF_CA_CERT]
+    fingerprint = _fingerprint(ca_cert, client_cert, client_key)
+    cached = contexts.get(device_id)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
+
+    context = await hass.async_add_executor_job(
+        create_ssl_context, ca_cert, client_cert, client_key
+    )
+    contexts[device_id] = (fingerprint, context)
+    return context
+
+
+@callback
+def async_forget_ssl_context(
+    hass: HomeAssistant, entry: ConfigEntry, device_id: str | None = None
+) -> None:
+    """Drop the cached TLS contexts of a removed entry or one of its devices."""
+    contexts = hass.data.get(DATA_SSL_CONTEXTS, {})
+    if device_id is None:
+        contexts.pop(entry.entry_id, None)
+    else:
+        contexts.get(entry.entry_id, {}).pop(device_id, None)
+
+
+def create_ssl_context(
+    ca_cert: str, client_cert: str, client_key: str
+) -> ssl.SSLContext:
+    """Build a mutual-TLS context from PEM strings."""
+    context = ssl.SSLContext(ssl.PROTOCOL_TLSv1_2)
+    context.check_hostname = True
+    context.verify_mode = ssl.CERT_REQUIRED
+    context.load_verify_locations(cadata=ca_cert)
+    _load_cert_chain(context, client_cert, client_key)
+    return context
+
+
+def _load_cert_chain(context: ssl.SSLContext, cert: str, key: str) -> None:
+    """Load a client certificate and key without writing them to disk.
+
+    ``ssl`` only loads chains from paths, so the PEMs are handed over as
+    anonymous in-memory files where the platform has ``memfd_create``.
+    """
+    if not hasattr(os, "memfd_create"):
+        _load_cert_chain_from_tempfiles(context, cert, key)
+        return
+
+    cert_fd = os.memfd_create("lmt_iot_cert", os.MFD_CLOEXEC)
+    try:
+        key_fd = os.memfd_create("lmt_iot_key", os.MFD_CLOEXEC)
+        try:
+            os.write(cert_fd, cert.encode())
+            os.write(key_fd, key.encode())
+            context.load_cert_chain(
+                certfile=f"/proc/self/fd/{cert_fd}", keyfile=f"/proc/self/fd/{key_fd}"
+            )
+        finally:
+            os.close(key_fd)
+    finally:
+        os.close(cert_fd)
+
+
+def _load_cert_chain_from_tempfiles(
+    context: ssl.SSLContext, cert: str, key: str
+) -> None:
+    cert_fd, cert_path = tempfile.mkstemp(suffix=".pem")
+    key_fd, key_path = tempfile.mkstemp(suffix=".key")
+
+    try:
+        os.chmod(cert_path, 0o600)
+        os.chmod(key_path, 0o600)
+
+        with os.fdopen(cert_fd, "w") as cert_file:
+            cert_file.write(cert)
+        with os.fdopen(key_fd, "w") as key_file:
+            key_file.write(key)
+
+        context.load_cert_chain(certfile=cert_path, keyfile=key_path)
+    finally:
+        try:
+            os.unlink(cert_path)
+        except OSError:
+            pass
+        try:
+            os.unlink(key_path)
+        except OSError:
+            pass
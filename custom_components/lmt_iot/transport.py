@@ -0,0 +1,334 @@
+"""Event-loop driven MQTT transport for the LMT IoT Cloud."""
+
+import asyncio
+import logging
+import random
+import ssl
+from collections.abc import Callable
+from enum import IntEnum
+
+import paho.mqtt.client as mqtt
+from homeassistant.core import HomeAssistant, callback
+
+from .scheduler import ConnectionScheduler
+
+_LOGGER = logging.getLogger(__name__)
+
+MISC_LOOP_INTERVAL = 1
+RECONNECT_MIN_DELAY = 1
+RECONNECT_MAX_DELAY = 120
+
+
+class MQTTConnectionResult(IntEnum):
+    """MQTT connection result codes."""
+
+    SUCCESS = 0
+    INCORRECT_PROTOCOL = 1
+    INVALID_CLIENT_ID = 2
+    SERVER_UNAVAILABLE = 3
+    BAD_CREDENTIALS = 4
+    NOT_AUTHORIZED = 5
+
+
+class MQTTTransport:
+    """MQTT client whose network I/O runs on the Home Assistant event loop.
+
+    paho-mqtt is driven without ``loop_start()``: its socket is registered
+    with the asyncio loop for reads and writes, keepalive is serviced from a
+    loop timer and reconnects are scheduled on the loop. Only the blocking
+    connect (DNS lookup and TLS handshake) borrows an executor thread, so an
+    idle connection costs no thread at all.
+
+    Connects and reconnects are admitted by the shared ``scheduler``, and
+    reconnect backoff is jittered so clients dropped together do not retry
+    together.
+
+    With ``persistent_session`` the broker keeps the session across
+    disconnects and the topic is subscribed with QoS 1, so uplinks published
+    while the client is away are delivered on reconnect. paho acknowledges a
+    QoS 1 message only once ``on_message`` has returned, and since packets
+    are read on the event loop, that is after the uplink has been handed to
+    the ingest queue, which does not drop uplinks on a persistent session.
+    When that queue fills up it pauses reading instead (see
+    ``async_pause_reading``), so further uplinks stay unacknowledged at the
+    broker until it has drained. Only an exception escaping ``on_message``
+    leaves a message unacknowledged.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        client_id: str,
+        host: str,
+        port: int,
+        ssl_context: ssl.SSLContext,
+        scheduler: ConnectionScheduler,
+        topic: str,
+        on_message: Callable[[str, bytes], None],
+        on_connect: Callable[[bool], None] | None = None,
+        persistent_session: bool = False,
+    ) -> None:
+        """Initialize the transport."""
+        self._hass = hass
+        self._loop = hass.loop
+        self._client_id = client_id
+        self._host = host
+        self._port = port
+        self._topic = topic
+        self._scheduler = scheduler
+        self._on_message = on_message
+        self._on_connected = on_connect
+        self._qos = 1 if persistent_session else 0
+        self._stopping = False
+        self._reconnect_delay = RECONNECT_MIN_DELAY
+        self._reconnect_handle: asyncio.TimerHandle | None = None
+        self._reconnect_task: asyncio.Task | None = None
+        self._misc_handle: asyncio.TimerHandle | None = None
+        # Descriptor of the socket registered with the event loop
+        self._fd: int | None = None
+        self._reading = True
+        self.connected = False
+        self.connecting = False
+        self.reconnects = 0
+
+        client = mqtt.Client(
+            client_id=client_id,
+            clean_session=not persistent_session,
+            protocol=mqtt.MQTTv311,
+        )
+        client.tls_set_context(ssl_context)
+        client.tls_insecure_set(False)
+        client.on_connect = self._on_connect
+        client.on_message = self._on_mqtt_message
+        client.on_disconnect = self._on_disconnect
+        client.on_subscribe = self._on_subscribe
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+        self._client = client
+
+    async def async_connect(self, retry: bool = False) -> None:
+        """Connect to the broker.
+
+        Raises if the connection cannot be opened, unless ``retry`` is set,
+        in which case reconnect attempts are scheduled with backoff instead.
+        """
+        self._stopping = False
+        try:
+            async with self._scheduler.async_admit():
+                if self._stopping:
+                    return
+                _LOGGER.info(
+                    f"Connecting to {self._host}:{self._port} as {self._client_id}"
+                )
+                self.connecting = True
+                try:
+                    await self._hass.async_add_executor_job(
+                        self._client.connect, self._host, self._port
+                    )
+                finally:
+                    self.connecting = False
+        except (OSError, ValueError) as e:
+            if not retry:
+                raise
+            _LOGGER.warning(
+                f"Connecting {self._client_id} to LMT IoT Cloud failed, will retry: {e}"
+            )
+            self._async_schedule_reconnect()
+        self._async_schedule_misc()
+
+    async def async_disconnect(self) -> None:
+        """Disconnect from the broker and stop reconnecting."""
+        self._stopping = True
+        if self._reconnect_handle:
+            self._reconnect_handle.cancel()
+            self._reconnect_handle = None
+        if self._reconnect_task and not self.connecting:
+            # Still queued for admission; a running handshake is left to
+            # finish and is disconnected once it completes.
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        if self._misc_handle:
+            self._misc_handle.cancel()
+            self._misc_handle = None
+        self._client.disconnect()
+        self._client.loop_write()
+
+    def _run_on_loop(self, func: Callable, *args) -> None:
+        """Run a callback on the event loop, whichever thread we are on."""
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            func(*args)
+        else:
+            self._loop.call_soon_threadsafe(func, *args)
+
+    def _on_socket_open(self, client, userdata, sock) -> None:
+        self._run_on_loop(self._async_on_socket_open, sock)
+
+    @callback
+    def _async_on_socket_open(self, sock) -> None:
+        fd = sock.fileno()
+        if fd == -1:
+            return
+        self._fd = fd
+        if self._reading:
+            self._loop.add_reader(fd, self._async_reader_callback)
+
+    def _on_socket_close(self, client, userdata, sock) -> None:
+        self._run_on_loop(self._async_on_socket_close)
+
+    @callback
+    def _async_on_socket_close(self) -> None:
+        # By the time this runs paho may have closed the socket, so it is
+        # unregistered by the descriptor it was registered with. Leaving it
+        # registered would hand a reused descriptor to the wrong callbacks.
+        if self._fd is None:
+            return
+        self._loop.remove_reader(self._fd)
+        self._loop.remove_writer(self._fd)
+        self._fd = None
+
+    def _on_socket_register_write(self, client, userdata, sock) -> None:
+        self._run_on_loop(self._async_on_socket_register_write)
+
+    @callback
+    def _async_on_socket_register_write(self) -> None:
+        if self._fd is None:
+            return
+        self._loop.add_writer(self._fd, self._async_writer_callback)
+
+    def _on_socket_unregister_write(self, client, userdata, sock) -> None:
+        self._run_on_loop(self._async_on_socket_unregister_write)
+
+    @callback
+    def _async_on_socket_unregister_write(self) -> None:
+        if self._fd is None:
+            return
+        self._loop.remove_writer(self._fd)
+
+    @callback
+    def async_pause_reading(self, paused: bool) -> None:
+        """Pause or resume reading from the broker, for ingest backpressure.
+
+        While paused, published uplinks stay in the socket and at the broker
+        unacknowledged. Keepalive pings are still sent.
+        """
+        if self._reading is not paused:
+            return
+        self._reading = not paused
+        if self._fd is None:
+            return
+        if paused:
+            self._loop.remove_reader(self._fd)
+        else:
+            self._loop.add_reader(self._fd, self._async_reader_callback)
+
+    @callback
+    def _async_reader_callback(self) -> None:
+        """Read every packet that is available, including TLS-buffered data."""
+        client = self._client
+        rc = client.loop_read()
+        sock = client.socket()
+        while (
+            self._reading
+            and rc == mqtt.MQTT_ERR_SUCCESS
+            and isinstance(sock, ssl.SSLSocket)
+            and sock.pending()
+        ):
+            rc = client.loop_read()
+            sock = client.socket()
+
+    @callback
+    def _async_writer_callback(self) -> None:
+        self._client.loop_write()
+
+    @callback
+    def _async_schedule_misc(self) -> None:
+        self._misc_handle = self._loop.call_later(
+            MISC_LOOP_INTERVAL, self._async_misc_callback
+        )
+
+    @callback
+    def _async_misc_callback(self) -> None:
+        """Service keepalive pings and detect dead connections."""
+        self._client.loop_misc()
+        if not self._stopping:
+            self._async_schedule_misc()
+
+    def _on_connect(self, client, userdata, flags, rc) -> None:
+        if rc == MQTTConnectionResult.SUCCESS:
+            _LOGGER.info("Connected to LMT IoT Cloud")
+            self.connected = True
+            self._reconnect_delay = RECONNECT_MIN_DELAY
+            session_present = bool(flags.get("session present"))
+            if session_present:
+                _LOGGER.info(f"Resumed the MQTT session of {self._client_id}")
+            client.subscribe(self._topic, qos=self._qos)
+            _LOGGER.info(f"Subscribed to topic: {self._topic} (qos={self._qos})")
+            if self._on_connected is not None:
+                self._run_on_loop(self._on_connected, session_present)
+        else:
+            _LOGGER.error(
+                f"Failed to connect to LMT IoT Cloud: {MQTTConnectionResult(rc).name} (rc={rc})"
+            )
+
+    def _on_mqtt_message(self, client, userdata, msg) -> None:
+        self._on_message(msg.topic, msg.payload)
+
+    def _on_disconnect(self, client, userdata, rc) -> None:
+        self.connected = False
+        if rc != 0:
+            _LOGGER.warning(
+                f"Disconnected from LMT IoT Cloud: rc={rc}, will auto-reconnect"
+            )
+            self._run_on_loop(self._async_schedule_reconnect)
+        else:
+            _LOGGER.info("Disconnected from LMT IoT Cloud")
+
+    def _on_subscribe(self, client, userdata, mid, granted_qos) -> None:
+        _LOGGER.debug(f"Subscription confirmed: mid={mid}, qos={granted_qos}")
+
+    @callback
+    def _async_schedule_reconnect(self) -> None:
+        """Schedule a reconnect attempt with exponential backoff."""
+        if self._stopping or self._reconnect_handle or self._reconnect_task:
+            return
+        delay = self._reconnect_delay
+        self._reconnect_delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        self._reconnect_handle = self._loop.call_later(
+            random.uniform(delay / 2, delay), self._async_reconnect
+        )
+
+    @callback
+    def _async_reconnect(self) -> None:
+        self._reconnect_handle = None
+        self._reconnect_task = self._hass.async_create_background_task(
+            self._async_do_reconnect(), f"lmt_iot reconnect {self._client_id}"
+        )
+
+    async def _async_do_reconnect(self) -> None:
+        try:
+            async with self._scheduler.async_admit():
+                if self._stopping:
+                    self._reconnect_task = None
+                    return
+                self.connecting = True
+                try:
+                    await self._hass.async_add_executor_job(self._client.reconnect)
+                finally:
+                    self.connecting = False
+        except (OSError, ValueError) as e:
+            _LOGGER.warning(f"Reconnect to LMT IoT Cloud failed: {e}")
+            self._reconnect_task = None
+            self._async_schedule_reconnect()
+            return
+
+        self._reconnect_task = None
+        self.reconnects += 1
+        if self._stopping:
+            self._client.disconnect()
+            self._client.loop_write()
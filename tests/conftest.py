@@ -0,0 +1,19 @@
+"""Shared pytest setup.
+
+The modules under test only need the standard library, so the integration
+package is registered as a bare module: importing them then skips its
+``__init__``, which needs Home Assistant and paho-mqtt.
+"""
+
+import sys
+import types
+from pathlib import Path
+
+PACKAGE = "custom_components.lmt_iot"
+PACKAGE_DIR = Path(__file__).resolve().parent.parent / "custom_components" / "lmt_iot"
+
+if PACKAGE not in sys.modules:
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [str(PACKAGE_DIR)]
+    sys.modules[PACKAGE] = package
+sys.path.insert(0, str(PACKAGE_DIR.parent.parent))
@@ -0,0 +1,61 @@
+"""Tests for duplicate and out-of-order uplink suppression."""
+
+from custom_components.lmt_iot.dedup import UplinkDeduplicator
+
+
+def receive(dedup: UplinkDeduplicator, raw: bytes, now: float, timestamped: bool):
+    """Offer ``raw`` like the device does, marking it timestamped if new."""
+    if dedup.duplicate(raw, now):
+        return True
+    if timestamped:
+        dedup.timestamped()
+    return False
+
+
+def test_redelivered_copy_is_a_duplicate() -> None:
+    dedup = UplinkDeduplicator()
+    assert not receive(dedup, b"a", 0, True)
+    assert receive(dedup, b"a", 1, True)
+    assert not receive(dedup, b"b", 2, True)
+
+
+def test_lru_eviction() -> None:
+    dedup = UplinkDeduplicator(size=2)
+    receive(dedup, b"a", 0, True)
+    receive(dedup, b"b", 1, True)
+    # Seeing "a" again makes "b" the least recently used
+    assert receive(dedup, b"a", 2, True)
+    receive(dedup, b"c", 3, True)
+    assert receive(dedup, b"a", 4, True)
+    assert not receive(dedup, b"b", 5, True)
+
+
+def test_max_age() -> None:
+    dedup = UplinkDeduplicator(max_age=100)
+    receive(dedup, b"a", 0, True)
+    assert receive(dedup, b"a", 100, True)
+    # The copy refreshed the entry
+    assert receive(dedup, b"a", 200, True)
+    assert not receive(dedup, b"a", 301, True)
+
+
+def test_untimestamped_uplinks_within_the_redelivery_window() -> None:
+    dedup = UplinkDeduplicator(max_age=100, redelivery_window=10)
+    receive(dedup, b"v1", 0, False)
+    assert receive(dedup, b"v1", 10, False)
+    # The same reading reported again later is a new uplink
+    assert not receive(dedup, b"v1", 21, False)
+    # Timestamped uplinks are still recognised for max_age
+    receive(dedup, b"v2", 21, True)
+    assert receive(dedup, b"v2", 80, True)
+
+
+def test_stale() -> None:
+    dedup = UplinkDeduplicator()
+    assert not dedup.stale(None)
+    assert not dedup.stale(100.0)
+    assert not dedup.stale(100.0)
+    assert dedup.stale(99.0)
+    assert not dedup.stale(None)
+    assert not dedup.stale(101.0)
+    assert dedup.newest == 101.0
@@ -0,0 +1,75 @@
+"""Tests for sensor state write filtering."""
+
+from custom_components.lmt_iot.filters import StateWriteFilter
+
+
+def write(write_filter: StateWriteFilter, value, now: float) -> bool:
+    """Offer ``value`` and record the write if it is due, like the sensors do."""
+    if write_filter.should_write(value, now):
+        write_filter.written(value, now)
+        return True
+    return False
+
+
+def test_first_value_is_written() -> None:
+    assert write(StateWriteFilter(deadband=10, min_interval=60), 1.0, 0)
+
+
+def test_unchanged_value_is_suppressed() -> None:
+    write_filter = StateWriteFilter()
+    write(write_filter, "Alarm", 0)
+    assert write_filter.write_delay("Alarm", 1) is None
+    assert write(write_filter, "Warning", 2)
+
+
+def test_deadband() -> None:
+    write_filter = StateWriteFilter(deadband=0.5)
+    write(write_filter, 20.0, 0)
+    assert not write(write_filter, 20.4, 1)
+    assert not write(write_filter, 19.6, 2)
+    # Measured from the last written value, not the last offered one
+    assert write(write_filter, 20.5, 3)
+
+
+def test_deadband_percent() -> None:
+    write_filter = StateWriteFilter(deadband_percent=10)
+    write(write_filter, 200.0, 0)
+    assert not write(write_filter, 219.0, 1)
+    assert write(write_filter, 221.0, 2)
+    # Non-numeric values are never within a deadband
+    assert write(write_filter, "offline", 3)
+
+
+def test_min_interval_delays_a_change() -> None:
+    write_filter = StateWriteFilter(min_interval=60)
+    write(write_filter, 1.0, 0)
+    assert write_filter.write_delay(2.0, 15) == 45
+    assert not write(write_filter, 2.0, 15)
+    # The suppressed change is due once the interval has passed
+    assert write_filter.write_delay(2.0, 60) == 0
+    assert write(write_filter, 2.0, 60)
+
+
+def test_min_interval_does_not_delay_a_filtered_value() -> None:
+    write_filter = StateWriteFilter(deadband=1, min_interval=60)
+    write(write_filter, 1.0, 0)
+    assert write_filter.write_delay(1.5, 15) is None
+
+
+def test_heartbeat() -> None:
+    write_filter = StateWriteFilter(deadband=5, min_interval=60, heartbeat=300)
+    write(write_filter, 1.0, 0)
+    assert not write(write_filter, 1.0, 299)
+    assert write(write_filter, 1.0, 300)
+    assert not write(write_filter, 2.0, 301)
+
+
+def test_from_config_applies_the_override() -> None:
+    write_filter = StateWriteFilter.from_config(
+        {"key": "CO", "deadband": 1, "minInterval": 30},
+        {"deadband": 2, "heartbeat": 0},
+    )
+    assert write_filter.deadband == 2
+    assert write_filter.deadband_percent == 0
+    assert write_filter.min_interval == 30
+    assert write_filter.heartbeat == 0
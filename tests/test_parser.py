@@ -0,0 +1,214 @@
+"""Tests for the uplink parser.
+
+Expected values are what the original dict-walking parser returned for the
+same uplinks, so the precompiled and columnar parsers must match it.
+"""
+
+import json
+import math
+
+import pytest
+
+from custom_components.lmt_iot.parser import (
+    parse_uplink_batch,
+    parse_uplink_bytes,
+    parse_uplink_message,
+    parse_uplink_page,
+    parse_uplink_samples,
+)
+
+V1_FULL = {
+    "msdInfoData": {"mServerIdentity": "SN1"},
+    "data": [
+        {"mSerial": "OTHER", "mTempData": [{"mData": [99.0]}]},
+        {
+            "mSerial": "SN1",
+            "mTempData": [{"mData": [21.0, 21.5]}],
+            "mHumidData": [{"mData": [40]}],
+            "mCoData": [{"mData": [3]}],
+            "mIaqData": [{"mData": [55]}],
+            "mSmokeStatus": 2,
+            "mRsrp": -100,
+            "mRsrq": -11,
+            "mSinr": 7,
+        },
+    ],
+}
+V1_SPARSE = {
+    "msdInfoData": {"mServerIdentity": "SN1"},
+    "data": [
+        {
+            "mSerial": "SN1",
+            "mTempData": [],
+            "mHumidData": [{"mData": []}],
+            "mSmokeStatus": 5,
+            "mRsrp": None,
+            "mSinr": -2,
+        }
+    ],
+}
+V1_OTHER_SERIAL = {
+    "msdInfoData": {"mServerIdentity": "SN1"},
+    "data": [{"mSerial": "SN2", "mCoData": [{"mData": [1]}]}],
+}
+V2_FULL = {
+    "version": "V2",
+    "measurements": {
+        "TEMPERATURE": [[1700000000000, 20.5], [1700000060000, 21]],
+        "CO": [[1700000060000, "4"]],
+        "SIGNAL_STRENGTH": [[1700000060000, -90, -9, 12]],
+    },
+}
+V2_MISSING_FIELDS = {
+    "version": "V2",
+    "measurements": {
+        "TEMPERATURE": [],
+        "HUMIDITY": [[1700000000000]],
+        "CO": [[1700000000000, None]],
+        "IAQ": [[1700000000000, "bad"]],
+        "SIGNAL_STRENGTH": [[1700000000000, -110, -12]],
+        "PRESSURE": [[1700000000000, 1013]],
+    },
+}
+V2_NAN = {
+    "version": "V2",
+    "measurements": {
+        "TEMPERATURE": [[1700000000000, "NaN"]],
+        "CO": [[1700000000000, 2]],
+    },
+}
+
+# (uplink, what the original parser returned for it)
+CASES = {
+    "v1": (
+        V1_FULL,
+        {
+            "TEMPERATURE": 21.5,
+            "HUMIDITY": 40,
+            "CO": 3,
+            "IAQ": 55,
+            "SMOKE_STATUS": "Alarm",
+            "RSRP": -100,
+            "SIGNAL_STRENGTH": "Moderate",
+            "RSRQ": -11,
+            "SINR": 7,
+        },
+    ),
+    "v1_missing_fields": (V1_SPARSE, {"SMOKE_STATUS": "UNKNOWN", "SINR": -2}),
+    "v1_other_serial": (V1_OTHER_SERIAL, None),
+    "v1_data_not_a_list": ({"msdInfoData": {}, "data": "oops"}, None),
+    "v2": (
+        V2_FULL,
+        {
+            "TEMPERATURE": 21.0,
+            "CO": 4.0,
+            "RSRP": -90,
+            "RSRQ": -9,
+            "SINR": 12,
+            "SIGNAL_STRENGTH": "Good",
+        },
+    ),
+    "v2_missing_fields": (V2_MISSING_FIELDS, {"PRESSURE": 1013.0}),
+    "v2_nan": (V2_NAN, {"TEMPERATURE": math.nan, "CO": 2.0}),
+    "v2_empty": ({"version": "V2", "measurements": {}}, None),
+    "v2_no_measurements": ({"version": "V2"}, None),
+    "unknown_format": ({"foo": 1}, None),
+}
+
+
+def assert_values_equal(actual: dict | None, expected: dict | None) -> None:
+    """Compare parsed values, treating NaN as equal to NaN."""
+    if expected is None:
+        assert actual is None
+        return
+    assert actual is not None
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        if isinstance(value, float) and math.isnan(value):
+            assert math.isnan(actual[key]), key
+        else:
+            assert actual[key] == value, key
+            assert type(actual[key]) is type(value), key
+
+
+def without_nan(samples: dict) -> dict:
+    """Replace NaN sample values with None, so sample lists compare equal."""
+    return {
+        key: [(time, None if math.isnan(value) else value) for time, value in series]
+        for key, series in samples.items()
+    }
+
+
+@pytest.mark.parametrize(("payload", "expected"), CASES.values(), ids=CASES.keys())
+def test_parse_uplink_message(payload: dict, expected: dict | None) -> None:
+    assert_values_equal(parse_uplink_message(payload), expected)
+
+
+@pytest.mark.parametrize(("payload", "expected"), CASES.values(), ids=CASES.keys())
+def test_parse_uplink_bytes(payload: dict, expected: dict | None) -> None:
+    assert_values_equal(parse_uplink_bytes(json.dumps(payload).encode()), expected)
+
+
+def test_parse_uplink_bytes_not_an_object() -> None:
+    assert parse_uplink_bytes(b"[1, 2]") is None
+    with pytest.raises(ValueError):
+        parse_uplink_bytes(b"{not json")
+
+
+@pytest.mark.parametrize("raw", [False, True], ids=["decoded", "raw"])
+@pytest.mark.parametrize(("payload", "expected"), CASES.values(), ids=CASES.keys())
+def test_parse_uplink_batch_rows(
+    payload: dict, expected: dict | None, raw: bool
+) -> None:
+    batch = parse_uplink_batch(
+        [json.dumps(payload).encode() if raw else payload], ["dev1"]
+    )
+    assert (batch.parsed, batch.failed) == ((1, 0) if expected else (0, 1))
+    rows = {key: column.values[0] for key, column in batch.values.items()}
+    assert_values_equal(rows or None, expected)
+    for column in batch.values.values():
+        assert batch.column_device_ids(column) == ["dev1"]
+
+
+def test_parse_uplink_batch_matches_merging_each_uplink() -> None:
+    # In time order, V1 uplinks (which carry no timestamps) first
+    cases = sorted(CASES.values(), key=lambda case: case[0] is V2_FULL)
+    batch = parse_uplink_batch([payload for payload, _ in cases], samples=True)
+
+    merged = {}
+    expected_samples = {}
+    for payload, expected in cases:
+        merged.update(expected or {})
+        for key, samples in (parse_uplink_samples(payload) or {}).items():
+            expected_samples.setdefault(key, []).extend(samples)
+    assert batch.parsed == sum(1 for _, expected in cases if expected)
+    assert batch.failed == len(cases) - batch.parsed
+    assert_values_equal(batch.latest(), merged)
+    assert without_nan(batch.history()) == without_nan(expected_samples)
+
+
+def test_parse_uplink_batch_latest_prefers_the_newest_sample() -> None:
+    newer = {"version": "V2", "measurements": {"CO": [[1700000120000, 9]]}}
+    batch = parse_uplink_batch([newer, V2_FULL, V1_FULL])
+    # The V2 rows are out of order, and V1 rows carry no timestamp at all
+    assert batch.latest()["CO"] == 9.0
+    assert batch.latest()["TEMPERATURE"] == 21.0
+    assert batch.latest()["HUMIDITY"] == 40
+
+
+def test_parse_uplink_batch_malformed_uplinks() -> None:
+    batch = parse_uplink_batch([b"{not json", b"[]", {"version": "V2"}, V2_NAN])
+    assert (batch.parsed, batch.failed) == (1, 3)
+    assert batch.values["TEMPERATURE"].uplinks.tolist() == [3]
+    assert math.isnan(batch.values["TEMPERATURE"].values[0])
+
+
+def test_parse_uplink_page() -> None:
+    older = {"version": "V2", "measurements": {"CO": [[1699999990000, 1]]}}
+    page = json.dumps({"data": [older, V2_FULL, V1_FULL, "oops"]}).encode()
+    batch = parse_uplink_page(page, newer_than=1700000000, samples=True)
+    assert (batch.parsed, batch.failed, batch.skipped) == (2, 1, 1)
+    assert batch.latest()["CO"] == 4.0
+    assert batch.history()["CO"] == [(1700000060.0, 4.0)]
+    assert parse_uplink_page(b'{"data": {}}') is None
+    assert parse_uplink_page(b"[]") is None